@@ -0,0 +1,163 @@
+import math
+import time
+from collections import deque
+from threading import Lock
+from typing import Deque, Dict, Optional, Tuple
+
+DEFAULT_SLO_SECONDS = 5.0
+DEFAULT_SLO_TARGET = 0.95
+DEFAULT_WINDOW_SECONDS = 300
+DEFAULT_MAX_QUEUE = 200
+DEFAULT_MAX_WAIT_SECONDS = 60
+DEFAULT_MAX_RETRY_AFTER = 120
+# Create time assumed before any create has been measured
+DEFAULT_CREATE_SECONDS = 30.0
+MAX_SAMPLES = 10000
+
+
+class SampleWindow:
+    """Timestamped samples from the last ``window`` seconds."""
+
+    def __init__(self, window: float) -> None:
+        self.window = float(window)
+        self.samples: Deque[Tuple[float, float]] = deque(maxlen=MAX_SAMPLES)
+
+    def add(self, value: float, now: float) -> None:
+        self.samples.append((now, value))
+
+    def values(self, now: float):
+        while self.samples and now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+        return [value for _, value in self.samples]
+
+
+def quantile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class AdmissionController:
+    """Time-to-proxy SLO tracking and admission for one pool.
+
+    Every ``/new_proxy`` outcome is recorded: the time until a proxy was
+    handed out, or a miss for a 503. When the pool is empty the expected
+    wait is estimated from the measured create time and completion rate
+    and the number of callers already waiting. A caller with a deadline is
+    admitted (and waits) only if that estimate fits; everyone else is told
+    when to come back via ``Retry-After``. While attainment is below
+    ``slo_target``, waits longer than ``slo_seconds`` are refused too, so
+    the callers that can still be served in time are not queued behind
+    them. Once the task queue holds ``max_queue`` tasks no more fills are
+    requested, so overload turns into fast, well-timed 503s instead of an
+    ever-growing backlog.
+    """
+
+    def __init__(self, slo_seconds: float = DEFAULT_SLO_SECONDS, slo_target: float = DEFAULT_SLO_TARGET,
+                 window_seconds: float = DEFAULT_WINDOW_SECONDS, max_queue: int = DEFAULT_MAX_QUEUE,
+                 max_wait: float = DEFAULT_MAX_WAIT_SECONDS,
+                 max_retry_after: float = DEFAULT_MAX_RETRY_AFTER) -> None:
+        self.slo_seconds = float(slo_seconds)
+        self.slo_target = min(max(float(slo_target), 0.0), 1.0)
+        self.window = float(window_seconds)
+        self.max_queue = max(1, int(max_queue))
+        self.max_wait = float(max_wait)
+        self.max_retry_after = max(1.0, float(max_retry_after))
+        self.lock = Lock()
+        self.served = SampleWindow(self.window)
+        self.missed = SampleWindow(self.window)
+        self.creates = SampleWindow(self.window)
+        self.waiting = 0
+        self.counters = {"served": 0, "rejected": 0, "timed_out": 0, "shed": 0}
+
+    # Outcomes
+    def record_served(self, seconds: float) -> None:
+        with self.lock:
+            self.served.add(seconds, time.time())
+            self.counters["served"] += 1
+
+    def record_miss(self, kind: str = "rejected") -> None:
+        with self.lock:
+            self.missed.add(1.0, time.time())
+            self.counters[kind] = self.counters.get(kind, 0) + 1
+
+    def record_create(self, seconds: float) -> None:
+        with self.lock:
+            self.creates.add(seconds, time.time())
+
+    # Decisions
+    def estimate_wait(self, workers: int, in_flight: int) -> float:
+        """Seconds until a newly waiting caller should get a container from an empty pool."""
+        now = time.time()
+        with self.lock:
+            durations = self.creates.values(now)
+            ahead = self.waiting
+        create_time = quantile(durations, 0.5) or DEFAULT_CREATE_SECONDS
+        # Observed completions per second, or what the workers could do at the median create time
+        rate = max(len(durations) / self.window, max(1, workers) / create_time)
+        # Creates already running cover the first callers; the rest queue behind the completion rate
+        uncovered = max(0, ahead + 1 - max(0, in_flight))
+        return create_time + uncovered / rate
+
+    def admit(self, deadline: Optional[float], workers: int, in_flight: int) -> Tuple[bool, float]:
+        """``(admitted, estimated_wait)`` for a caller willing to wait ``deadline`` seconds."""
+        estimate = self.estimate_wait(workers, in_flight)
+        if deadline is None or deadline <= 0:
+            return False, estimate
+        if estimate > self.slo_seconds:
+            attainment = self._attainment(time.time())
+            if attainment is not None and attainment < self.slo_target:
+                return False, estimate
+        return estimate <= min(deadline, self.max_wait), estimate
+
+    def should_shed(self, queue_depth: int) -> bool:
+        if queue_depth < self.max_queue:
+            return False
+        with self.lock:
+            self.counters["shed"] += 1
+        return True
+
+    def retry_after(self, estimate: float) -> int:
+        return int(min(self.max_retry_after, max(1, math.ceil(estimate))))
+
+    def enter(self) -> None:
+        with self.lock:
+            self.waiting += 1
+
+    def leave(self) -> None:
+        with self.lock:
+            self.waiting = max(0, self.waiting - 1)
+
+    def _attainment(self, now: float) -> Optional[float]:
+        """Share of outcomes in the window served within ``slo_seconds``."""
+        with self.lock:
+            served = self.served.values(now)
+            misses = len(self.missed.values(now))
+        total = len(served) + misses
+        return sum(1 for s in served if s <= self.slo_seconds) / total if total else None
+
+    def stats(self) -> Dict:
+        now = time.time()
+        attainment = self._attainment(now)
+        with self.lock:
+            served = self.served.values(now)
+            creates = self.creates.values(now)
+            counters = dict(self.counters)
+            waiting = self.waiting
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "slo_seconds": self.slo_seconds,
+            "slo_target": self.slo_target,
+            "window_seconds": self.window,
+            "attainment": None if attainment is None else round(attainment, 4),
+            "meeting_slo": None if attainment is None else attainment >= self.slo_target,
+            "time_to_proxy_ms": {"p50": ms(quantile(served, 0.5)), "p95": ms(quantile(served, 0.95)),
+                                 "p99": ms(quantile(served, 0.99))},
+            "create_p50_ms": ms(quantile(creates, 0.5)),
+            "waiting": waiting,
+            **counters,
+        }
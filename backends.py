@@ -0,0 +1,943 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import logging
+import ipaddress
+import itertools
+import subprocess
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+import docker
+from docker.errors import APIError, DockerException, NotFound
+
+from launch_profiles import PROFILE_LABEL
+from protocol_selector import WIREGUARD, protocol_of
+
+logger = logging.getLogger(__name__)
+
+GLUETUN_IMAGE = "qmcgaw/gluetun:latest"
+PROXY_PORT = "8888/tcp"
+CONTROL_PORT = "8000/tcp"
+PROBE_TARGET = "api.ipify.org:443"
+VPN_TYPE_OPENVPN = "openvpn"
+VPN_TYPE_WIREGUARD = WIREGUARD
+
+
+class ProxyBackend:
+    """Runs one VPN tunnel plus HTTP proxy per handle.
+
+    Handles are backend specific but always expose ``id`` and ``name``.
+    ``VPNManager`` only talks to the pool's tunnels through these methods.
+    """
+
+    kind = "base"
+    # Whether tunnel_status() knows the public IP without going through the proxy
+    reports_public_ip = False
+    # Whether events() streams lifecycle changes for the inventory cache
+    supports_events = False
+
+    def __init__(self, vpn_provider: str = "nordvpn", vpn_user: Optional[str] = None,
+                 vpn_pass: Optional[str] = None, configs_dir: Path = Path("./openvpn"),
+                 request_timeout: int = 10, limits: Optional[Dict] = None,
+                 address: str = "127.0.0.1", public_address: Optional[str] = None,
+                 wireguard: Optional[Dict] = None) -> None:
+        self.vpn_provider = vpn_provider
+        self.vpn_user = vpn_user
+        self.vpn_pass = vpn_pass
+        # config.json "wireguard": private_key and optional addresses for VPN_TYPE=wireguard
+        self.wireguard = dict(wireguard or {})
+        self.configs_dir = Path(configs_dir)
+        self.request_timeout = request_timeout
+        # Resource limits from config.json "container_limits"
+        self.limits = dict(limits or {})
+        # Where published ports are reachable from the manager and from clients
+        self.address = address
+        self.public_address = public_address or address
+
+    def launch(self, name: str, ovpn_file: Optional[Path], host_port: int, profile=None,
+               vpn_type: str = VPN_TYPE_OPENVPN):
+        """Start a tunnel; ``profile`` is a ``launch_profiles.LaunchProfile`` or None.
+
+        With ``vpn_type`` wireguard, ``ovpn_file`` names the catalog server
+        (its ``name`` is the hostname) instead of an OpenVPN config.
+        """
+        raise NotImplementedError
+
+    def wait_ready(self, handle, host_port: int, timeout: float,
+                   check: Optional[Callable[[], Tuple[Optional[str], Optional[str]]]] = None,
+                   interval: float = 3) -> bool:
+        """Poll ``check`` (end-to-end proxy validation by default) until it yields an IP."""
+        check = check or (lambda: self.validate(host_port))
+        start = time.time()
+        while time.time() - start < timeout:
+            try:
+                self.refresh(handle)
+                proxy_url, ip_seen = check()
+                if proxy_url and ip_seen:
+                    logger.info(f"Proxy healthy and validated: {ip_seen}")
+                    return True
+            except Exception as e:
+                logger.debug(f"Health check attempt failed: {e}")
+            time.sleep(interval)
+        logger.error("Health check timed out")
+        return False
+
+    def restart(self, handle) -> bool:
+        raise NotImplementedError
+
+    def rotate(self, handle) -> bool:
+        """Reconnect the tunnel for a new exit IP; backends without a cheaper
+        path fall back to a full restart."""
+        return self.restart(handle)
+
+    def tunnel_status(self, handle) -> Dict:
+        """Report ``{"vpn": ..., "public_ip": ...}`` as seen by the tunnel itself."""
+        return {"vpn": None, "public_ip": None}
+
+    def remove(self, handle) -> None:
+        raise NotImplementedError
+
+    def get(self, name: str):
+        """Return the handle for ``name`` or None when it does not exist."""
+        raise NotImplementedError
+
+    def list(self) -> List:
+        raise NotImplementedError
+
+    def inspect(self, handle) -> Dict:
+        """Describe a handle as ``{id, name, status, http_port}``."""
+        raise NotImplementedError
+
+    def refresh(self, handle) -> None:
+        pass
+
+    def snapshot(self) -> List[Dict]:
+        """Records (``inspect`` dicts) for every proxy, for the inventory cache."""
+        return [self.inspect(h) for h in self.list()]
+
+    def record_for(self, name: str) -> Optional[Dict]:
+        handle = self.get(name)
+        return self.inspect(handle) if handle is not None else None
+
+    def from_record(self, record: Dict):
+        """Turn a cached record back into a handle."""
+        return self.get(record["name"])
+
+    def events(self):
+        """Iterator of ``(action, name)`` for proxy lifecycle changes until the stream ends.
+
+        The subscription must be open when this returns (not on the first
+        ``next``): the inventory relists right after and relies on it."""
+        raise NotImplementedError
+
+    def logs(self, handle, tail: int = 80) -> List[str]:
+        """Last ``tail`` lines of the tunnel's log, for failure classification."""
+        return []
+
+    def ping(self) -> bool:
+        return True
+
+    def proxy_url(self, host_port: int) -> str:
+        return f"http://{self.public_address}:{host_port}"
+
+    def stats(self, handle) -> Dict:
+        """Sample usage as cumulative ``cpu_seconds`` plus ``memory_bytes``,
+        ``memory_limit``, ``net_rx_bytes`` and ``net_tx_bytes``."""
+        raise NotImplementedError
+
+    def probe(self, host_port: int, target: str = PROBE_TARGET, timeout: float = 3) -> bool:
+        """Cheap liveness check: CONNECT through the proxy and expect a 200.
+
+        The proxy opens the upstream TCP connection through the tunnel, so
+        this catches a dead tunnel without a TLS handshake or HTTP request.
+        """
+        try:
+            with socket.create_connection((self.address, int(host_port)), timeout=timeout) as sock:
+                sock.settimeout(timeout)
+                sock.sendall(f"CONNECT {target} HTTP/1.1\r\nHost: {target}\r\n\r\n".encode())
+                status_line = sock.recv(128).split(b"\r\n", 1)[0]
+            return status_line.split(b" ")[1:2] == [b"200"]
+        except (OSError, IndexError) as e:
+            logger.debug(f"Proxy probe error: {e}")
+            return False
+
+    def measure_throughput(self, host_port: int, url: str, max_bytes: int, timeout: float) -> Optional[float]:
+        """Download speed through the proxy in bytes/s, reading at most ``max_bytes``."""
+        proxy = f"http://{self.address}:{host_port}"
+        received = 0
+        started = time.perf_counter()
+        try:
+            with requests.get(url, proxies={"http": proxy, "https": proxy}, stream=True,
+                              timeout=self.request_timeout) as r:
+                if r.status_code != 200:
+                    return None
+                for chunk in r.iter_content(chunk_size=65536):
+                    received += len(chunk)
+                    if received >= max_bytes or time.perf_counter() - started > timeout:
+                        break
+        except Exception as e:
+            logger.debug(f"Throughput measurement error: {e}")
+            return None
+        elapsed = time.perf_counter() - started
+        return received / elapsed if received and elapsed > 0 else None
+
+    def validate(self, host_port: int) -> Tuple[Optional[str], Optional[str]]:
+        proxy = f"http://{self.address}:{host_port}"
+        try:
+            r = requests.get(
+                "https://api.ipify.org?format=json",
+                proxies={"http": proxy, "https": proxy},
+                timeout=self.request_timeout,
+            )
+            if r.status_code == 200:
+                data = r.json()
+                ip = data.get("ip")
+                if ip:
+                    return self.proxy_url(host_port), ip
+        except Exception as e:
+            logger.debug(f"Proxy validation error: {e}")
+        return None, None
+
+
+class GluetunBackend(ProxyBackend):
+    """One ``qmcgaw/gluetun`` Docker container per proxy.
+
+    Gluetun's HTTP control server is published on a Docker-assigned port
+    on ``control_bind`` (localhost by default) so rotations can reconnect the
+    VPN in-process instead of restarting the container. The manager calls it
+    on ``control_bind`` itself, or on ``address`` when bound to all
+    interfaces; a remote daemon therefore needs ``control_bind`` set to an
+    address of that host.
+    """
+
+    kind = "gluetun"
+    reports_public_ip = True
+    supports_events = True
+
+    def __init__(self, client=None, base_url: Optional[str] = None, control_api_key: Optional[str] = None,
+                 control_timeout: float = 5, control_bind: str = "127.0.0.1", **kwargs) -> None:
+        super().__init__(**kwargs)
+        if client is None:
+            client = docker.DockerClient(base_url=base_url) if base_url else docker.from_env()
+        self.client = client
+        self.control_bind = control_bind
+        self.control_api_key = control_api_key
+        self.control_timeout = control_timeout
+        if base_url and not base_url.startswith("unix://") and _is_loopback(control_bind):
+            logger.warning(f"Control API of {base_url} is bound to {control_bind} on that host and unreachable "
+                           f"from here; set backend_options.control_bind to its address")
+
+    def _control_host(self) -> str:
+        """Where the published control port is reachable from the manager."""
+        return self.address if self.control_bind in ("", "0.0.0.0", "::") else self.control_bind
+
+    def launch(self, name: str, ovpn_file: Optional[Path], host_port: int, profile=None,
+               vpn_type: str = VPN_TYPE_OPENVPN):
+        env = {
+            "HTTPPROXY": "on",
+        }
+        wireguard = vpn_type == VPN_TYPE_WIREGUARD
+        if wireguard:
+            # NordLynx: gluetun's provider WireGuard support, pinned to the catalog's server
+            env["VPN_SERVICE_PROVIDER"] = self.vpn_provider
+            env["VPN_TYPE"] = "wireguard"
+            env["WIREGUARD_PRIVATE_KEY"] = self.wireguard.get("private_key", "")
+            if self.wireguard.get("addresses"):
+                env["WIREGUARD_ADDRESSES"] = self.wireguard["addresses"]
+            if ovpn_file is not None:
+                env["SERVER_HOSTNAMES"] = ovpn_file.name
+        # Provider selection
+        elif self.vpn_provider == "nordvpn" and ovpn_file is not None:
+            env["VPN_SERVICE_PROVIDER"] = "nordvpn"
+            env["OPENVPN_CUSTOM_CONFIG"] = f"/gluetun/nordvpn/{ovpn_file.name}"
+        else:
+            # Use given provider (e.g., nordvpn) per config.json
+            env["VPN_SERVICE_PROVIDER"] = self.vpn_provider
+        # Credentials
+        if self.vpn_user and not wireguard:
+            env["OPENVPN_USER"] = self.vpn_user
+        if self.vpn_pass and not wireguard:
+            env["OPENVPN_PASSWORD"] = self.vpn_pass
+        # Control server is only reachable from the host's loopback
+        env["HTTP_CONTROL_SERVER_ADDRESS"] = ":8000"
+        if self.control_api_key:
+            role = {"auth": "apikey", "apikey": self.control_api_key}
+        else:
+            role = {"auth": "none"}
+        env["HTTP_CONTROL_SERVER_AUTH_DEFAULT_ROLE"] = json.dumps(role)
+
+        # Mount custom configs only when using custom
+        volumes = {}
+        if self.vpn_provider == "nordvpn" and ovpn_file is not None and not wireguard:
+            volumes[str(self.configs_dir.resolve())] = {
+                "bind": "/gluetun/nordvpn",
+                "mode": "ro",
+            }
+        # Launch profile settings (DNS, updater, health tuning, ...) go over the defaults
+        labels = {}
+        limits = self.limits
+        if profile is not None:
+            env.update(profile.env)
+            volumes.update(profile.volumes)
+            limits = dict(self.limits, **profile.limits)
+            labels[PROFILE_LABEL] = profile.name
+
+        ports = {
+            PROXY_PORT: ("0.0.0.0", host_port),
+            CONTROL_PORT: (self.control_bind, None),
+        }
+        try:
+            container = self.client.containers.run(
+                image=GLUETUN_IMAGE,
+                name=name,
+                cap_add=["NET_ADMIN"],
+                devices=["/dev/net/tun:/dev/net/tun"],
+                environment=env,
+                volumes=volumes,
+                ports=ports,
+                detach=True,
+                restart_policy={"Name": "unless-stopped"},
+                network_mode="bridge",
+                labels=labels,
+                **self._resource_kwargs(limits),
+            )
+            logger.info(f"Launched container {name}")
+            return container
+        except (APIError, DockerException) as e:
+            logger.error(f"Failed to run container: {e}")
+            return None
+
+    def restart(self, handle) -> bool:
+        try:
+            handle.restart(timeout=30)
+            logger.info("Container restarted")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to restart container: {e}")
+            return False
+
+    def rotate(self, handle) -> bool:
+        if not self._set_vpn_status(handle, "stopped"):
+            return False
+        if not self._set_vpn_status(handle, "running"):
+            return False
+        logger.info(f"Tunnel reconnected via control server for {handle.name}")
+        return True
+
+    def tunnel_status(self, handle) -> Dict:
+        vpn = self._control(handle, "GET", "/v1/vpn/status") or self._control(handle, "GET", "/v1/openvpn/status")
+        public = self._control(handle, "GET", "/v1/publicip/ip")
+        return {
+            "vpn": (vpn or {}).get("status"),
+            "public_ip": (public or {}).get("public_ip") or None,
+        }
+
+    def remove(self, handle) -> None:
+        handle.remove(force=True)
+
+    def get(self, name: str):
+        try:
+            return self.client.containers.get(name)
+        except NotFound:
+            return None
+
+    def list(self) -> List:
+        return self.client.containers.list(all=True, filters={"ancestor": GLUETUN_IMAGE})
+
+    def inspect(self, handle) -> Dict:
+        return {
+            "id": handle.id,
+            "name": handle.name,
+            "status": handle.status,
+            "http_port": _published_port(handle, PROXY_PORT),
+        }
+
+    def refresh(self, handle) -> None:
+        handle.reload()
+
+    def logs(self, handle, tail: int = 80) -> List[str]:
+        try:
+            return handle.logs(tail=tail).decode("utf-8", "replace").splitlines()
+        except (APIError, DockerException) as e:
+            logger.debug(f"Could not read logs for {handle.name}: {e}")
+            return []
+
+    def snapshot(self) -> List[Dict]:
+        # One summary listing instead of an inspect call per container
+        summaries = self.client.api.containers(all=True, filters={"ancestor": GLUETUN_IMAGE})
+        return [_record_from_summary(s) for s in summaries]
+
+    def record_for(self, name: str) -> Optional[Dict]:
+        summaries = self.client.api.containers(all=True, filters={"name": f"^/{name}$"})
+        return _record_from_summary(summaries[0]) if summaries else None
+
+    def from_record(self, record: Dict):
+        attrs = record.get("attrs")
+        if not attrs:
+            return self.get(record["name"])
+        return self.client.containers.prepare_model(attrs)
+
+    def events(self):
+        # Subscribe now rather than at the first next(): the inventory relists right
+        # after this call, and anything that happens in between must still arrive
+        stream = self.client.events(decode=True, filters={"type": "container"})
+        return self._container_events(stream)
+
+    @staticmethod
+    def _container_events(stream):
+        try:
+            for event in stream:
+                attrs = (event.get("Actor") or {}).get("Attributes") or {}
+                if attrs.get("image") != GLUETUN_IMAGE:
+                    continue
+                yield event.get("Action") or event.get("status"), attrs.get("name")
+        finally:
+            stream.close()
+
+    def ping(self) -> bool:
+        return bool(self.client.ping())
+
+    def stats(self, handle) -> Dict:
+        raw = handle.stats(stream=False)
+        memory = raw.get("memory_stats") or {}
+        detail = memory.get("stats") or {}
+        # Page cache is reclaimable; cgroup v2 reports it as inactive_file, v1 as cache
+        cache = detail.get("inactive_file", detail.get("cache", 0))
+        rx = tx = 0
+        for net in (raw.get("networks") or {}).values():
+            rx += net.get("rx_bytes", 0)
+            tx += net.get("tx_bytes", 0)
+        return {
+            "cpu_seconds": ((raw.get("cpu_stats") or {}).get("cpu_usage") or {}).get("total_usage", 0) / 1e9,
+            "memory_bytes": max(0, memory.get("usage", 0) - cache),
+            "memory_limit": memory.get("limit"),
+            "net_rx_bytes": rx,
+            "net_tx_bytes": tx,
+        }
+
+    def _control(self, handle, method: str, path: str, payload: Optional[Dict] = None) -> Optional[Dict]:
+        port = _published_port(handle, CONTROL_PORT)
+        if not port:
+            # Containers returned by run() carry pre-start attrs without port bindings
+            try:
+                handle.reload()
+            except Exception:
+                return None
+            port = _published_port(handle, CONTROL_PORT)
+            if not port:
+                return None
+        headers = {"X-API-Key": self.control_api_key} if self.control_api_key else {}
+        try:
+            r = requests.request(method, f"http://{self._control_host()}:{port}{path}", json=payload,
+                                 headers=headers, timeout=self.control_timeout)
+            if r.status_code != 200:
+                return None
+            return r.json() if r.content else {}
+        except Exception as e:
+            logger.warning(f"Control server call {method} {path} on {self._control_host()}:{port} failed: {e}")
+            return None
+
+    def _set_vpn_status(self, handle, status: str) -> bool:
+        payload = {"status": status}
+        # Newer gluetun exposes /v1/vpn/status; older releases only /v1/openvpn/status
+        if self._control(handle, "PUT", "/v1/vpn/status", payload) is not None:
+            return True
+        return self._control(handle, "PUT", "/v1/openvpn/status", payload) is not None
+
+    def _resource_kwargs(self, limits: Optional[Dict] = None) -> Dict:
+        limits = self.limits if limits is None else limits
+        kwargs = {}
+        memory = limits.get("memory")
+        if memory:
+            kwargs["mem_limit"] = memory
+            # Equal swap limit keeps a runaway tunnel from paging instead of being capped
+            kwargs["memswap_limit"] = memory
+        cpus = limits.get("cpus")
+        if cpus:
+            kwargs["nano_cpus"] = int(float(cpus) * 1e9)
+        if limits.get("pids"):
+            kwargs["pids_limit"] = int(limits["pids"])
+        if limits.get("cpuset_spread"):
+            kwargs["cpuset_cpus"] = _next_cpuset(int(limits.get("cpuset_size", 1)))
+        return kwargs
+
+
+class NetnsProxy:
+    """A tunnel running as plain processes inside a Linux network namespace."""
+
+    def __init__(self, meta: Dict) -> None:
+        self.meta = meta
+        self.id = meta["id"]
+        self.name = meta["name"]
+
+    @property
+    def status(self) -> str:
+        return "running" if _pid_alive(self.meta.get("openvpn_pid")) else "exited"
+
+
+class NetnsBackend(ProxyBackend):
+    """OpenVPN plus ``netns_proxy.py`` per network namespace, no container runtime.
+
+    Each proxy gets a namespace named after it, a /30 veth uplink out of
+    ``subnet`` that is masqueraded on the host, an ``openvpn`` process inside
+    the namespace and the tiny HTTP proxy, which serves a listening socket
+    bound on the host so clients keep using ``127.0.0.1:<port>``. State is
+    kept as JSON under ``state_dir`` so any manager instance can find it.
+    Requires root, ``ip``, ``iptables`` and ``openvpn`` on the host.
+    """
+
+    kind = "netns"
+
+    def __init__(self, state_dir: Path = Path("./db/netns"), subnet: str = "10.200.0.0/16",
+                 dns: str = "103.86.96.100", **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.subnet = ipaddress.ip_network(subnet)
+        self.dns = dns
+        self.proxy_script = Path(__file__).resolve().parent / "netns_proxy.py"
+
+    def launch(self, name: str, ovpn_file: Optional[Path], host_port: int, profile=None,
+               vpn_type: str = VPN_TYPE_OPENVPN):
+        if vpn_type != VPN_TYPE_OPENVPN:
+            logger.error(f"Netns backend only runs OpenVPN, not {vpn_type}")
+            return None
+        if ovpn_file is None:
+            logger.error("Netns backend needs an OpenVPN config file")
+            return None
+        # Launch profiles tune gluetun; plain OpenVPN processes have nothing to apply them to
+        meta = {"id": name, "name": name, "netns": name, "host_port": host_port,
+                "config": ovpn_file.name, "created": int(time.time())}
+        listener = None
+        try:
+            with _SLOT_LOCK:
+                slot = self._allocate_slot()
+                link = self.subnet.network_address + slot * 4
+                meta.update({"slot": slot, "host_ip": str(link + 1), "ns_ip": str(link + 2),
+                             "cidr": f"{link}/30", "veth_host": f"vph{slot}", "veth_ns": f"vpn{slot}"})
+                self._write_meta(meta)
+            self._setup_namespace(meta)
+            auth_file = self.state_dir / f"{name}.auth"
+            auth_file.write_text(f"{self.vpn_user or ''}\n{self.vpn_pass or ''}\n")
+            auth_file.chmod(0o600)
+            meta["auth_file"] = str(auth_file)
+            meta["openvpn_pid"] = self._start_openvpn(meta, ovpn_file)
+
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind(("0.0.0.0", host_port))
+            listener.listen(128)
+            proxy = subprocess.Popen(
+                ["ip", "netns", "exec", name, sys.executable, str(self.proxy_script),
+                 "--fd", str(listener.fileno())],
+                pass_fds=(listener.fileno(),),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            meta["proxy_pid"] = proxy.pid
+            self._write_meta(meta)
+            logger.info(f"Launched netns proxy {name}")
+            return NetnsProxy(meta)
+        except (OSError, subprocess.CalledProcessError, RuntimeError) as e:
+            logger.error(f"Failed to launch netns proxy: {e}")
+            self.remove(NetnsProxy(meta))
+            return None
+        finally:
+            if listener is not None:
+                listener.close()
+
+    def restart(self, handle) -> bool:
+        try:
+            _kill(handle.meta.get("openvpn_pid"), wait=5)
+            handle.meta["openvpn_pid"] = self._start_openvpn(
+                handle.meta, self.configs_dir / handle.meta["config"])
+            self._write_meta(handle.meta)
+            logger.info("Tunnel restarted")
+            return True
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.error(f"Failed to restart tunnel: {e}")
+            return False
+
+    def tunnel_status(self, handle) -> Dict:
+        return {"vpn": "running" if handle.status == "running" else "stopped", "public_ip": None}
+
+    def remove(self, handle) -> None:
+        meta = handle.meta
+        _kill(meta.get("proxy_pid"))
+        _kill(meta.get("openvpn_pid"))
+        if meta.get("cidr"):
+            _run(["iptables", "-t", "nat", "-D", "POSTROUTING", "-s", meta["cidr"], "-j", "MASQUERADE"],
+                 check=False)
+        _run(["ip", "netns", "del", meta["netns"]], check=False)
+        for suffix in (".json", ".auth", ".log"):
+            (self.state_dir / f"{meta['name']}{suffix}").unlink(missing_ok=True)
+        resolv = Path("/etc/netns") / meta["netns"] / "resolv.conf"
+        resolv.unlink(missing_ok=True)
+        try:
+            resolv.parent.rmdir()
+        except OSError:
+            pass
+
+    def get(self, name: str):
+        path = self.state_dir / f"{name}.json"
+        if not path.exists():
+            return None
+        return NetnsProxy(json.loads(path.read_text()))
+
+    def list(self) -> List:
+        return [NetnsProxy(json.loads(p.read_text())) for p in sorted(self.state_dir.glob("*.json"))]
+
+    def inspect(self, handle) -> Dict:
+        rss = sum(_rss_bytes(handle.meta.get(k)) for k in ("openvpn_pid", "proxy_pid"))
+        return {
+            "id": handle.id,
+            "name": handle.name,
+            "status": handle.status,
+            "http_port": handle.meta.get("host_port"),
+            "memory_bytes": rss,
+        }
+
+    def logs(self, handle, tail: int = 80) -> List[str]:
+        path = self.state_dir / f"{handle.name}.log"
+        try:
+            return path.read_text(errors="replace").splitlines()[-tail:]
+        except OSError:
+            return []
+
+    def stats(self, handle) -> Dict:
+        meta = handle.meta
+        cpu = sum(_cpu_seconds(meta.get(k)) for k in ("openvpn_pid", "proxy_pid"))
+        veth = Path("/sys/class/net") / meta.get("veth_host", "") / "statistics"
+        # Host side of the veth: its tx is what the namespace receives
+        return {
+            "cpu_seconds": cpu,
+            "memory_bytes": sum(_rss_bytes(meta.get(k)) for k in ("openvpn_pid", "proxy_pid")),
+            "memory_limit": None,
+            "net_rx_bytes": _read_int(veth / "tx_bytes"),
+            "net_tx_bytes": _read_int(veth / "rx_bytes"),
+        }
+
+    def _allocate_slot(self) -> int:
+        used = set()
+        for path in self.state_dir.glob("*.json"):
+            try:
+                used.add(json.loads(path.read_text()).get("slot"))
+            except Exception:
+                continue
+        for slot in range(self.subnet.num_addresses // 4):
+            if slot not in used:
+                return slot
+        raise RuntimeError("No free netns subnet slot")
+
+    def _setup_namespace(self, meta: Dict) -> None:
+        ns, vh, vn = meta["netns"], meta["veth_host"], meta["veth_ns"]
+        _run(["ip", "netns", "add", ns])
+        _run(["ip", "link", "add", vh, "type", "veth", "peer", "name", vn])
+        _run(["ip", "link", "set", vn, "netns", ns])
+        _run(["ip", "addr", "add", f"{meta['host_ip']}/30", "dev", vh])
+        _run(["ip", "link", "set", vh, "up"])
+        _run(["ip", "netns", "exec", ns, "ip", "addr", "add", f"{meta['ns_ip']}/30", "dev", vn])
+        _run(["ip", "netns", "exec", ns, "ip", "link", "set", vn, "up"])
+        _run(["ip", "netns", "exec", ns, "ip", "link", "set", "lo", "up"])
+        _run(["ip", "netns", "exec", ns, "ip", "route", "add", "default", "via", meta["host_ip"]])
+        _run(["sysctl", "-qw", "net.ipv4.ip_forward=1"])
+        _run(["iptables", "-t", "nat", "-A", "POSTROUTING", "-s", meta["cidr"], "-j", "MASQUERADE"])
+        resolv_dir = Path("/etc/netns") / ns
+        resolv_dir.mkdir(parents=True, exist_ok=True)
+        (resolv_dir / "resolv.conf").write_text(f"nameserver {self.dns}\n")
+
+    def _start_openvpn(self, meta: Dict, ovpn_file: Path) -> int:
+        log_path = self.state_dir / f"{meta['name']}.log"
+        with open(log_path, "ab") as log:
+            proc = subprocess.Popen(
+                ["ip", "netns", "exec", meta["netns"], "openvpn", "--config", str(ovpn_file.resolve()),
+                 "--auth-user-pass", meta["auth_file"], "--auth-nocache"],
+                cwd=str(self.state_dir),
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+        return proc.pid
+
+    def _write_meta(self, meta: Dict) -> None:
+        (self.state_dir / f"{meta['name']}.json").write_text(json.dumps(meta, indent=2))
+
+
+class FakeProxy:
+    def __init__(self, name: str, host_port: int, ip: str) -> None:
+        self.id = f"fake-{name}"
+        self.name = name
+        self.host_port = host_port
+        self.ip = ip
+        self.status = "running"
+        self.restarts = 0
+        self.profile: Optional[str] = None
+        self.config: Optional[str] = None
+        self.vpn_type = VPN_TYPE_OPENVPN
+
+
+class FakeBackend(ProxyBackend):
+    """In-memory backend for tests and load runs without Docker.
+
+    ``launch_delay``/``restart_delay`` simulate startup time, and names added
+    to ``unhealthy`` never validate. ``log_lines`` is what ``logs`` returns
+    for every proxy.
+    """
+
+    kind = "fake"
+    reports_public_ip = True
+
+    def __init__(self, launch_delay: float = 0.0, restart_delay: float = 0.0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.launch_delay = launch_delay
+        self.restart_delay = restart_delay
+        self.lock = Lock()
+        self.proxies: Dict[str, FakeProxy] = {}
+        self.by_port: Dict[int, str] = {}
+        self.unhealthy = set()
+        self.usage: Dict[str, Dict] = {}
+        self.fail_launches = 0
+        self.log_lines: List[str] = []
+        # Bytes/s reported by measure_throughput, per OpenVPN protocol
+        self.throughput: Dict[str, float] = {}
+        self._ips = itertools.count(1)
+
+    def launch(self, name: str, ovpn_file: Optional[Path], host_port: int, profile=None,
+               vpn_type: str = VPN_TYPE_OPENVPN):
+        if self.launch_delay:
+            time.sleep(self.launch_delay)
+        with self.lock:
+            if self.fail_launches > 0:
+                self.fail_launches -= 1
+                return None
+            proxy = FakeProxy(name, host_port, self._next_ip())
+            proxy.profile = profile.name if profile is not None else None
+            proxy.config = ovpn_file.name if ovpn_file is not None else None
+            proxy.vpn_type = vpn_type
+            self.proxies[name] = proxy
+            self.by_port[host_port] = name
+        return proxy
+
+    def wait_ready(self, handle, host_port: int, timeout: float, check=None, interval: float = 3) -> bool:
+        return handle.name not in self.unhealthy and handle.name in self.proxies
+
+    def restart(self, handle) -> bool:
+        if self.restart_delay:
+            time.sleep(self.restart_delay)
+        with self.lock:
+            if handle.name not in self.proxies:
+                return False
+            handle.restarts += 1
+            handle.ip = self._next_ip()
+        return True
+
+    def tunnel_status(self, handle) -> Dict:
+        running = handle.name in self.proxies and handle.name not in self.unhealthy
+        return {"vpn": "running" if running else "stopped", "public_ip": handle.ip if running else None}
+
+    def remove(self, handle) -> None:
+        with self.lock:
+            self.proxies.pop(handle.name, None)
+            self.by_port.pop(handle.host_port, None)
+
+    def get(self, name: str):
+        with self.lock:
+            return self.proxies.get(name)
+
+    def list(self) -> List:
+        with self.lock:
+            return list(self.proxies.values())
+
+    def inspect(self, handle) -> Dict:
+        return {"id": handle.id, "name": handle.name, "status": handle.status, "http_port": handle.host_port}
+
+    def logs(self, handle, tail: int = 80) -> List[str]:
+        return self.log_lines[-tail:]
+
+    def stats(self, handle) -> Dict:
+        sample = {"cpu_seconds": 0.0, "memory_bytes": 0, "memory_limit": None,
+                  "net_rx_bytes": 0, "net_tx_bytes": 0}
+        sample.update(self.usage.get(handle.name, {}))
+        return sample
+
+    def probe(self, host_port: int, target: str = PROBE_TARGET, timeout: float = 3) -> bool:
+        with self.lock:
+            name = self.by_port.get(host_port)
+        return name is not None and name not in self.unhealthy
+
+    def measure_throughput(self, host_port: int, url: str, max_bytes: int, timeout: float) -> Optional[float]:
+        with self.lock:
+            proxy = self.proxies.get(self.by_port.get(host_port))
+        if not proxy or not proxy.config:
+            return None
+        if proxy.vpn_type == VPN_TYPE_WIREGUARD:
+            return self.throughput.get(VPN_TYPE_WIREGUARD)
+        return self.throughput.get(protocol_of(proxy.config))
+
+    def validate(self, host_port: int) -> Tuple[Optional[str], Optional[str]]:
+        with self.lock:
+            proxy = self.proxies.get(self.by_port.get(host_port))
+        if not proxy or proxy.name in self.unhealthy:
+            return None, None
+        return self.proxy_url(host_port), proxy.ip
+
+    def _next_ip(self) -> str:
+        n = next(self._ips)
+        return f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+
+BACKENDS = {
+    GluetunBackend.kind: GluetunBackend,
+    NetnsBackend.kind: NetnsBackend,
+    FakeBackend.kind: FakeBackend,
+}
+
+_SHARED: Dict[str, ProxyBackend] = {}
+_SHARED_LOCK = Lock()
+_SLOT_LOCK = Lock()
+_CPUSET_LOCK = Lock()
+_cpuset_cursor = itertools.count()
+
+
+def create_backend(kind: str, share: bool = True, **kwargs) -> ProxyBackend:
+    """Build the backend named in config.json (``backend``, default gluetun).
+
+    The fake backend keeps its state in memory, so unless ``share`` is off
+    one instance is shared by every manager in the process.
+    """
+    kind = (kind or GluetunBackend.kind).lower()
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown proxy backend: {kind}")
+    if kind == FakeBackend.kind and share:
+        with _SHARED_LOCK:
+            if kind not in _SHARED:
+                _SHARED[kind] = FakeBackend(**kwargs)
+            return _SHARED[kind]
+    return BACKENDS[kind](**kwargs)
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _published_port(container, container_port: str) -> Optional[str]:
+    ports = container.attrs.get("NetworkSettings", {}).get("Ports", {}) or {}
+    mapping = ports.get(container_port)
+    if mapping:
+        return mapping[0].get("HostPort")
+    return None
+
+
+def _record_from_summary(summary: Dict) -> Dict:
+    """Inventory record from a ``GET /containers/json`` entry.
+
+    ``attrs`` mirrors the inspect layout closely enough for
+    ``_published_port`` and ``Container.name`` so cached records can be
+    turned into handles without another API call.
+    """
+    name = (summary.get("Names") or ["/"])[0].lstrip("/")
+    ports: Dict[str, List[Dict]] = {}
+    for p in summary.get("Ports") or []:
+        if p.get("PublicPort"):
+            key = f"{p['PrivatePort']}/{p.get('Type', 'tcp')}"
+            ports.setdefault(key, []).append({"HostIp": p.get("IP", ""), "HostPort": str(p["PublicPort"])})
+    attrs = {
+        "Id": summary.get("Id"),
+        "Name": f"/{name}",
+        "State": {"Status": summary.get("State")},
+        "NetworkSettings": {"Ports": ports},
+    }
+    http = ports.get(PROXY_PORT)
+    return {
+        "id": summary.get("Id"),
+        "name": name,
+        "status": summary.get("State"),
+        "http_port": http[0]["HostPort"] if http else None,
+        "attrs": attrs,
+    }
+
+
+def _next_cpuset(size: int) -> str:
+    """Round-robin contiguous core ranges across launches in this process."""
+    cores = os.cpu_count() or 1
+    size = max(1, min(size, cores))
+    with _CPUSET_LOCK:
+        start = (next(_cpuset_cursor) * size) % cores
+    picked = [(start + i) % cores for i in range(size)]
+    return ",".join(str(c) for c in picked)
+
+
+def _run(cmd: List[str], check: bool = True) -> subprocess.CompletedProcess:
+    return subprocess.run(cmd, check=check, capture_output=True, text=True)
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        # Reap our own exited children so they do not linger as zombies
+        os.waitpid(int(pid), os.WNOHANG)
+    except (ChildProcessError, ValueError):
+        pass
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def _kill(pid: Optional[int], wait: float = 0.0) -> None:
+    if not _pid_alive(pid):
+        return
+    try:
+        os.killpg(int(pid), signal.SIGTERM)
+    except OSError:
+        try:
+            os.kill(int(pid), signal.SIGTERM)
+        except OSError:
+            pass
+    deadline = time.time() + wait
+    while time.time() < deadline and _pid_alive(pid):
+        time.sleep(0.1)
+
+
+def _rss_bytes(pid: Optional[int]) -> int:
+    if not pid:
+        return 0
+    try:
+        for line in Path(f"/proc/{int(pid)}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _cpu_seconds(pid: Optional[int]) -> float:
+    if not pid:
+        return 0.0
+    try:
+        fields = Path(f"/proc/{int(pid)}/stat").read_text().rsplit(")", 1)[1].split()
+        # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def _read_int(path: Path) -> int:
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return 0
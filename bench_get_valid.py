@@ -0,0 +1,78 @@
+"""Benchmark ``ContainerPool.get_valid`` latency as the pool grows.
+
+Fills an in-memory pool (no Docker) with N valid entries and has 64 threads
+hand out proxies concurrently, then prints per-call latency percentiles for
+each size. With the indexed ring the numbers should stay flat from 6 to
+5,000 entries.
+
+    python bench_get_valid.py --sizes 6,60,600,5000 --threads 64 --calls 2000
+"""
+import argparse
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+import main
+
+
+def _fill(pool: "main.ContainerPool", size: int) -> None:
+    with pool.condition:
+        for i in range(size):
+            pool._store_valid_locked({
+                "status": "ok",
+                "container_id": f"id-{i}",
+                "container_name": f"bench-{i}",
+                "proxy_url": f"http://127.0.0.1:{9000 + i}",
+                "proxy_port": 9000 + i,
+                "ip_seen": f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+            })
+
+
+def run(size: int, threads: int, calls: int) -> Dict:
+    pool = main.ContainerPool(target_size=0, request_config=main.POOL.request_config,
+                              max_repair_attempts=2, monitor_config={"enabled": False})
+    _fill(pool, size)
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def caller(slot: int) -> None:
+        samples = latencies[slot]
+        barrier.wait()
+        for _ in range(calls):
+            start = time.perf_counter()
+            pool.get_valid()
+            samples.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=caller, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    flat = sorted(x for samples in latencies for x in samples)
+    return {
+        "size": size,
+        "calls": len(flat),
+        "p50_us": round(flat[len(flat) // 2] * 1e6, 1),
+        "p99_us": round(flat[int(len(flat) * 0.99)] * 1e6, 1),
+        "mean_us": round(statistics.fmean(flat) * 1e6, 1),
+        "calls_per_s": round(len(flat) / elapsed),
+    }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="6,60,600,5000")
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--calls", type=int, default=2000, help="get_valid calls per thread")
+    args = parser.parse_args()
+    print(f"{'entries':>8} {'p50 us':>8} {'p99 us':>8} {'mean us':>8} {'calls/s':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        r = run(size, args.threads, args.calls)
+        print(f"{r['size']:>8} {r['p50_us']:>8} {r['p99_us']:>8} {r['mean_us']:>8} {r['calls_per_s']:>10}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,219 @@
+import re
+import time
+import random
+import logging
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# "uk1234.nordvpn.com.udp.ovpn" -> "uk", "us-ca12.nordvpn.com.tcp.ovpn" -> "us-ca"
+COUNTRY_PATTERN = re.compile(r"^([a-z]{2}(?:-[a-z]+)?)\d")
+
+DEFAULT_CONFIG_THRESHOLD = 2
+DEFAULT_COUNTRY_THRESHOLD = 6
+DEFAULT_BASE_QUARANTINE = 60
+DEFAULT_MAX_QUARANTINE = 6 * 3600
+DEFAULT_DECAY_SECONDS = 3600
+DEFAULT_PROBATION_TIMEOUT = 300
+PICK_SAMPLES = 32
+
+
+def country_of(config_name: str) -> Optional[str]:
+    match = COUNTRY_PATTERN.match(config_name.lower())
+    return match.group(1) if match else None
+
+
+class Breaker:
+    """Closed -> open (quarantined) -> half-open (one probation trial) -> closed."""
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.failures = 0
+        self.level = 0
+        self.open_until = 0.0
+        self.last_trip = 0.0
+        self.trial_started: Optional[float] = None
+        self.last_reason: Optional[str] = None
+
+    def state(self, now: float) -> str:
+        if now < self.open_until:
+            return "open"
+        # Quarantine over but no attempt has passed probation yet
+        return "half_open" if self.open_until else "closed"
+
+    def describe(self, now: float) -> Dict:
+        return {
+            "key": self.key,
+            "state": self.state(now),
+            "level": self.level,
+            "failures": self.failures,
+            "open_for": max(0, round(self.open_until - now)),
+            "reason": self.last_reason,
+        }
+
+
+class ConfigBreakers:
+    """Circuit breakers per OpenVPN config and per country.
+
+    Creation and repair outcomes and client reports feed ``record_failure``
+    and ``record_success``. ``config_threshold`` consecutive failures of one
+    config (or ``country_threshold`` across a country's configs) open its
+    breaker for ``base_quarantine * 2**level`` seconds, capped at
+    ``max_quarantine``. When the quarantine ends the breaker is half-open:
+    ``pick`` hands the config out to a single probation attempt, and that
+    attempt's outcome closes the breaker or re-opens it one level higher.
+    Levels decay by one per ``decay_seconds`` without a trip, so a server
+    that recovered is not punished forever.
+
+    Replaces the permanent bad list: ``bad_connections.json`` reports now
+    trip the breaker once instead of removing the config from the catalog.
+    """
+
+    def __init__(self, config_threshold: int = DEFAULT_CONFIG_THRESHOLD,
+                 country_threshold: int = DEFAULT_COUNTRY_THRESHOLD,
+                 base_quarantine: float = DEFAULT_BASE_QUARANTINE,
+                 max_quarantine: float = DEFAULT_MAX_QUARANTINE,
+                 decay_seconds: float = DEFAULT_DECAY_SECONDS,
+                 probation_timeout: float = DEFAULT_PROBATION_TIMEOUT) -> None:
+        self.config_threshold = max(1, int(config_threshold))
+        self.country_threshold = max(1, int(country_threshold))
+        self.base_quarantine = float(base_quarantine)
+        self.max_quarantine = float(max_quarantine)
+        self.decay_seconds = float(decay_seconds)
+        self.probation_timeout = float(probation_timeout)
+        self.lock = Lock()
+        self.breakers: Dict[str, Breaker] = {}
+        self.seeded = set()
+
+    # Selection
+    def allows(self, config_name: str, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        with self.lock:
+            return self._allows_locked(config_name, now)
+
+    def pick(self, candidates: Sequence, exclude: Iterable[str] = ()) -> Optional[object]:
+        """Random candidate (``Path`` or name) whose config and country breakers allow it.
+
+        Draws are rejection sampled, so skipping quarantined configs costs a
+        dict lookup each; only a mostly-open catalog falls back to a scan.
+        A half-open pick claims that breaker's probation slot.
+        """
+        if not candidates:
+            return None
+        exclude = set(exclude)
+        now = time.time()
+        with self.lock:
+            for _ in range(min(PICK_SAMPLES, len(candidates))):
+                candidate = random.choice(candidates)
+                name = getattr(candidate, "name", candidate)
+                if name not in exclude and self._allows_locked(name, now):
+                    self._claim_locked(name, now)
+                    return candidate
+            allowed = [c for c in candidates
+                       if getattr(c, "name", c) not in exclude and self._allows_locked(getattr(c, "name", c), now)]
+            if not allowed:
+                return None
+            candidate = random.choice(allowed)
+            self._claim_locked(getattr(candidate, "name", candidate), now)
+            return candidate
+
+    # Outcomes
+    def record_success(self, config_name: Optional[str]) -> None:
+        if not config_name:
+            return
+        now = time.time()
+        with self.lock:
+            for key in self._keys(config_name):
+                breaker = self.breakers.get(key)
+                if breaker is None:
+                    continue
+                if breaker.state(now) == "half_open":
+                    logger.info("Breaker %s closed after successful probation", key)
+                    breaker.open_until = 0.0
+                breaker.failures = 0
+                breaker.trial_started = None
+                self._decay_locked(breaker, now)
+
+    def record_failure(self, config_name: Optional[str], reason: Optional[str] = None,
+                       trip: bool = False) -> None:
+        """Count a failed attempt; ``trip`` opens the config breaker immediately (client reports)."""
+        if not config_name:
+            return
+        now = time.time()
+        with self.lock:
+            for key in self._keys(config_name):
+                breaker = self.breakers.setdefault(key, Breaker(key))
+                breaker.failures += 1
+                breaker.last_reason = reason
+                threshold = self.country_threshold if key.startswith("country:") else self.config_threshold
+                on_probation = breaker.trial_started is not None
+                breaker.trial_started = None
+                if on_probation or breaker.failures >= threshold or (trip and key.startswith("config:")):
+                    self._open_locked(breaker, now)
+
+    def seed_reports(self, items: List[Dict]) -> None:
+        """Trip breakers for ``bad_connections.json`` reports not seen before."""
+        for item in items:
+            name = item.get("config_name")
+            marker = (name, item.get("timestamp"))
+            if not name or marker in self.seeded:
+                continue
+            self.seeded.add(marker)
+            self.record_failure(name, item.get("reason") or "reported", trip=True)
+
+    def snapshot(self) -> List[Dict]:
+        now = time.time()
+        with self.lock:
+            for breaker in list(self.breakers.values()):
+                self._decay_locked(breaker, now)
+            return [b.describe(now) for b in sorted(self.breakers.values(), key=lambda b: b.key)]
+
+    def _keys(self, config_name: str) -> List[str]:
+        keys = [f"config:{config_name}"]
+        country = country_of(config_name)
+        if country:
+            keys.append(f"country:{country}")
+        return keys
+
+    def _allows_locked(self, config_name: str, now: float) -> bool:
+        for key in self._keys(config_name):
+            breaker = self.breakers.get(key)
+            if breaker is None:
+                continue
+            state = breaker.state(now)
+            if state == "open":
+                return False
+            if state == "half_open" and breaker.trial_started is not None:
+                if now - breaker.trial_started < self.probation_timeout:
+                    return False
+                # The probation attempt never reported back; let another one try
+                breaker.trial_started = None
+        return True
+
+    def _claim_locked(self, config_name: str, now: float) -> None:
+        for key in self._keys(config_name):
+            breaker = self.breakers.get(key)
+            if breaker is not None and breaker.state(now) == "half_open":
+                breaker.trial_started = now
+
+    def _open_locked(self, breaker: Breaker, now: float) -> None:
+        self._decay_locked(breaker, now)
+        duration = min(self.max_quarantine, self.base_quarantine * (2 ** breaker.level))
+        breaker.open_until = now + duration
+        breaker.last_trip = now
+        breaker.level += 1
+        breaker.failures = 0
+        logger.warning("Breaker %s open for %ss (level %s, %s)", breaker.key, int(duration),
+                       breaker.level, breaker.last_reason)
+
+    def _decay_locked(self, breaker: Breaker, now: float) -> None:
+        """Drop one quarantine level per ``decay_seconds`` since the last trip;
+        closed breakers with nothing left to remember are discarded."""
+        if breaker.level and self.decay_seconds > 0:
+            steps = int((now - breaker.last_trip) // self.decay_seconds)
+            if steps > 0:
+                breaker.level = max(0, breaker.level - steps)
+                breaker.last_trip += steps * self.decay_seconds
+        if not breaker.level and not breaker.failures and breaker.state(now) == "closed":
+            self.breakers.pop(breaker.key, None)
@@ -0,0 +1,117 @@
+import time
+from collections import deque
+from threading import Lock
+from typing import Dict, Optional
+
+
+class ExitIPIndex:
+    """Track which egress IP each pool container holds.
+
+    An IP is available to a container when no other container currently holds
+    it and it has not been released within the last ``history_seconds``. The
+    IP a container held before a rotation goes into the history too, so a
+    restart that comes back with the same address counts as a collision.
+    """
+
+    def __init__(self, history_seconds: int = 900) -> None:
+        self.history_seconds = max(0, int(history_seconds))
+        self.lock = Lock()
+        self.by_ip: Dict[str, str] = {}
+        self.by_name: Dict[str, str] = {}
+        self.recent: Dict[str, float] = {}
+        self.recent_order = deque()
+        self.collisions = 0
+        self.unique_seen = set()
+
+    def reserve(self, name: str, ip: Optional[str]) -> bool:
+        """Atomically bind ``ip`` to ``name`` unless it is held or recently used."""
+        if not ip:
+            return False
+        with self.lock:
+            self._expire_locked()
+            if not self._available_locked(ip):
+                self.collisions += 1
+                return False
+            self._bind_locked(name, ip)
+            return True
+
+    def assign(self, name: str, ip: Optional[str]) -> None:
+        """Record ``ip`` for ``name`` without a collision check."""
+        if not ip:
+            return
+        with self.lock:
+            self._expire_locked()
+            self._bind_locked(name, ip)
+
+    def is_available(self, ip: Optional[str]) -> bool:
+        if not ip:
+            return False
+        with self.lock:
+            self._expire_locked()
+            return self._available_locked(ip)
+
+    def release(self, name: str) -> None:
+        with self.lock:
+            ip = self.by_name.pop(name, None)
+            if ip and self.by_ip.get(ip) == name:
+                self.by_ip.pop(ip, None)
+                self._remember_locked(ip)
+
+    def ip_of(self, name: str) -> Optional[str]:
+        with self.lock:
+            return self.by_name.get(name)
+
+    def distinct_count(self) -> int:
+        with self.lock:
+            return len(self.by_ip)
+
+    def clear(self) -> None:
+        with self.lock:
+            for ip in list(self.by_ip):
+                self._remember_locked(ip)
+            self.by_ip.clear()
+            self.by_name.clear()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            self._expire_locked()
+            return {
+                "distinct_ips": len(self.by_ip),
+                "containers": len(self.by_name),
+                "recent_ips": len(self.recent),
+                "unique_ips_seen": len(self.unique_seen),
+                "collisions": self.collisions,
+                "history_seconds": self.history_seconds,
+            }
+
+    def _available_locked(self, ip: str) -> bool:
+        return ip not in self.by_ip and ip not in self.recent
+
+    def _bind_locked(self, name: str, ip: str) -> None:
+        previous = self.by_name.get(name)
+        if previous == ip:
+            return
+        if previous and self.by_ip.get(previous) == name:
+            self.by_ip.pop(previous, None)
+            self._remember_locked(previous)
+        holder = self.by_ip.get(ip)
+        if holder and holder != name:
+            self.by_name.pop(holder, None)
+        self.by_ip[ip] = name
+        self.by_name[name] = ip
+        self.recent.pop(ip, None)
+        self.unique_seen.add(ip)
+
+    def _remember_locked(self, ip: str) -> None:
+        if self.history_seconds <= 0:
+            return
+        now = time.time()
+        self.recent[ip] = now
+        self.recent_order.append((now, ip))
+
+    def _expire_locked(self) -> None:
+        cutoff = time.time() - self.history_seconds
+        while self.recent_order and self.recent_order[0][0] <= cutoff:
+            stamp, ip = self.recent_order.popleft()
+            if self.recent.get(ip) == stamp:
+                self.recent.pop(ip, None)
@@ -0,0 +1,121 @@
+import re
+import time
+import hashlib
+import logging
+from threading import Lock
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_TAIL_LINES = 80
+
+# Reason -> what the create path does about it
+POLICY_HALT = "halt"              # nothing will work until an operator fixes config.json
+POLICY_QUARANTINE = "quarantine"  # this config/server is bad; trip its breaker and pick another
+POLICY_BACKOFF = "backoff"        # host/upstream network trouble; stop churning and retry later
+POLICY_RETRY = "retry"            # unknown; the usual attempt loop
+
+REASON_POLICIES = {
+    "auth_failed": POLICY_HALT,
+    "tls_error": POLICY_QUARANTINE,
+    "config_error": POLICY_QUARANTINE,
+    "server_unreachable": POLICY_QUARANTINE,
+    "network_error": POLICY_BACKOFF,
+}
+
+# Checked in order; the first reason with a match in the tail wins
+REASON_PATTERNS = [
+    ("auth_failed", re.compile(r"AUTH_FAILED|auth[- ]failure|authentication failed|"
+                               r"Received control message: AUTH_FAILED", re.I)),
+    # A missing file only counts when OpenVPN was loading its config, a cert or a key
+    ("config_error", re.compile(r"Options error|Cannot load (?:CA|certificate|inline certificate)|"
+                                r"Unrecognized option|error parsing|Error opening configuration file|"
+                                r"(?:--[\w-]+|\.(?:ovpn|conf|crt|pem|key))\b[^\n]*No such file or directory",
+                                re.I)),
+    ("tls_error", re.compile(r"TLS Error|TLS handshake failed|tls-error|VERIFY ERROR|"
+                             r"certificate verify failed|TLS key negotiation failed", re.I)),
+    # Host-wide: no other config will do better until the network/DNS recovers
+    ("network_error", re.compile(r"Network is unreachable|Cannot resolve host|RESOLVE: Cannot|"
+                                 r"Temporary failure in name resolution", re.I)),
+    # One remote is down or overloaded; another server will likely work
+    ("server_unreachable", re.compile(r"Connection refused|Connection timed out|No route to host", re.I)),
+]
+
+
+def classify(lines: Iterable[str]) -> Optional[str]:
+    """Reason for a failed tunnel from its log tail, or None when nothing is recognised."""
+    text = "\n".join(line for line in lines if line)
+    if not text:
+        return None
+    for reason, pattern in REASON_PATTERNS:
+        if pattern.search(text):
+            return reason
+    return None
+
+
+def policy_for(reason: Optional[str]) -> str:
+    return REASON_POLICIES.get(reason, POLICY_RETRY)
+
+
+def credentials_fingerprint(user: Optional[str], password: Optional[str]) -> str:
+    return hashlib.sha256(f"{user or ''}:{password or ''}".encode()).hexdigest()[:16]
+
+
+class CreateHalt:
+    """Pool-wide stop for creates after an unrecoverable failure (bad credentials).
+
+    The halt remembers the credentials it was raised for and lifts by itself
+    once config.json carries different ones; ``clear`` lifts it by hand.
+    """
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.reason: Optional[str] = None
+        self.detail: Optional[str] = None
+        self.fingerprint: Optional[str] = None
+        self.since: Optional[float] = None
+        self.blocked = 0
+
+    def trip(self, reason: str, fingerprint: Optional[str] = None, detail: Optional[str] = None) -> None:
+        with self.lock:
+            if self.reason is None:
+                self.since = time.time()
+                logger.error("Creates halted pool-wide: %s (%s)", reason, detail or "see container logs")
+            self.reason = reason
+            self.detail = detail
+            self.fingerprint = fingerprint
+
+    def active(self, fingerprint: Optional[str] = None) -> bool:
+        """Whether creates are halted; a new credentials ``fingerprint`` lifts the halt."""
+        with self.lock:
+            if self.reason is None:
+                return False
+            if fingerprint is not None and self.fingerprint is not None and fingerprint != self.fingerprint:
+                logger.info("Credentials changed; lifting %s halt", self.reason)
+                self._clear_locked()
+                return False
+            return True
+
+    def block(self) -> None:
+        with self.lock:
+            self.blocked += 1
+
+    def clear(self) -> bool:
+        with self.lock:
+            was_active = self.reason is not None
+            self._clear_locked()
+            return was_active
+
+    def alert(self) -> Optional[Dict]:
+        with self.lock:
+            if self.reason is None:
+                return None
+            return {"reason": self.reason, "detail": self.detail, "since": int(self.since),
+                    "blocked_creates": self.blocked}
+
+    def _clear_locked(self) -> None:
+        self.reason = None
+        self.detail = None
+        self.fingerprint = None
+        self.since = None
+        self.blocked = 0
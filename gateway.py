@@ -0,0 +1,279 @@
+import time
+import base64
+import asyncio
+import logging
+from contextlib import contextmanager
+from threading import Condition, Thread
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GATEWAY_PORT = 3128
+DEFAULT_SESSION_TTL = 600
+DEFAULT_DRAIN_SECONDS = 10
+CONNECT_TIMEOUT = 10
+MAX_HEAD_BYTES = 64 * 1024
+RELAY_CHUNK = 65536
+# Stripped before the request goes upstream; plain HTTP is forced to one request per connection
+HOP_HEADERS = {"proxy-authorization", "proxy-connection", "connection", "keep-alive"}
+
+
+def parse_username(username: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """``(profile, session)`` from a proxy-auth username such as
+    ``session-abc``, ``profile-fast`` or ``profile-fast-session-abc``."""
+    profile = session = None
+    parts = (username or "").split("-")
+    i = 0
+    while i < len(parts):
+        key = parts[i].lower()
+        if key in ("profile", "session") and i + 1 < len(parts):
+            value = "-".join(parts[i + 1:]) if key == "session" else parts[i + 1]
+            if key == "session":
+                session = value
+                break
+            profile = value
+            i += 2
+        else:
+            i += 1
+    return profile, session
+
+
+def _proxy_username(head: bytes) -> Optional[str]:
+    for line in head.decode("latin-1").split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "proxy-authorization":
+            scheme, _, token = value.strip().partition(" ")
+            if scheme.lower() == "basic":
+                try:
+                    return base64.b64decode(token).decode("utf-8", "replace").partition(":")[0]
+                except ValueError:
+                    return None
+    return None
+
+
+def _upstream_head(head: bytes) -> bytes:
+    lines = head.decode("latin-1").split("\r\n")
+    method = lines[0].split(" ", 1)[0].upper()
+    headers = [h for h in lines[1:] if h and h.split(":", 1)[0].strip().lower() not in HOP_HEADERS]
+    if method != "CONNECT":
+        headers.append("Connection: close")
+    return ("\r\n".join([lines[0]] + headers) + "\r\n\r\n").encode("latin-1")
+
+
+def _upstream_address(entry: Dict) -> Optional[Tuple[str, int]]:
+    url = urlsplit(entry.get("proxy_url") or "")
+    port = entry.get("proxy_port") or url.port
+    if not port:
+        return None
+    host = url.hostname or "127.0.0.1"
+    return ("127.0.0.1" if host == "0.0.0.0" else host), int(port)
+
+
+def _reply(status: str) -> bytes:
+    return f"HTTP/1.1 {status}\r\nConnection: close\r\nContent-Length: 0\r\n\r\n".encode()
+
+
+class Gateway:
+    """One HTTP/CONNECT listener in front of every pool.
+
+    Each client connection is routed to a valid container of the pool named
+    by its proxy-auth username (``profile-<name>``, default pool otherwise).
+    With ``session-<id>`` in the username the connection sticks to the
+    container the session used last, for ``session_ttl`` seconds after its
+    last use; without it every connection (and so every plain HTTP request,
+    which is sent upstream with ``Connection: close``) takes the next
+    container in rotation. Containers leave rotation as soon as the pool
+    marks them invalid; ``drain`` lets a restart wait for their open
+    connections to finish first.
+    """
+
+    def __init__(self, pools: Dict, default: str, host: str = "0.0.0.0", port: int = DEFAULT_GATEWAY_PORT,
+                 session_ttl: float = DEFAULT_SESSION_TTL, drain_seconds: float = DEFAULT_DRAIN_SECONDS) -> None:
+        self.pools = pools
+        self.default = default
+        self.host = host
+        self.port = int(port)
+        self.session_ttl = float(session_ttl)
+        self.drain_seconds = float(drain_seconds)
+        self.condition = Condition()
+        # (pool, session) -> (container name, expires at)
+        self.sessions: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self.active: Dict[str, int] = {}
+        self.counters = {"connections": 0, "rejected": 0, "upstream_failures": 0, "drained": 0,
+                         "drain_timeouts": 0}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        for pool in self.pools.values():
+            pool.drain_hook = self.drain
+            pool.drain_seconds = self.drain_seconds
+        Thread(target=self._run, name="proxy-gateway", daemon=True).start()
+
+    def _run(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            server = self.loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port,
+                                                                       limit=MAX_HEAD_BYTES))
+        except OSError as e:
+            logger.error("Proxy gateway could not listen on %s:%s: %s", self.host, self.port, e)
+            self.loop.close()
+            return
+        logger.info("Proxy gateway listening on %s:%s", self.host, self.port)
+        try:
+            self.loop.run_forever()
+        finally:
+            server.close()
+
+    # Routing
+    def route(self, username: Optional[str], exclude: Optional[str] = None) -> Optional[Tuple[str, Dict]]:
+        """``(container name, entry)`` for a new connection, or None when nothing is available."""
+        profile, session = parse_username(username)
+        pool = self.pools.get(profile or self.default)
+        if pool is None:
+            return None
+        now = time.time()
+        key = (pool.name, session) if session else None
+        if key is not None:
+            with self.condition:
+                pinned = self.sessions.get(key)
+            if pinned and pinned[1] > now and pinned[0] != exclude:
+                entry = pool.registry.get(pinned[0])
+                if entry is not None and entry.get("state") == "valid":
+                    self._pin(key, pinned[0], now)
+                    return pinned[0], entry
+        for _ in range(2):
+            entry = pool.get_valid()
+            if not entry:
+                return None
+            name = entry["container_name"]
+            if name != exclude or len(pool.valid_queue) < 2:
+                break
+        if key is not None:
+            self._pin(key, name, now)
+        return name, entry
+
+    def _pin(self, key: Tuple[str, str], name: str, now: float) -> None:
+        with self.condition:
+            self.sessions[key] = (name, now + self.session_ttl)
+            if len(self.sessions) > 1024 and len(self.sessions) % 256 == 0:
+                for stale in [k for k, (_, expires) in self.sessions.items() if expires <= now]:
+                    self.sessions.pop(stale, None)
+
+    # Draining
+    @contextmanager
+    def _tracked(self, name: str):
+        with self.condition:
+            self.active[name] = self.active.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.active[name] -= 1
+                if not self.active[name]:
+                    del self.active[name]
+                self.condition.notify_all()
+
+    def drain(self, name: str, timeout: Optional[float] = None) -> bool:
+        """Block until ``name`` has no open gateway connections (or ``timeout``).
+
+        ``timeout=0`` only checks; pool workers poll that way instead of waiting.
+        """
+        deadline = time.time() + (self.drain_seconds if timeout is None else timeout)
+        with self.condition:
+            if not self.active.get(name):
+                return True
+            if timeout == 0:
+                return False
+            logger.info("Draining %s gateway connections off %s", self.active[name], name)
+            while self.active.get(name):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.counters["drain_timeouts"] += 1
+                    return False
+                self.condition.wait(remaining)
+            self.counters["drained"] += 1
+            return True
+
+    def stats(self) -> Dict:
+        now = time.time()
+        with self.condition:
+            return {
+                "listen": f"{self.host}:{self.port}",
+                "active": dict(self.active),
+                "sessions": sum(1 for _, expires in self.sessions.values() if expires > now),
+                **self.counters,
+            }
+
+    # Connections
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        upstream_writer = None
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            username = _proxy_username(head)
+            opened = await self._open_upstream(username)
+            if opened is None:
+                with self.condition:
+                    self.counters["rejected"] += 1
+                writer.write(_reply("503 Service Unavailable"))
+                await writer.drain()
+                return
+            name, upstream_reader, upstream_writer = opened
+            with self.condition:
+                self.counters["connections"] += 1
+            with self._tracked(name):
+                upstream_writer.write(_upstream_head(head))
+                await asyncio.gather(self._pipe(reader, upstream_writer), self._pipe(upstream_reader, writer))
+        except (ConnectionError, OSError) as e:
+            logger.debug("Gateway connection failed: %s", e)
+        finally:
+            for w in (upstream_writer, writer):
+                if w is not None:
+                    w.close()
+
+    async def _open_upstream(self, username: Optional[str]):
+        failed = None
+        loop = asyncio.get_running_loop()
+        for _ in range(2):
+            # get_valid can block (a SQLite write with shared_state); keep it off the relay loop
+            routed = await loop.run_in_executor(None, self.route, username, failed)
+            if routed is None:
+                return None
+            name, entry = routed
+            address = _upstream_address(entry)
+            if address is None:
+                failed = name
+                continue
+            try:
+                upstream_reader, upstream_writer = await asyncio.wait_for(
+                    asyncio.open_connection(*address), timeout=CONNECT_TIMEOUT)
+                return name, upstream_reader, upstream_writer
+            except (OSError, asyncio.TimeoutError) as e:
+                logger.warning("Gateway could not reach %s at %s:%s: %s", name, address[0], address[1], e)
+                with self.condition:
+                    self.counters["upstream_failures"] += 1
+                # One retry on another container; the health monitor deals with this one
+                failed = name
+        return None
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                data = await reader.read(RELAY_CHUNK)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            try:
+                if writer.can_write_eof():
+                    writer.write_eof()
+            except (OSError, RuntimeError):
+                pass
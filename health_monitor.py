@@ -0,0 +1,182 @@
+import time
+import heapq
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROBE_INTERVAL = 30
+DEFAULT_FULL_INTERVAL = 600
+DEFAULT_JITTER = 0.2
+DEFAULT_FAILURE_THRESHOLD = 2
+DEFAULT_RETRY_DELAY = 2
+DEFAULT_CONCURRENCY = 4
+
+
+class HealthMonitor:
+    """Background checks for every valid proxy on a jittered, staggered schedule.
+
+    Each tracked proxy gets a cheap ``probe`` (a CONNECT through the proxy)
+    every ``probe_interval`` seconds and a full ``validate`` (exit IP check)
+    once ``full_interval`` has passed since its last full result. Start
+    times are spread across the interval and every reschedule is jittered,
+    so checks never arrive at the daemon in bursts. A full validation
+    failure, or ``failure_threshold`` probe failures in a row (re-probed
+    after ``retry_delay``), hands the proxy to ``on_failure``.
+
+    Results are cached per proxy: a successful create, repair or client
+    triggered check recorded via ``track(..., validated=True)`` counts as a
+    fresh full result and pushes the next check out.
+    """
+
+    def __init__(self, probe: Callable[[str], Dict], validate: Callable[[str], Dict],
+                 on_failure: Callable[[str, Dict], None],
+                 on_validated: Optional[Callable[[str, Dict], None]] = None,
+                 probe_interval: float = DEFAULT_PROBE_INTERVAL,
+                 full_interval: float = DEFAULT_FULL_INTERVAL,
+                 jitter: float = DEFAULT_JITTER,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 retry_delay: float = DEFAULT_RETRY_DELAY,
+                 concurrency: int = DEFAULT_CONCURRENCY) -> None:
+        self.probe = probe
+        self.validate = validate
+        self.on_failure = on_failure
+        self.on_validated = on_validated
+        self.probe_interval = max(0.1, float(probe_interval))
+        self.full_interval = max(self.probe_interval, float(full_interval))
+        self.jitter = min(max(0.0, float(jitter)), 0.9)
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.retry_delay = max(0.0, float(retry_delay))
+        self.concurrency = max(1, int(concurrency))
+        self.condition = Condition()
+        # name -> cached result: last_ok, last_kind, last_check, last_full, failures, due
+        self.results: Dict[str, Dict] = {}
+        self.schedule: List[Tuple[float, str]] = []
+        self.counters = {"probes": 0, "full_checks": 0, "probe_failures": 0,
+                         "full_failures": 0, "invalidated": 0}
+
+    # Tracking
+    def track(self, name: str, validated: bool = False) -> None:
+        now = time.time()
+        with self.condition:
+            result = self.results.get(name)
+            if result is None:
+                result = {"last_ok": None, "last_kind": None, "last_check": None,
+                          "last_full": None, "failures": 0, "due": None}
+                self.results[name] = result
+                # First check lands anywhere in the interval so a fill doesn't probe in lockstep
+                due = now + random.uniform(0, self.probe_interval)
+            else:
+                due = now + self._jittered(self.probe_interval)
+            if validated:
+                result.update(last_ok=True, last_kind="full", last_check=now, last_full=now, failures=0)
+            self._schedule_locked(name, due)
+
+    def forget(self, name: str) -> None:
+        with self.condition:
+            self.results.pop(name, None)
+
+    def clear(self) -> None:
+        with self.condition:
+            self.results.clear()
+            self.schedule.clear()
+
+    # Scheduling
+    def due(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Pop every proxy whose check is due as ``(name, "probe"|"full")``."""
+        now = time.time() if now is None else now
+        picked = []
+        with self.condition:
+            while self.schedule and self.schedule[0][0] <= now:
+                due, name = heapq.heappop(self.schedule)
+                result = self.results.get(name)
+                # Stale heap entries (forgotten or rescheduled proxies) are skipped lazily
+                if result is None or result["due"] != due:
+                    continue
+                result["due"] = None
+                last_full = result["last_full"] or 0
+                picked.append((name, "full" if now - last_full >= self.full_interval else "probe"))
+        return picked
+
+    def run_once(self, now: Optional[float] = None) -> Dict[str, bool]:
+        """Check every due proxy and return ``{name: ok}``."""
+        picked = self.due(now)
+        if not picked:
+            return {}
+        if len(picked) == 1 or self.concurrency == 1:
+            outcomes = [self._check(name, kind) for name, kind in picked]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(picked))) as pool:
+                outcomes = list(pool.map(lambda p: self._check(*p), picked))
+        return {name: ok for (name, _), ok in zip(picked, outcomes)}
+
+    def loop(self) -> None:
+        while True:
+            with self.condition:
+                wait = self.probe_interval
+                if self.schedule:
+                    wait = min(wait, max(0.0, self.schedule[0][0] - time.time()))
+                if wait > 0:
+                    self.condition.wait(timeout=wait)
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Health monitor pass failed")
+
+    def stats(self) -> Dict:
+        with self.condition:
+            unhealthy = sorted(n for n, r in self.results.items() if r["last_ok"] is False)
+            return {
+                "tracked": len(self.results),
+                "probe_interval": self.probe_interval,
+                "full_interval": self.full_interval,
+                "failing": unhealthy,
+                **self.counters,
+            }
+
+    def _check(self, name: str, kind: str) -> bool:
+        try:
+            result = self.validate(name) if kind == "full" else self.probe(name)
+        except Exception as exc:
+            result = {"status": "error", "message": str(exc)}
+        ok = result.get("status") == "ok"
+        now = time.time()
+        failed = False
+        with self.condition:
+            self.counters["full_checks" if kind == "full" else "probes"] += 1
+            cached = self.results.get(name)
+            if cached is None:
+                # Removed or invalidated elsewhere while the check ran
+                return ok
+            cached.update(last_ok=ok, last_kind=kind, last_check=now)
+            if ok:
+                cached["failures"] = 0
+                if kind == "full":
+                    cached["last_full"] = now
+                self._schedule_locked(name, now + self._jittered(self.probe_interval))
+            else:
+                cached["failures"] += 1
+                self.counters["full_failures" if kind == "full" else "probe_failures"] += 1
+                if kind == "full" or cached["failures"] >= self.failure_threshold:
+                    self.results.pop(name, None)
+                    self.counters["invalidated"] += 1
+                    failed = True
+                else:
+                    self._schedule_locked(name, now + self.retry_delay)
+        if failed:
+            logger.warning("Health monitor: %s failed %s check (%s)", name, kind, result.get("message"))
+            self.on_failure(name, result)
+        elif ok and kind == "full" and self.on_validated is not None:
+            self.on_validated(name, result)
+        return ok
+
+    def _schedule_locked(self, name: str, due: float) -> None:
+        self.results[name]["due"] = due
+        heapq.heappush(self.schedule, (due, name))
+        self.condition.notify()
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
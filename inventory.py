@@ -0,0 +1,133 @@
+import time
+import logging
+from threading import Lock, Thread
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 60
+WATCH_RETRY_SECONDS = 5
+# Actions after which a container's published ports or state may differ
+REFRESH_ACTIONS = {"create", "start", "restart", "die", "stop", "kill", "pause", "unpause", "rename", "update"}
+
+
+class ProxyInventory:
+    """In-memory view of the proxies each backend runs, kept current from events.
+
+    Every backend (one per Docker host) is a source. The first ``attach``
+    lists it once; after that a watcher thread applies the backend's event
+    stream so reads never touch the daemon. Backends without events are
+    relisted when their snapshot is older than ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS, watch: bool = True) -> None:
+        self.ttl = ttl
+        self.watch = watch
+        self.lock = Lock()
+        self.sources: Dict[str, object] = {}
+        self.records: Dict[str, Dict] = {}
+        self.owner: Dict[str, str] = {}
+        self.refreshed_at: Dict[str, float] = {}
+        self.watching = set()
+        self.events_applied = 0
+
+    def attach(self, key: str, backend) -> None:
+        with self.lock:
+            if key in self.sources:
+                return
+            self.sources[key] = backend
+        self.refresh(key)
+        if self.watch and getattr(backend, "supports_events", False):
+            Thread(target=self._watch_loop, args=(key, backend), name=f"inventory-{key}", daemon=True).start()
+
+    def refresh(self, key: Optional[str] = None) -> None:
+        """Relist one source (or all of them) from the daemon."""
+        with self.lock:
+            keys = [key] if key else list(self.sources)
+        for k in keys:
+            backend = self.sources.get(k)
+            if backend is None:
+                continue
+            records = backend.snapshot()
+            with self.lock:
+                for name in [n for n, owner in self.owner.items() if owner == k]:
+                    self.records.pop(name, None)
+                    self.owner.pop(name, None)
+                for record in records:
+                    self.records[record["name"]] = record
+                    self.owner[record["name"]] = k
+                self.refreshed_at[k] = time.time()
+
+    def items(self) -> List[Dict]:
+        self._refresh_stale()
+        with self.lock:
+            return [dict(r, source=self.owner.get(n)) for n, r in self.records.items()]
+
+    def get(self, name: str) -> Optional[Dict]:
+        self._refresh_stale()
+        with self.lock:
+            record = self.records.get(name)
+            return dict(record, source=self.owner.get(name)) if record else None
+
+    def put(self, key: str, record: Dict) -> None:
+        with self.lock:
+            self.records[record["name"]] = record
+            self.owner[record["name"]] = key
+
+    def discard(self, name: str) -> None:
+        with self.lock:
+            self.records.pop(name, None)
+            self.owner.pop(name, None)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "records": len(self.records),
+                "sources": sorted(self.sources),
+                "watching": sorted(self.watching),
+                "events_applied": self.events_applied,
+            }
+
+    def _refresh_stale(self) -> None:
+        now = time.time()
+        with self.lock:
+            stale = [k for k in self.sources
+                     if k not in self.watching and now - self.refreshed_at.get(k, 0) > self.ttl]
+        for key in stale:
+            try:
+                self.refresh(key)
+            except Exception as exc:
+                logger.warning("Inventory refresh failed for %s: %s", key, exc)
+
+    def _watch_loop(self, key: str, backend) -> None:
+        while True:
+            try:
+                # ``events()`` subscribes eagerly, so the relist below can't race the stream
+                stream = backend.events()
+                with self.lock:
+                    self.watching.add(key)
+                # Relist after (re)subscribing so nothing missed while disconnected is lost
+                self.refresh(key)
+                for action, name in stream:
+                    self._apply_event(key, backend, action, name)
+            except Exception as exc:
+                logger.warning("Inventory event stream for %s failed: %s", key, exc)
+            with self.lock:
+                self.watching.discard(key)
+            time.sleep(WATCH_RETRY_SECONDS)
+
+    def _apply_event(self, key: str, backend, action: str, name: Optional[str]) -> None:
+        if not name:
+            return
+        if action == "destroy":
+            self.discard(name)
+        elif action in REFRESH_ACTIONS:
+            record = backend.record_for(name)
+            if record is None:
+                self.discard(name)
+            else:
+                self.put(key, record)
+        else:
+            return
+        with self.lock:
+            self.events_applied += 1
@@ -0,0 +1,141 @@
+import time
+import logging
+from threading import Lock
+from typing import Dict, List, Optional
+
+from admission import SampleWindow, quantile
+
+logger = logging.getLogger(__name__)
+
+BASELINE_PROFILE = "baseline"
+MODE_FIXED = "fixed"
+MODE_AB = "ab"
+# Time-to-healthy samples kept per profile; experiments compare recent launches only
+DEFAULT_WINDOW_SECONDS = 24 * 3600
+# Label put on every launched container so results can be traced to a profile
+PROFILE_LABEL = "vpn-proxy.launch-profile"
+
+
+class LaunchProfile:
+    """Extra gluetun settings for a launch: ``env``, ``volumes`` and resource ``limits``.
+
+    ``env`` and ``limits`` are merged over the backend's own values, so an
+    empty profile is the stock launch.
+    """
+
+    def __init__(self, name: str, env: Optional[Dict] = None, volumes: Optional[Dict] = None,
+                 limits: Optional[Dict] = None, weight: float = 1.0) -> None:
+        self.name = name
+        self.env = {str(k): str(v) for k, v in (env or {}).items()}
+        self.volumes = dict(volumes or {})
+        self.limits = dict(limits or {})
+        self.weight = max(0.0, float(weight))
+
+    @classmethod
+    def from_config(cls, name: str, settings: Dict) -> "LaunchProfile":
+        return cls(name, env=settings.get("env"), volumes=settings.get("volumes"),
+                   limits=settings.get("limits"), weight=settings.get("weight", 1.0))
+
+    def describe(self) -> Dict:
+        return {"env": dict(self.env), "volumes": dict(self.volumes), "limits": dict(self.limits),
+                "weight": self.weight}
+
+
+class LaunchExperiment:
+    """Picks a launch profile per create and tracks time-to-healthy per profile.
+
+    In ``fixed`` mode every launch uses ``active``. In ``ab`` mode launches
+    are split across all profiles in proportion to their ``weight`` (the
+    profile furthest behind its share goes next), so each one collects
+    comparable samples under the same load. ``stats`` reports launches,
+    success rate and time-to-healthy percentiles per profile.
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, LaunchProfile]] = None, mode: str = MODE_FIXED,
+                 active: Optional[str] = None, window_seconds: float = DEFAULT_WINDOW_SECONDS) -> None:
+        self.profiles = dict(profiles or {})
+        if not self.profiles:
+            self.profiles[BASELINE_PROFILE] = LaunchProfile(BASELINE_PROFILE)
+        self.mode = MODE_AB if str(mode).lower() == MODE_AB else MODE_FIXED
+        if active not in self.profiles:
+            if active is not None:
+                logger.warning("Unknown launch profile %s; using %s", active, next(iter(self.profiles)))
+            active = next(iter(self.profiles))
+        self.active = active
+        self.window = float(window_seconds)
+        self.lock = Lock()
+        self.started: Dict[str, int] = {name: 0 for name in self.profiles}
+        self.outcomes: Dict[str, Dict] = {name: self._empty_outcome() for name in self.profiles}
+
+    def _empty_outcome(self) -> Dict:
+        return {"healthy": SampleWindow(self.window), "failed": SampleWindow(self.window), "reasons": {}}
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "LaunchExperiment":
+        config = dict(config or {})
+        profiles = {name: LaunchProfile.from_config(name, settings or {})
+                    for name, settings in (config.get("profiles") or {}).items()}
+        kwargs = {}
+        if "window_seconds" in config:
+            kwargs["window_seconds"] = config["window_seconds"]
+        return cls(profiles, mode=config.get("mode", MODE_FIXED), active=config.get("active"), **kwargs)
+
+    def choose(self) -> LaunchProfile:
+        with self.lock:
+            if self.mode == MODE_FIXED:
+                name = self.active
+            else:
+                weighted = [p for p in self.profiles.values() if p.weight > 0] or list(self.profiles.values())
+                name = min(weighted, key=lambda p: (self.started[p.name] + 1) / (p.weight or 1.0)).name
+            self.started[name] += 1
+            return self.profiles[name]
+
+    def record(self, profile: str, seconds: Optional[float], healthy: bool, reason: Optional[str] = None) -> None:
+        """One launch outcome: seconds from launch to healthy, or a failure ``reason``."""
+        now = time.time()
+        with self.lock:
+            outcome = self.outcomes.get(profile)
+            if outcome is None:
+                return
+            if healthy and seconds is not None:
+                outcome["healthy"].add(seconds, now)
+            else:
+                outcome["failed"].add(1.0, now)
+                key = reason or "unknown"
+                outcome["reasons"][key] = outcome["reasons"].get(key, 0) + 1
+
+    def reset(self) -> None:
+        with self.lock:
+            self.started = {name: 0 for name in self.profiles}
+            self.outcomes = {name: self._empty_outcome() for name in self.profiles}
+
+    def stats(self) -> Dict:
+        now = time.time()
+        items: List[Dict] = []
+        with self.lock:
+            for name, profile in self.profiles.items():
+                outcome = self.outcomes[name]
+                healthy = outcome["healthy"].values(now)
+                failed = len(outcome["failed"].values(now))
+                finished = len(healthy) + failed
+                items.append({
+                    "name": name,
+                    "started": self.started[name],
+                    "healthy": len(healthy),
+                    "failed": failed,
+                    "success_rate": round(len(healthy) / finished, 4) if finished else None,
+                    "time_to_healthy_s": {"p50": _round(quantile(healthy, 0.5)),
+                                          "p90": _round(quantile(healthy, 0.9)),
+                                          "mean": _round(sum(healthy) / len(healthy)) if healthy else None},
+                    "failure_reasons": dict(outcome["reasons"]),
+                    **profile.describe(),
+                })
+        ranked = [i for i in items if i["healthy"]]
+        # Fastest median among profiles that actually produced healthy tunnels
+        fastest = min(ranked, key=lambda i: i["time_to_healthy_s"]["p50"])["name"] if ranked else None
+        return {"mode": self.mode, "active": self.active, "window_seconds": self.window,
+                "fastest": fastest, "items": items}
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
@@ -2,15 +2,36 @@ import json
 import logging
 import time
 import uuid
-from collections import deque
 from pathlib import Path
-from queue import Empty, Queue
-from threading import Condition, Lock, Thread
-from typing import Dict, Optional
+from queue import Empty
+from threading import Condition, Thread
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from admission import AdmissionController
+from config_breakers import ConfigBreakers
+from exit_ip_index import ExitIPIndex
+from failure_classifier import POLICY_HALT, CreateHalt, policy_for
+from gateway import DEFAULT_DRAIN_SECONDS, DEFAULT_GATEWAY_PORT, DEFAULT_SESSION_TTL, Gateway
+from health_monitor import (DEFAULT_CONCURRENCY, DEFAULT_FAILURE_THRESHOLD, DEFAULT_FULL_INTERVAL,
+                            DEFAULT_JITTER, DEFAULT_PROBE_INTERVAL, HealthMonitor)
+from inventory import DEFAULT_TTL_SECONDS as DEFAULT_INVENTORY_TTL_SECONDS, ProxyInventory
+from launch_profiles import LaunchExperiment
+from placement import HostPlacement
+from pool_events import DEFAULT_BUFFER as DEFAULT_EVENT_BUFFER, DEFAULT_HISTORY as DEFAULT_EVENT_HISTORY
+from pool_events import (EVENT_CREATED, EVENT_INVALIDATED, EVENT_REMOVED, EVENT_REPAIR_STARTED, EVENT_REPLACED,
+                         EVENT_VALIDATED, EventBus)
+from pool_index import PoolEntry, ValidRing
+from profiling import (DEFAULT_PROFILE_SECONDS, DEFAULT_SAMPLE_INTERVAL, DEFAULT_TOP, MAX_PROFILE_SECONDS,
+                       InstrumentedLock, SamplingProfiler, dump_stacks)
+from protocol_selector import ProtocolSelector
+from shared_state import SharedPoolStore
+from task_scheduler import (PRIORITY_CLIENT, PRIORITY_CREATE, PRIORITY_REPAIR, PriorityTaskQueue, RetryBudget,
+                            RetryPolicy, TokenBucket, task_priority)
+from traffic_log import DEFAULT_TRAFFIC_PATH, TrafficRecorder
 from vpn_manager import VPNManager
 
 logging.basicConfig(level=logging.INFO,
@@ -22,6 +43,24 @@ app = FastAPI(title="vpn_manager", version="3.0.0")
 CONFIG_PATH = Path("./config.json")
 DEFAULT_POOL_SIZE = 6
 MAX_REPAIR_ATTEMPTS = 2
+DEFAULT_EXIT_IP_HISTORY_SECONDS = 900
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 60
+DEFAULT_POOL_WORKERS = 2
+DEFAULT_MAX_CREATE_ATTEMPTS = 5
+MAX_LEASE_SIZE = 1000
+MAX_LEASE_WAIT_SECONDS = 300
+DEFAULT_RATE_LIMITS = {
+    "launches_per_second": 1.0,
+    "launch_burst": 3,
+    "restarts_per_second": 2.0,
+    "restart_burst": 5,
+}
+DEFAULT_POOL_NAME = "default"
+# Create-time metadata kept when a repair or verify re-stores the container
+STICKY_ENTRY_KEYS = ("config", "launch_profile", "protocol", "host")
+STORE_POLL_SECONDS = 0.5
+ELECTION_RETRY_SECONDS = 5
+DRAIN_POLL_SECONDS = 1.0
 
 JOBS: Dict[str, Dict] = {}
 
@@ -32,6 +71,11 @@ class NewProxyRequest(BaseModel):
     health_timeout: int = 45
     request_timeout: int = 15
     max_attempts: int = 5
+    countries: Optional[List[str]] = None
+    # "openvpn" or "wireguard"; unset uses config.json "vpn_type"
+    vpn_type: Optional[str] = None
+    # Name of a config.json "pools" profile; overrides the fields above
+    profile: Optional[str] = None
 
 
 class RestartRequest(BaseModel):
@@ -43,11 +87,16 @@ class ReportBadRequest(BaseModel):
     reason: Optional[str] = None
 
 
-def _load_pool_target_size(default: int = DEFAULT_POOL_SIZE) -> int:
+def _load_runtime_config() -> Dict:
     try:
         data = json.loads(CONFIG_PATH.read_text())
     except Exception:
-        return default
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _load_pool_target_size(default: int = DEFAULT_POOL_SIZE) -> int:
+    data = _load_runtime_config()
     try:
         raw_value = data.get("container_pool_size", default)
         value = int(raw_value)
@@ -63,6 +112,8 @@ def _build_manager_kwargs(config: Dict) -> Dict:
         "health_timeout": config.get("health_timeout", 45),
         "request_timeout": config.get("request_timeout", 15),
         "max_attempts": config.get("max_attempts", 5),
+        "countries": config.get("countries"),
+        "vpn_type": config.get("vpn_type"),
     }
 
 
@@ -80,37 +131,234 @@ def _sanitize_entry(entry: Optional[Dict]) -> Optional[Dict]:
 
 
 class ContainerPool:
-    def __init__(self, target_size: int, request_config: Dict, max_repair_attempts: int) -> None:
+    def __init__(self, target_size: int, request_config: Dict, max_repair_attempts: int,
+                 exit_ip_history_seconds: int = DEFAULT_EXIT_IP_HISTORY_SECONDS,
+                 resource_config: Optional[Dict] = None,
+                 placement: Optional[HostPlacement] = None,
+                 store: Optional[SharedPoolStore] = None,
+                 inventory: Optional[ProxyInventory] = None,
+                 monitor_config: Optional[Dict] = None,
+                 breakers: Optional[ConfigBreakers] = None,
+                 rate_limits: Optional[Dict] = None,
+                 workers: int = DEFAULT_POOL_WORKERS,
+                 retry_config: Optional[Dict] = None,
+                 name: str = DEFAULT_POOL_NAME,
+                 parent: Optional["ContainerPool"] = None,
+                 weight: float = 1.0,
+                 admission_config: Optional[Dict] = None,
+                 launch_experiment: Optional[LaunchExperiment] = None,
+                 events: Optional[EventBus] = None,
+                 protocols: Optional[ProtocolSelector] = None) -> None:
         self.target_size = max(int(target_size), 0)
         self.request_config = dict(request_config)
         self.manager_kwargs = _build_manager_kwargs(self.request_config)
         self.max_repair_attempts = max(1, int(max_repair_attempts))
 
-        self.lock = Lock()
+        # Records wait/hold times for GET /debug/locks
+        self.lock = InstrumentedLock(f"pool:{name}")
         self.condition = Condition(self.lock)
-        self.registry: Dict[str, Dict] = {}
-        self.valid_queue = deque()
-        self.valid_set = set()
+        self.registry: Dict[str, PoolEntry] = {}
+        # Hand-out order of valid names; O(1) add/discard/rotate under its own lock
+        self.valid_queue = ValidRing()
+        self.valid_set = self.valid_queue
         self.pending_repairs = set()
         self.pending_creates = 0
-        self.task_queue: "Queue[Dict]" = Queue()
+        # Client-blocking work first, then repairs, then refill creates
+        self.task_queue = PriorityTaskQueue()
+        self.workers = max(1, int(workers))
         self.started = False
         self.start_worker = True
         self.needs_restart = set()
         self.restart_wait_seconds = 15
+        # Set by the gateway: waits up to a timeout for a container's open client connections
+        self.drain_hook: Optional[Callable[[str, Optional[float]], bool]] = None
+        self.drain_seconds = 0.0
+        # Run once this process coordinates the pool (at start, or after winning an election)
+        self.on_coordinator: List[Callable[[], None]] = []
+        self.exit_ips = ExitIPIndex(history_seconds=exit_ip_history_seconds)
+        self.placement = placement
+        # Shared state for multi-worker deployments; followers forward work to the coordinator
+        self.store = store
+        # Cached view of running proxies so listings don't hit the Docker API
+        self.inventory = inventory if inventory is not None else ProxyInventory()
+        # Config/country quarantine fed by creates, repairs and client reports
+        self.breakers = breakers if breakers is not None else ConfigBreakers()
+        # Token buckets shared by every manager so bursts don't pile onto dockerd
+        limits = dict(DEFAULT_RATE_LIMITS, **(rate_limits or {}))
+        self.launch_limiter = TokenBucket(limits["launches_per_second"], limits["launch_burst"])
+        self.restart_limiter = TokenBucket(limits["restarts_per_second"], limits["restart_burst"])
+        # Raised by AUTH_FAILED and the like; creates return immediately until it lifts
+        self.halt = CreateHalt()
+        # Launch profile per create (fixed or A/B split), config.json "launch_profiles"
+        self.launch_experiment = launch_experiment if launch_experiment is not None else LaunchExperiment()
+        # Pool state changes for GET /events subscribers
+        self.events = events if events is not None else EventBus()
+        # UDP vs TCP config choice from measured handshakes/throughput, config.json "protocols"
+        self.protocols = protocols if protocols is not None else ProtocolSelector()
+
+        # Failed creates/repairs come back through the queue's timer heap, config.json "retry"
+        retry_config = dict(retry_config or {})
+        self.retry_policy = RetryPolicy(base=retry_config.get("base_seconds", 2.0),
+                                        factor=retry_config.get("factor", 2.0),
+                                        max_delay=retry_config.get("max_seconds", 120.0),
+                                        jitter=retry_config.get("jitter", 0.5),
+                                        reason_delays=retry_config.get("reason_seconds"))
+        self.retry_budget = RetryBudget(ratio=retry_config.get("budget_ratio", 0.5),
+                                        min_per_minute=retry_config.get("budget_min_per_minute", 6),
+                                        cap=retry_config.get("budget_cap", 30))
+        self.max_create_attempts = max(1, int(retry_config.get("max_create_attempts",
+                                                               DEFAULT_MAX_CREATE_ATTEMPTS)))
+        self.refill_pending = False
+
+        # Resource sampling and eviction, config.json "resource_sampler"
+        resource_config = dict(resource_config or {})
+        self.sample_interval = float(resource_config.get("interval_seconds", DEFAULT_SAMPLE_INTERVAL_SECONDS))
+        self.evict_memory_bytes = resource_config.get("max_memory_bytes")
+        self.evict_cpu_percent = resource_config.get("max_cpu_percent")
+        self.evict_strikes = max(1, int(resource_config.get("strikes", 2)))
+
+        # Background health checks, config.json "health_monitor"
+        monitor_config = dict(monitor_config or {})
+        # Idle managers reused by the checks (see _with_monitor_manager)
+        self.monitor_managers: List[VPNManager] = []
+        self.monitor_enabled = bool(monitor_config.get("enabled", True))
+        self.monitor = HealthMonitor(
+            probe=self._monitor_probe,
+            validate=self._monitor_validate,
+            on_failure=self._monitor_failed,
+            on_validated=self._monitor_validated,
+            probe_interval=monitor_config.get("probe_interval_seconds", DEFAULT_PROBE_INTERVAL),
+            full_interval=monitor_config.get("full_interval_seconds", DEFAULT_FULL_INTERVAL),
+            jitter=monitor_config.get("jitter", DEFAULT_JITTER),
+            failure_threshold=monitor_config.get("failure_threshold", DEFAULT_FAILURE_THRESHOLD),
+            concurrency=monitor_config.get("concurrency", DEFAULT_CONCURRENCY),
+        )
+
+        # Time-to-proxy SLO and admission for /new_proxy, config.json "admission"
+        admission_config = dict(admission_config or {})
+        admission_kwargs = {}
+        for key, arg in (("slo_seconds", "slo_seconds"), ("slo_target", "slo_target"),
+                         ("window_seconds", "window_seconds"), ("max_queue", "max_queue"),
+                         ("max_wait_seconds", "max_wait"), ("max_retry_after_seconds", "max_retry_after")):
+            if key in admission_config:
+                admission_kwargs[arg] = admission_config[key]
+        self.admission = AdmissionController(**admission_kwargs)
+
+        # Profile pools (config.json "pools") share the default pool's workers, queue,
+        # rate limits, retry budget and indexes; their tasks carry a "pool" key
+        self.name = name
+        self.parent = parent
+        self.pool_key = None if parent is None else name
+        if parent is not None:
+            self.task_queue = parent.task_queue
+            self.workers = parent.workers
+            self.launch_limiter = parent.launch_limiter
+            self.restart_limiter = parent.restart_limiter
+            self.retry_budget = parent.retry_budget
+            self.halt = parent.halt
+            self.launch_experiment = parent.launch_experiment
+            self.events = parent.events
+            self.protocols = parent.protocols
+            self.breakers = parent.breakers
+            self.inventory = parent.inventory
+            self.exit_ips = parent.exit_ips
+            self.placement = parent.placement
+            self.peers: Dict[str, "ContainerPool"] = parent.peers
+        else:
+            self.peers = {}
+        self.peers[name] = self
+        self.task_queue.set_weight(self.pool_key, weight)
 
     def start(self) -> None:
         with self.lock:
             if self.started:
                 return
             self.started = True
-            if not self.start_worker:
+        if self.store is not None and self.parent is None:
+            if not self.store.try_become_coordinator():
+                logger.info("Another worker coordinates the pool; running as follower")
+                Thread(target=self._election_loop, name="pool-election", daemon=True).start()
                 return
-        Thread(target=self._initial_fill, name="pool-initial-fill", daemon=True).start()
-        Thread(target=self._worker_loop, name="pool-worker", daemon=True).start()
+            self._adopt_store_entries()
+        self._run_coordinator_hooks()
+        if not self.start_worker:
+            return
+        self._start_coordinator_threads()
+
+    def _run_coordinator_hooks(self) -> None:
+        for hook in self.on_coordinator:
+            try:
+                hook()
+            except Exception:
+                logger.exception("Coordinator hook failed")
+
+    def _start_coordinator_threads(self) -> None:
+        Thread(target=self._initial_fill, name=f"pool-initial-fill-{self.name}", daemon=True).start()
+        if self.parent is None:
+            for i in range(self.workers):
+                Thread(target=self._worker_loop, name=f"pool-worker-{i}", daemon=True).start()
+        if self.sample_interval > 0:
+            Thread(target=self._sampler_loop, name=f"pool-sampler-{self.name}", daemon=True).start()
+        if self.monitor_enabled:
+            Thread(target=self.monitor.loop, name=f"pool-health-monitor-{self.name}", daemon=True).start()
+        if self.store is not None:
+            Thread(target=self._store_task_loop, name="pool-store-tasks", daemon=True).start()
+
+    def _is_follower(self) -> bool:
+        return self.store is not None and not self.store.is_coordinator
+
+    def _election_loop(self) -> None:
+        while not self.store.try_become_coordinator():
+            time.sleep(ELECTION_RETRY_SECONDS)
+        logger.info("Elected pool coordinator")
+        self._adopt_store_entries()
+        self._run_coordinator_hooks()
+        if self.start_worker:
+            self._start_coordinator_threads()
+
+    def _adopt_store_entries(self) -> None:
+        """Take over containers a previous coordinator left in the store; each is
+        re-checked before it is handed out again."""
+        entries = self.store.entries()
+        with self.condition:
+            for name, entry in entries.items():
+                entry["state"] = "invalid"
+                self.registry[name] = PoolEntry.from_dict(entry)
+                self.store.set_state(name, "invalid")
+        for name in entries:
+            self.task_queue.put({"type": "verify", "name": name})
+
+    def _store_task_loop(self) -> None:
+        while True:
+            try:
+                for task in self.store.pop_tasks():
+                    self._apply_store_task(task)
+            except Exception:
+                logger.exception("Shared store task failure")
+            time.sleep(STORE_POLL_SECONDS)
+
+    def _apply_store_task(self, task: Dict) -> None:
+        task_type = task.get("type")
+        name = task.get("name")
+        if task_type == "fill":
+            self._schedule_create(PRIORITY_CLIENT)
+        elif task_type == "flag_restart":
+            self.trigger_repair(name)
+        elif task_type == "remove":
+            self.remove_container(name)
+        elif task_type == "reset":
+            self.reset_state()
+        elif task_type == "sweep":
+            self.run_sweeper()
 
     def wait_until_ready(self, minimum: int = 1, timeout: float = 30.0) -> bool:
         deadline = time.time() + timeout
+        if self._is_follower():
+            while self.store.count_valid() < minimum:
+                if time.time() >= deadline:
+                    return False
+                time.sleep(STORE_POLL_SECONDS)
+            return True
         with self.condition:
             while self._count_valid_locked() < minimum:
                 remaining = deadline - time.time()
@@ -119,23 +367,93 @@ class ContainerPool:
                 self.condition.wait(timeout=remaining)
             return True
 
+    def acquire(self, deadline: Optional[float] = None) -> Tuple[Optional[Dict], int]:
+        """A container for ``/new_proxy`` as ``(entry, 0)``, else ``(None, retry_after)``.
+
+        An empty pool only makes the caller wait (up to ``deadline`` seconds)
+        when the estimated time to a fresh container fits in it.
+        """
+        started = time.monotonic()
+        entry = self.get_valid()
+        if entry is None and not self.start_worker:
+            entry = self.create_sync()
+        if entry:
+            self.admission.record_served(time.monotonic() - started)
+            return entry, 0
+        with self.condition:
+            in_flight = self.pending_creates
+        admitted, estimate = self.admission.admit(deadline, self.workers, in_flight)
+        if self.admission.should_shed(self.task_queue.qsize()):
+            # Queue is full: answer fast instead of adding to the backlog
+            self.admission.record_miss("shed")
+            return None, self.admission.retry_after(estimate)
+        self.request_fill(1)
+        if not admitted:
+            self.admission.record_miss("rejected")
+            return None, self.admission.retry_after(estimate)
+        self.admission.enter()
+        try:
+            while True:
+                remaining = started + deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.wait_for_valid(remaining)
+                entry = self.get_valid()
+                if entry:
+                    self.admission.record_served(time.monotonic() - started)
+                    return entry, 0
+        finally:
+            self.admission.leave()
+        self.admission.record_miss("timed_out")
+        return None, self.admission.retry_after(self.admission.estimate_wait(self.workers, self.pending_creates))
+
     def create_sync(self) -> Optional[Dict]:
-        entry = self._direct_create()
+        entry = self._direct_create(PRIORITY_CLIENT)
         return _sanitize_entry(entry)
 
     def get_valid(self) -> Optional[Dict]:
-        with self.condition:
-            while self.valid_queue:
-                name = self.valid_queue.popleft()
-                if name not in self.valid_set:
-                    continue
+        if self.store is not None:
+            # Every worker hands out from the store so round-robin spans processes
+            return _sanitize_entry(self.store.next_valid())
+        # Lock-free with respect to the registry: the ring has its own short lock
+        # and dict lookups are atomic, so hand-outs never wait on repairs or listings
+        for _ in range(len(self.valid_queue) + 1):
+            name = self.valid_queue.rotate()
+            if name is None:
+                return None
+            entry = self.registry.get(name)
+            if entry is None or entry.get("state") != "valid":
+                self.valid_queue.discard(name)
+                continue
+            return _sanitize_entry(entry)
+        return None
+
+    def lease(self, count: int, exclude: Iterable[str] = ()) -> List[Dict]:
+        """Up to ``count`` distinct valid containers not in ``exclude``, taken in one pass."""
+        exclude = set(exclude)
+        if self.store is not None:
+            return [_sanitize_entry(entry) for entry in self.store.take_valid(count, exclude)]
+        leased = []
+        while len(leased) < count:
+            names = self.valid_queue.take(count - len(leased), exclude)
+            if not names:
+                break
+            for name in names:
+                exclude.add(name)
                 entry = self.registry.get(name)
-                if not entry or entry.get("state") != "valid":
-                    self.valid_set.discard(name)
+                if entry is None or entry.get("state") != "valid":
+                    self.valid_queue.discard(name)
                     continue
-                self.valid_queue.append(name)
-                return _sanitize_entry(entry)
-            return None
+                leased.append(_sanitize_entry(entry))
+        return leased
+
+    def wait_for_valid(self, timeout: float) -> None:
+        """Block until a container turns valid (or ``timeout``); callers re-check with ``lease``."""
+        if self._is_follower():
+            time.sleep(min(timeout, STORE_POLL_SECONDS))
+            return
+        with self.condition:
+            self.condition.wait(timeout=max(0.0, timeout))
 
     def schedule_restart(self, name: str) -> Dict:
         return self.mark_for_restart(name)
@@ -153,12 +471,19 @@ class ContainerPool:
         raise RuntimeError("no_available_container")
 
     def _flag_container_for_restart(self, name: str) -> None:
+        if self._is_follower():
+            if not self.store.set_state(name, "invalid"):
+                raise KeyError(name)
+            self.store.push_task("flag_restart", name)
+            return
         with self.condition:
             entry = self.registry.get(name)
             if not entry:
                 raise KeyError(name)
             self._mark_invalid_locked(name)
             self.needs_restart.add(name)
+            config = entry.get("config")
+        self.breakers.record_failure(config, "client_reported")
 
     def trigger_repair(self, name: str) -> bool:
         try:
@@ -168,6 +493,10 @@ class ContainerPool:
         return True
 
     def remove_container(self, name: str) -> bool:
+        if self._is_follower():
+            existed = self.store.delete(name)
+            self.store.push_task("remove", name)
+            return existed
         with self.condition:
             existed = self._remove_container_locked(name)
         if existed:
@@ -175,44 +504,74 @@ class ContainerPool:
         return existed
 
     def reset_state(self) -> None:
+        if self.store is not None:
+            self.store.clear()
+            if self._is_follower():
+                self.store.push_task("reset")
+                return
         with self.condition:
+            names = list(self.registry)
+            for entry in self.registry.values():
+                entry["state"] = "removed"
+                self._emit_locked(EVENT_REMOVED, entry)
             self.registry.clear()
             self.valid_queue.clear()
-            self.valid_set.clear()
             self.needs_restart.clear()
             self.pending_repairs.clear()
             self.pending_creates = 0
-        while True:
-            try:
-                self.task_queue.get_nowait()
-                self.task_queue.task_done()
-            except Empty:
-                break
+        if len(self.peers) > 1:
+            # Other profile pools keep their exit IPs and queued work
+            for name in names:
+                self.exit_ips.release(name)
+            self.task_queue.clear(lambda task: task.get("pool") == self.pool_key)
+        else:
+            self.exit_ips.clear()
+            self.task_queue.clear()
+        self.monitor.clear()
+        self.monitor_managers.clear()
+        with self.condition:
+            self.refill_pending = False
         for _ in range(self.target_size):
             self._schedule_create()
 
     def list_names(self) -> Dict[str, Dict]:
+        if self._is_follower():
+            return self.store.entries()
+        # dict() copies atomically; entries are serialised outside the pool lock
+        return {name: entry.to_dict() for name, entry in dict(self.registry).items()}
+
+    def host_stats(self) -> Dict:
+        if self.placement is None:
+            with self.condition:
+                return {"hosts": [], "capacity": None, "containers": len(self.registry)}
+        return self.placement.stats()
+
+    def exit_ip_stats(self) -> Dict:
+        if self._is_follower():
+            valid = [e for e in self.store.entries().values() if e.get("state") == "valid"]
+            return {"distinct_ips": len({e.get("ip_seen") for e in valid if e.get("ip_seen")}),
+                    "valid_containers": len(valid)}
+        stats = self.exit_ips.stats()
         with self.condition:
-            return {name: dict(entry) for name, entry in self.registry.items()}
+            stats["valid_containers"] = self._count_valid_locked()
+        return stats
 
-    def _new_manager(self) -> VPNManager:
-        return VPNManager(**self.manager_kwargs)
+    def _new_manager(self, priority: int = PRIORITY_CREATE) -> VPNManager:
+        return VPNManager(exit_ip_index=self.exit_ips, placement=self.placement,
+                          inventory=self.inventory, breakers=self.breakers,
+                          launch_limiter=self.launch_limiter, restart_limiter=self.restart_limiter,
+                          priority=priority, halt=self.halt, experiment=self.launch_experiment,
+                          protocols=self.protocols, **self.manager_kwargs)
 
     def _initial_fill(self) -> None:
-        if self.target_size <= 0:
-            return
-        while True:
-            with self.condition:
-                deficit = self.target_size - self._count_valid_locked()
-            if deficit <= 0:
-                break
-            entry = self._direct_create()
-            if not entry:
-                time.sleep(3)
+        # Queued rather than created inline so failures back off on the timer heap
+        for _ in range(self.target_size):
+            self._schedule_create()
 
-    def _direct_create(self) -> Optional[Dict]:
+    def _direct_create(self, priority: int = PRIORITY_CREATE) -> Optional[Dict]:
+        started = time.monotonic()
         try:
-            manager = self._new_manager()
+            manager = self._new_manager(priority)
             result = manager.create_vpn_proxy()
         except Exception as exc:
             logger.exception("Container creation failed: %s", exc)
@@ -220,6 +579,7 @@ class ContainerPool:
         if result.get("status") != "ok":
             logger.warning("Container creation returned error: %s", result)
             return None
+        self.admission.record_create(time.monotonic() - started)
         with self.condition:
             entry = self._store_valid_locked(result)
         return entry
@@ -228,19 +588,26 @@ class ContainerPool:
         name = result.get("container_name")
         if not name:
             return {}
-        entry = dict(result)
+        entry = PoolEntry.from_dict(result)
+        previous = self.registry.get(name)
+        event = EVENT_CREATED if previous is None else EVENT_VALIDATED
+        previous = previous or {}
+        # Repairs report the container, not what it was created from
+        for key in STICKY_ENTRY_KEYS:
+            if previous.get(key) and not entry.get(key):
+                entry[key] = previous[key]
         entry.setdefault("status", "ok")
         entry["state"] = "valid"
         entry["last_updated"] = int(time.time())
         self.registry[name] = entry
-        try:
-            self.valid_queue.remove(name)
-        except ValueError:
-            pass
-        self.valid_queue.append(name)
-        self.valid_set.add(name)
+        self.exit_ips.assign(name, entry.get("ip_seen"))
+        if self.store is not None:
+            self.store.upsert(name, entry.to_dict())
+        self.valid_queue.add(name)
         self.needs_restart.discard(name)
         self.pending_repairs.discard(name)
+        self.monitor.track(name, validated=True)
+        self._emit_locked(event, entry)
         self.condition.notify_all()
         return entry
 
@@ -248,29 +615,36 @@ class ContainerPool:
         entry = self.registry.get(name)
         if not entry:
             return
+        was_valid = entry.get("state") == "valid"
         entry["state"] = "invalid"
         entry["last_updated"] = int(time.time())
-        self.valid_set.discard(name)
-        try:
-            self.valid_queue.remove(name)
-        except ValueError:
-            pass
+        if self.store is not None:
+            self.store.set_state(name, "invalid")
+        self.monitor.forget(name)
+        self.valid_queue.discard(name)
+        if was_valid:
+            self._emit_locked(EVENT_INVALIDATED, entry)
+
+    def _emit_locked(self, event_type: str, entry: Dict, **fields) -> None:
+        payload = _sanitize_entry(entry)
+        payload["state"] = entry.get("state")
+        self.events.publish(event_type, self.name, payload, **fields)
 
     def _pop_next_valid_locked(self) -> Optional[str]:
-        while self.valid_queue:
-            candidate = self.valid_queue.popleft()
-            if candidate in self.valid_set:
-                return candidate
-        return None
+        return self.valid_queue.rotate()
 
-    def _enqueue_repair(self, name: str, attempts: int = 0) -> None:
+    def _enqueue_repair(self, name: str, attempts: int = 0, priority: Optional[int] = None) -> None:
         with self.condition:
             if name in self.pending_repairs:
                 return
             self.pending_repairs.add(name)
-        self.task_queue.put({"type": "repair", "name": name, "attempts": attempts})
+        task = self._task("repair", name=name, attempts=attempts)
+        if priority is not None:
+            task["priority"] = priority
+        self.retry_budget.record_attempt()
+        self.task_queue.put(task)
 
-    def _schedule_create(self) -> None:
+    def _schedule_create(self, priority: Optional[int] = None) -> None:
         if self.target_size <= 0:
             return
         with self.condition:
@@ -279,7 +653,7 @@ class ContainerPool:
             self.pending_creates += 1
         if not self.start_worker:
             try:
-                entry = self._direct_create()
+                entry = self._direct_create(PRIORITY_CREATE if priority is None else priority)
                 if not entry:
                     logger.warning("Synchronous create failed during schedule")
             finally:
@@ -287,7 +661,17 @@ class ContainerPool:
                     if self.pending_creates > 0:
                         self.pending_creates -= 1
             return
-        self.task_queue.put({"type": "create", "attempts": 0})
+        task = self._task("create", attempts=0)
+        if priority is not None:
+            task["priority"] = priority
+        self.retry_budget.record_attempt()
+        self.task_queue.put(task)
+
+    def _task(self, task_type: str, **fields) -> Dict:
+        task = {"type": task_type, **fields}
+        if self.pool_key is not None:
+            task["pool"] = self.pool_key
+        return task
 
     def _worker_loop(self) -> None:
         while True:
@@ -296,89 +680,378 @@ class ContainerPool:
             except Empty:
                 continue
             try:
-                task_type = task.get("type")
-                if task_type == "repair":
-                    self._handle_repair_task(task)
-                elif task_type == "create":
-                    self._handle_create_task(task)
+                # Workers are shared by every profile pool; run the task against its own pool
+                pool = self.peers.get(task["pool"]) if task.get("pool") else self
+                if pool is None:
+                    logger.warning("Dropping task for unknown pool %s", task.get("pool"))
+                    continue
+                pool._run_task(task)
             except Exception:
                 logger.exception("Pool worker task failure")
             finally:
                 self.task_queue.task_done()
 
+    def _run_task(self, task: Dict) -> None:
+        task_type = task.get("type")
+        if task_type == "repair":
+            self._handle_repair_task(task)
+        elif task_type == "create":
+            self._handle_create_task(task)
+        elif task_type == "verify":
+            self._handle_verify_task(task)
+        elif task_type == "refill":
+            self._handle_refill_task()
+
     def _handle_create_task(self, task: Dict) -> None:
         attempts = int(task.get("attempts", 0))
+        started = time.monotonic()
         try:
-            manager = self._new_manager()
+            manager = self._new_manager(task_priority(task))
             result = manager.create_vpn_proxy()
         except Exception as exc:
             logger.exception("Background creation error: %s", exc)
             result = {"status": "error", "message": str(exc)}
         if result.get("status") == "ok":
+            self.admission.record_create(time.monotonic() - started)
             with self.condition:
                 self._store_valid_locked(result)
                 if self.pending_creates > 0:
                     self.pending_creates -= 1
             return
-        if attempts + 1 >= self.max_repair_attempts:
-            logger.warning("Background creation failed %s times; retrying", attempts + 1)
-            attempts = -1
-        time.sleep(3)
-        self.task_queue.put({"type": "create", "attempts": attempts + 1})
+        if self._retry_later(task, self.max_create_attempts, result.get("message")):
+            return
+        logger.warning("Background creation gave up after %s attempts (%s)", attempts + 1, result.get("message"))
+        with self.condition:
+            if self.pending_creates > 0:
+                self.pending_creates -= 1
+        self._schedule_refill()
+
+    def _retry_later(self, task: Dict, max_attempts: int, reason: Optional[str]) -> bool:
+        """Put ``task`` back on the timer heap with backoff; False when out of attempts or budget."""
+        attempts = int(task.get("attempts", 0)) + 1
+        if attempts >= max_attempts or reason == "creates_halted" or policy_for(reason) == POLICY_HALT:
+            # Halted creates wait for the delayed refill, which re-checks the credentials
+            return False
+        if not self.retry_budget.try_spend():
+            logger.warning("Retry budget exhausted; not retrying %s task", task.get("type"))
+            return False
+        delay = self.retry_policy.delay(attempts, reason)
+        self.task_queue.put_later(dict(task, attempts=attempts, reason=reason), delay)
+        return True
+
+    def _schedule_refill(self) -> None:
+        """One delayed top-up of the pool after creates were abandoned."""
+        with self.condition:
+            if self.refill_pending:
+                return
+            self.refill_pending = True
+        self.task_queue.put_later(self._task("refill"), self.retry_policy.max_delay)
+
+    def _handle_refill_task(self) -> None:
+        with self.condition:
+            self.refill_pending = False
+        for _ in range(self.target_size):
+            self._schedule_create()
+
+    def _handle_verify_task(self, task: Dict) -> None:
+        name = task.get("name")
+        try:
+            result = self._new_manager(PRIORITY_REPAIR).check_container(name)
+        except Exception as exc:
+            result = {"status": "error", "message": str(exc)}
+        if result.get("status") == "ok":
+            with self.condition:
+                if name in self.registry:
+                    self._store_valid_locked(result)
+            return
+        if result.get("message") == "not_found":
+            with self.condition:
+                self._remove_container_locked(name)
+            self._schedule_create()
+            return
+        self._enqueue_repair(name)
+
+    def _monitor_probe(self, name: str) -> Dict:
+        return self._with_monitor_manager(lambda manager: manager.probe_proxy(name))
+
+    def _monitor_validate(self, name: str) -> Dict:
+        return self._with_monitor_manager(lambda manager: manager.check_container(name, end_to_end=True))
+
+    def _with_monitor_manager(self, check: Callable[[VPNManager], Dict]) -> Dict:
+        """Run ``check`` on an idle cached manager, one per concurrent health check.
+
+        Building a manager re-reads config.json and globs the config catalog,
+        far more than a probe costs. Managers aren't shared between threads
+        because lookups bind them to the Docker host that runs the container.
+        """
+        try:
+            manager = self.monitor_managers.pop()
+        except IndexError:
+            manager = self._new_manager()
+        try:
+            return check(manager)
+        finally:
+            self.monitor_managers.append(manager)
+
+    def _monitor_failed(self, name: str, result: Dict) -> None:
+        """Pull a proxy that failed its background check out of rotation and repair it."""
+        with self.condition:
+            entry = self.registry.get(name)
+            if not entry or entry.get("state") != "valid":
+                return
+            if result.get("message") == "not_found":
+                self._remove_container_locked(name)
+            else:
+                self._mark_invalid_locked(name)
+        if result.get("message") == "not_found":
+            self._schedule_create()
+        else:
+            self._enqueue_repair(name)
+
+    def _monitor_validated(self, name: str, result: Dict) -> None:
+        ip = result.get("ip_seen")
+        with self.condition:
+            entry = self.registry.get(name)
+            # The tunnel may have reconnected on its own; keep the exit-IP index honest
+            if not ip or not entry or entry.get("state") != "valid" or entry.get("ip_seen") == ip:
+                return
+            if self.exit_ips.reserve(name, ip):
+                entry["ip_seen"] = ip
+                entry["last_updated"] = int(time.time())
+                if self.store is not None:
+                    self.store.upsert(name, entry.to_dict())
+                self._emit_locked(EVENT_VALIDATED, entry)
+                return
+            logger.warning("%s reconnected onto exit IP %s already in use; rotating it", name, ip)
+            self._mark_invalid_locked(name)
+        self._enqueue_repair(name)
+
+    def scheduler_stats(self) -> Dict:
+        names = {PRIORITY_CLIENT: "client", PRIORITY_REPAIR: "repair", PRIORITY_CREATE: "create"}
+        queued = {names.get(p, str(p)): n for p, n in self.task_queue.counts().items()}
+        return {
+            "workers": self.workers,
+            "queued": queued,
+            "delayed": len(self.task_queue.delayed_tasks()),
+            "pools": self.task_queue.pools(),
+            "launches": self.launch_limiter.stats(),
+            "restarts": self.restart_limiter.stats(),
+            "retry_budget": self.retry_budget.stats(),
+        }
+
+    def describe(self) -> Dict:
+        """Profile and fill level for ``GET /pools``."""
+        with self.condition:
+            valid = self._count_valid_locked()
+            total = len(self.registry)
+            pending = self.pending_creates
+        return {"name": self.name, "target_size": self.target_size, "valid": valid, "containers": total,
+                "pending_creates": pending, "weight": self.task_queue.weights.get(self.pool_key, 1.0),
+                "profile": {k: v for k, v in self.request_config.items() if k != "profile"}}
+
+    def alerts(self) -> list:
+        alert = self.halt.alert()
+        return [dict(alert, type="creates_halted")] if alert else []
+
+    def clear_halt(self) -> bool:
+        """Lift a create halt by hand and top the pool back up."""
+        if not self.halt.clear():
+            return False
+        logger.info("Create halt cleared; refilling pools")
+        for pool in list(self.peers.values()):
+            pool._handle_refill_task()
+        return True
+
+    def health_stats(self) -> Dict:
+        stats = self.monitor.stats()
+        stats["enabled"] = self.monitor_enabled
+        stats["coordinator"] = not self._is_follower()
+        return stats
 
     def _handle_repair_task(self, task: Dict) -> None:
         name = task.get("name")
-        attempts = int(task.get("attempts", 0))
         if not name:
             return
+        if "drain_until" not in task:
+            self._emit_repair_started(name)
+        if not self._drained_or_deferred(task, name):
+            return
         try:
-            manager = self._new_manager()
+            manager = self._new_manager(task_priority(task))
             result = manager.restart_and_check(name)
         except Exception as exc:
             logger.warning("Repair restart failed for %s: %s", name, exc)
             result = {"status": "error", "message": str(exc)}
+        self._record_repair_outcome(name, result)
         if result.get("status") == "ok":
             with self.condition:
                 self._store_valid_locked(result)
                 self.pending_repairs.discard(name)
             return
-        if attempts + 1 >= self.max_repair_attempts:
+        if not self._retry_later(task, self.max_repair_attempts, result.get("message")):
             logger.warning("Repair exhausted for %s; replacing container", name)
             try:
                 manager.delete_proxy(name)
             except Exception as exc:
                 logger.warning("Failed to delete container %s: %s", name, exc)
             with self.condition:
-                self._remove_container_locked(name)
+                self._remove_container_locked(name, reason="repair_exhausted")
                 self.pending_repairs.discard(name)
             self._schedule_create()
-            return
-        time.sleep(2)
-        self.task_queue.put({"type": "repair", "name": name, "attempts": attempts + 1})
 
-    def _remove_container_locked(self, name: str) -> bool:
+    def _emit_repair_started(self, name: str) -> None:
+        with self.condition:
+            entry = self.registry.get(name)
+            if entry is not None:
+                self._emit_locked(EVENT_REPAIR_STARTED, entry)
+
+    def _drain(self, name: str, timeout: Optional[float] = None) -> bool:
+        """Let gateway clients finish on ``name`` before it is restarted or removed."""
+        if self.drain_hook is None:
+            return True
+        try:
+            return self.drain_hook(name, timeout)
+        except Exception:
+            logger.exception("Draining %s failed", name)
+            return True
+
+    def _drained_or_deferred(self, task: Dict, name: str) -> bool:
+        """True once ``name`` has no gateway connections or its drain time ran out;
+        otherwise the task goes back on the timer heap so the worker is not held."""
+        if self._drain(name, timeout=0):
+            return True
+        now = time.time()
+        drain_until = task.get("drain_until", now + self.drain_seconds)
+        if now >= drain_until:
+            logger.info("Restarting %s with gateway connections still open", name)
+            return True
+        self.task_queue.put_later(dict(task, drain_until=drain_until), min(DRAIN_POLL_SECONDS, drain_until - now))
+        return False
+
+    def _record_repair_outcome(self, name: str, result: Dict) -> None:
+        with self.condition:
+            config = (self.registry.get(name) or {}).get("config")
+        if result.get("status") == "ok":
+            self.breakers.record_success(config)
+        elif result.get("message") != "not_found":
+            self.breakers.record_failure(config, result.get("message"))
+
+    def _remove_container_locked(self, name: str, reason: Optional[str] = None) -> bool:
+        """Drop ``name``; a ``reason`` means a replacement is on its way (``replaced`` event)."""
         removed = False
         if name in self.registry:
-            self.registry.pop(name, None)
+            entry = self.registry.pop(name)
             removed = True
-        self.valid_set.discard(name)
-        try:
-            self.valid_queue.remove(name)
-        except ValueError:
-            pass
+            entry["state"] = "removed"
+            self._emit_locked(EVENT_REPLACED if reason else EVENT_REMOVED, entry,
+                              **({"reason": reason} if reason else {}))
+        self.exit_ips.release(name)
+        self.monitor.forget(name)
+        if self.store is not None:
+            self.store.delete(name)
+        self.valid_queue.discard(name)
         self.pending_repairs.discard(name)
         self.needs_restart.discard(name)
         return removed
 
     def _count_valid_locked(self) -> int:
-        return len(self.valid_set)
+        return len(self.valid_queue)
+
+    def _sampler_loop(self) -> None:
+        while True:
+            time.sleep(self.sample_interval)
+            try:
+                self.sample_resources()
+            except Exception:
+                logger.exception("Resource sampler failure")
+
+    def sample_resources(self) -> Dict:
+        """Publish per-proxy CPU/mem/net usage and recycle containers over the limits."""
+        with self.condition:
+            names = list(self.registry)
+        if not names:
+            return {"status": "ok", "sampled": 0, "recycled": []}
+        manager = self._new_manager()
+        heavy = []
+        sampled = 0
+        for name in names:
+            sample = manager.sample_proxy(name)
+            if sample.get("status") != "ok":
+                continue
+            sampled += 1
+            with self.condition:
+                entry = self.registry.get(name)
+                if not entry:
+                    continue
+                usage = self._usage_from_sample(entry.get("resources"), sample)
+                entry["resources"] = usage
+                if self.store is not None:
+                    self.store.upsert(name, entry.to_dict())
+                if self._over_limits(usage):
+                    entry["resource_strikes"] = entry.get("resource_strikes", 0) + 1
+                else:
+                    entry["resource_strikes"] = 0
+                if entry["resource_strikes"] >= self.evict_strikes and name not in self.pending_repairs:
+                    heavy.append(name)
+        recycled = [name for name in heavy if self._recycle_container(manager, name)]
+        return {"status": "ok", "sampled": sampled, "recycled": recycled}
+
+    @staticmethod
+    def _usage_from_sample(previous: Optional[Dict], sample: Dict) -> Dict:
+        now = time.time()
+        usage = {
+            "cpu_seconds": sample.get("cpu_seconds", 0.0),
+            "cpu_percent": None,
+            "memory_bytes": sample.get("memory_bytes"),
+            "memory_limit": sample.get("memory_limit"),
+            "net_rx_bytes": sample.get("net_rx_bytes"),
+            "net_tx_bytes": sample.get("net_tx_bytes"),
+            "sampled_at": now,
+        }
+        if previous and now > previous.get("sampled_at", now):
+            elapsed = now - previous["sampled_at"]
+            cpu_delta = usage["cpu_seconds"] - previous.get("cpu_seconds", 0.0)
+            usage["cpu_percent"] = round(max(0.0, cpu_delta) / elapsed * 100, 2)
+        return usage
+
+    def _over_limits(self, usage: Dict) -> bool:
+        if self.evict_memory_bytes and (usage.get("memory_bytes") or 0) > self.evict_memory_bytes:
+            return True
+        cpu = usage.get("cpu_percent")
+        return bool(self.evict_cpu_percent and cpu is not None and cpu > self.evict_cpu_percent)
+
+    def _recycle_container(self, manager: VPNManager, name: str) -> bool:
+        logger.warning("Recycling %s: resource usage over limits", name)
+        self._drain(name)
+        try:
+            manager.delete_proxy(name)
+        except Exception as exc:
+            logger.warning("Failed to delete container %s: %s", name, exc)
+        with self.condition:
+            removed = self._remove_container_locked(name, reason="resource_limits")
+        if removed:
+            self._schedule_create()
+        return removed
+
+    def resource_report(self) -> Dict[str, Dict]:
+        if self._is_follower():
+            return {name: entry.get("resources") or {} for name, entry in self.store.entries().items()}
+        with self.condition:
+            return {name: dict(entry.get("resources") or {}) for name, entry in self.registry.items()}
 
     def request_fill(self, count: int = 1) -> None:
         count = max(0, int(count))
         for _ in range(count):
-            self._schedule_create()
+            if self._is_follower():
+                self.store.push_task("fill")
+            else:
+                # A client is already waiting on these
+                self._schedule_create(PRIORITY_CLIENT)
 
     def run_sweeper(self) -> Dict:
+        if self._is_follower():
+            self.store.push_task("sweep")
+            return {"status": "ok", "processed": [], "forwarded": True}
         targets = self._gather_sweep_targets()
         results = []
         for name in targets:
@@ -400,7 +1073,10 @@ class ContainerPool:
             if name not in self.registry:
                 self.needs_restart.discard(name)
                 return {"container_name": name, "status": "missing"}
-        manager = self._new_manager()
+        self._emit_repair_started(name)
+        self._drain(name)
+        # The sweep endpoint blocks its caller until every target is handled
+        manager = self._new_manager(PRIORITY_CLIENT)
         attempts = 0
         deadline = time.time() + self.restart_wait_seconds
         last_error = None
@@ -413,6 +1089,7 @@ class ContainerPool:
                 result = {"status": "error", "message": last_error}
             else:
                 last_error = result.get("message")
+            self._record_repair_outcome(name, result)
             if result.get("status") == "ok":
                 with self.condition:
                     entry = self._store_valid_locked(result)
@@ -431,7 +1108,7 @@ class ContainerPool:
         except Exception as exc:
             logger.warning("Failed to delete container %s: %s", name, exc)
         with self.condition:
-            removed = self._remove_container_locked(name)
+            removed = self._remove_container_locked(name, reason=last_error or "restart_failed")
         if removed:
             self._schedule_create()
         error_message = last_error or "restart_failed"
@@ -443,43 +1120,188 @@ class ContainerPool:
         }
 
 
+_RUNTIME_CONFIG = _load_runtime_config()
+
+
+def _build_store(config: Dict) -> Optional[SharedPoolStore]:
+    shared = config.get("shared_state") or {}
+    if not shared.get("enabled"):
+        return None
+    return SharedPoolStore(path=shared.get("path", "./db/pool_state.sqlite3"))
+
+
+def _build_inventory(config: Dict) -> ProxyInventory:
+    settings = config.get("inventory") or {}
+    return ProxyInventory(ttl=float(settings.get("ttl_seconds", DEFAULT_INVENTORY_TTL_SECONDS)),
+                          watch=bool(settings.get("watch_events", True)))
+
+
+def _build_breakers(config: Dict) -> ConfigBreakers:
+    settings = config.get("quarantine") or {}
+    kwargs = {}
+    for key, arg in (("config_threshold", "config_threshold"), ("country_threshold", "country_threshold"),
+                     ("base_seconds", "base_quarantine"), ("max_seconds", "max_quarantine"),
+                     ("decay_seconds", "decay_seconds"), ("probation_timeout_seconds", "probation_timeout")):
+        if key in settings:
+            kwargs[arg] = settings[key]
+    return ConfigBreakers(**kwargs)
+
+
+def _build_events(config: Dict) -> EventBus:
+    settings = config.get("events") or {}
+    return EventBus(history=settings.get("history", DEFAULT_EVENT_HISTORY),
+                    buffer=settings.get("subscriber_buffer", DEFAULT_EVENT_BUFFER))
+
+
+def _build_launch_experiment(config: Dict) -> LaunchExperiment:
+    return LaunchExperiment.from_config(config.get("launch_profiles"))
+
+
+def _build_profile_pools(pool: ContainerPool, config: Dict) -> None:
+    """Register a pool per config.json "pools" profile next to the default one."""
+    profiles = config.get("pools") or {}
+    if profiles and pool.store is not None:
+        logger.warning("Profile pools are not supported with shared_state; serving the default pool only")
+        return
+    for name, profile in profiles.items():
+        if name in pool.peers:
+            logger.warning("Ignoring profile pool %s: name already in use", name)
+            continue
+        fields = {k: v for k, v in profile.items() if k in NewProxyRequest.model_fields and k != "profile"}
+        ContainerPool(
+            target_size=profile.get("size", 0),
+            request_config=NewProxyRequest(profile=name, **fields).model_dump(),
+            max_repair_attempts=MAX_REPAIR_ATTEMPTS,
+            resource_config=config.get("resource_sampler"),
+            monitor_config=config.get("health_monitor"),
+            retry_config=config.get("retry"),
+            name=name,
+            parent=pool,
+            weight=profile.get("weight", 1.0),
+            admission_config=profile.get("admission", config.get("admission")),
+        )
+
+
+def _build_gateway(config: Dict, pools: Dict) -> Optional[Gateway]:
+    settings = config.get("gateway") or {}
+    if not settings.get("enabled"):
+        return None
+    return Gateway(pools, DEFAULT_POOL_NAME, host=settings.get("listen", "0.0.0.0"),
+                   port=settings.get("port", DEFAULT_GATEWAY_PORT),
+                   session_ttl=settings.get("session_ttl_seconds", DEFAULT_SESSION_TTL),
+                   drain_seconds=settings.get("drain_seconds", DEFAULT_DRAIN_SECONDS))
+
+
+def _build_placement(config: Dict) -> Optional[HostPlacement]:
+    hosts = config.get("docker_hosts")
+    if not hosts:
+        return None
+    return HostPlacement.from_config(hosts)
+
+
 POOL = ContainerPool(
     target_size=_load_pool_target_size(),
     request_config=NewProxyRequest().model_dump(),
     max_repair_attempts=MAX_REPAIR_ATTEMPTS,
+    exit_ip_history_seconds=_RUNTIME_CONFIG.get("exit_ip_history_seconds",
+                                                DEFAULT_EXIT_IP_HISTORY_SECONDS),
+    resource_config=_RUNTIME_CONFIG.get("resource_sampler"),
+    placement=_build_placement(_RUNTIME_CONFIG),
+    store=_build_store(_RUNTIME_CONFIG),
+    inventory=_build_inventory(_RUNTIME_CONFIG),
+    monitor_config=_RUNTIME_CONFIG.get("health_monitor"),
+    breakers=_build_breakers(_RUNTIME_CONFIG),
+    rate_limits=_RUNTIME_CONFIG.get("rate_limits"),
+    workers=_RUNTIME_CONFIG.get("pool_workers", DEFAULT_POOL_WORKERS),
+    retry_config=_RUNTIME_CONFIG.get("retry"),
+    admission_config=_RUNTIME_CONFIG.get("admission"),
+    launch_experiment=_build_launch_experiment(_RUNTIME_CONFIG),
+    events=_build_events(_RUNTIME_CONFIG),
+    protocols=ProtocolSelector.from_config(_RUNTIME_CONFIG.get("protocols")),
 )
+_build_profile_pools(POOL, _RUNTIME_CONFIG)
+POOLS = POOL.peers
+# Optional single proxy endpoint in front of every pool, config.json "gateway"
+GATEWAY = _build_gateway(_RUNTIME_CONFIG, POOLS)
+
+# Thread dumps, sampling profiles and lock timings under /debug; opt-in via config.json "debug"
+DEBUG_ENABLED = bool((_RUNTIME_CONFIG.get("debug") or {}).get("enabled", False))
+PROFILER = SamplingProfiler()
+
+# Optional JSONL log of every API call for replay_traffic.py, config.json "traffic_recording"
+_TRAFFIC = _RUNTIME_CONFIG.get("traffic_recording") or {}
+if _TRAFFIC.get("enabled"):
+    app.add_middleware(TrafficRecorder, path=_TRAFFIC.get("path", DEFAULT_TRAFFIC_PATH))
+
+
+def _pool_for_request(req: Optional[NewProxyRequest]) -> ContainerPool:
+    """The pool named by ``req.profile``, else the one whose profile equals the request."""
+    req = req or NewProxyRequest()
+    if req.profile:
+        return _pool_named(req.profile)
+    requested = req.model_dump()
+    for pool in POOLS.values():
+        if dict(pool.request_config, profile=None) == requested:
+            return pool
+    raise HTTPException(status_code=400,
+                        detail={"status": "error", "message": "pool_config_is_static"})
+
+
+def _pool_named(profile: Optional[str]) -> ContainerPool:
+    pool = POOLS.get(profile or DEFAULT_POOL_NAME)
+    if pool is None:
+        raise HTTPException(status_code=404,
+                            detail={"status": "error", "message": f"unknown_profile: {profile}"})
+    return pool
 
 
-def _ensure_config_matches(req: Optional[NewProxyRequest]) -> None:
-    requested = (req or NewProxyRequest()).model_dump()
-    if requested != POOL.request_config:
-        raise HTTPException(status_code=400,
-                            detail={"status": "error", "message": "pool_config_is_static"})
+def _pool_of(name: str) -> ContainerPool:
+    """The pool that owns container ``name`` (the default pool if none does)."""
+    for pool in POOLS.values():
+        if name in pool.registry:
+            return pool
+    return POOL
+
+
+def _save_job(job_id: str, job: Dict) -> None:
+    if POOL.store is not None:
+        POOL.store.put_job(job_id, job)
+    else:
+        JOBS[job_id] = job
+
+
+def _load_job(job_id: str) -> Optional[Dict]:
+    if POOL.store is not None:
+        return POOL.store.get_job(job_id)
+    return JOBS.get(job_id)
 
 
 def _get_manager() -> VPNManager:
-    return VPNManager(**POOL.manager_kwargs)
+    return POOL._new_manager()
 
 
 @app.on_event("startup")
 def startup_pool() -> None:
-    POOL.start()
+    # Only the coordinator serves the gateway: followers would fail to bind the port and
+    # route from an empty registry
+    if GATEWAY is not None and GATEWAY.start not in POOL.on_coordinator:
+        POOL.on_coordinator.append(GATEWAY.start)
+    for pool in list(POOLS.values()):
+        pool.start()
 
 
 @app.post("/new_proxy")
-def new_proxy(req: Optional[NewProxyRequest] = None):
+def new_proxy(req: Optional[NewProxyRequest] = None, x_deadline_ms: Optional[int] = Header(None)):
     try:
-        _ensure_config_matches(req)
-        container = POOL.get_valid()
+        pool = _pool_for_request(req)
+        # Callers that send X-Deadline-Ms wait for a container if the estimate fits their budget
+        deadline = x_deadline_ms / 1000 if x_deadline_ms and x_deadline_ms > 0 else None
+        container, retry_after = pool.acquire(deadline)
         if container:
             return container
-        if not POOL.start_worker:
-            created = POOL.create_sync()
-            if created:
-                return created
-        POOL.request_fill(1)
-        raise HTTPException(status_code=503,
-                            detail={"status": "error", "message": "no_available_container"})
+        message = "creates_halted" if pool.halt.alert() else "no_available_container"
+        raise HTTPException(status_code=503, detail={"status": "error", "message": message},
+                            headers={"Retry-After": str(retry_after)})
     except HTTPException:
         raise
     except FileNotFoundError as exc:
@@ -491,35 +1313,37 @@ def new_proxy(req: Optional[NewProxyRequest] = None):
 
 @app.post("/new_proxy_async")
 def new_proxy_async(req: Optional[NewProxyRequest] = None):
-    _ensure_config_matches(req)
+    pool = _pool_for_request(req)
     job_id = str(uuid.uuid4())
-    JOBS[job_id] = {"status": "queued", "result": None, "created_at": int(time.time())}
+    job = {"status": "queued", "result": None, "created_at": int(time.time())}
+    _save_job(job_id, job)
 
     def worker():
         try:
-            container = POOL.get_valid()
+            container = pool.get_valid()
             if not container:
-                if not POOL.start_worker:
-                    container = POOL.create_sync()
+                if not pool.start_worker:
+                    container = pool.create_sync()
                 else:
-                    POOL.request_fill(1)
+                    pool.request_fill(1)
             if container:
-                JOBS[job_id]["result"] = container
-                JOBS[job_id]["status"] = "done"
+                job["result"] = container
+                job["status"] = "done"
             else:
-                JOBS[job_id]["result"] = {"status": "error", "message": "no_available_container"}
-                JOBS[job_id]["status"] = "error"
+                job["result"] = {"status": "error", "message": "no_available_container"}
+                job["status"] = "error"
         except Exception as exc:
-            JOBS[job_id]["result"] = {"status": "error", "message": str(exc)}
-            JOBS[job_id]["status"] = "error"
+            job["result"] = {"status": "error", "message": str(exc)}
+            job["status"] = "error"
+        _save_job(job_id, job)
 
-    Thread(target=worker, daemon=True).start()
+    Thread(target=worker, name=f"job-{job_id[:8]}", daemon=True).start()
     return {"status": "accepted", "job_id": job_id}
 
 
 @app.get("/job/{job_id}")
 def get_job(job_id: str):
-    job = JOBS.get(job_id)
+    job = _load_job(job_id)
     if not job:
         raise HTTPException(status_code=404,
                             detail={"status": "error", "message": "job_not_found"})
@@ -529,7 +1353,7 @@ def get_job(job_id: str):
 @app.post("/restart_and_check")
 def restart_and_check(request: RestartRequest):
     try:
-        replacement = POOL.mark_for_restart(request.container_name)
+        replacement = _pool_of(request.container_name).mark_for_restart(request.container_name)
     except KeyError as exc:
         key = exc.args[0] if exc.args else request.container_name
         raise HTTPException(status_code=404,
@@ -549,38 +1373,237 @@ def restart_and_check_named(name: str):
     return restart_and_check(RestartRequest(container_name=name))
 
 
+def _stream_lease(pool: ContainerPool, count: int, wait: float) -> Iterator[str]:
+    leased = set()
+    deadline = time.time() + wait
+    fill_requested = False
+    while True:
+        for entry in pool.lease(count - len(leased), exclude=leased):
+            leased.add(entry["container_name"])
+            yield json.dumps(entry) + "\n"
+        missing = count - len(leased)
+        if not missing:
+            return
+        remaining = deadline - time.time()
+        if not fill_requested:
+            pool.request_fill(missing)
+            fill_requested = True
+            if remaining > 0:
+                # Inline creates (no worker threads) are already valid; pick them up first
+                continue
+        if remaining <= 0:
+            break
+        pool.wait_for_valid(remaining)
+    yield json.dumps({"status": "error", "message": "no_available_container",
+                      "leased": len(leased), "requested": count}) + "\n"
+
+
+@app.post("/proxies/lease")
+def lease_proxies(n: int = Query(1, ge=1, le=MAX_LEASE_SIZE),
+                  wait: float = Query(0.0, ge=0, le=MAX_LEASE_WAIT_SECONDS),
+                  profile: Optional[str] = None):
+    pool = _pool_named(profile)
+    return StreamingResponse(_stream_lease(pool, n, wait), media_type="application/x-ndjson")
+
+
 @app.post("/new_proxies")
 def new_proxies():
     raise HTTPException(status_code=400,
                         detail={"status": "error", "message": "bulk proxy creation unsupported in pool mode"})
 
 
+def _proxy_info(record: Dict) -> Dict:
+    info = {k: v for k, v in record.items() if k not in ("attrs", "source")}
+    if POOL.placement is not None:
+        info["host"] = record.get("source")
+    return info
+
+
+def _inventory_ready() -> bool:
+    # Sources are attached by the first manager; until then the cache knows nothing
+    return bool(POOL.inventory.sources)
+
+
 @app.get("/proxies")
-def list_proxies():
+def list_proxies(refresh: bool = False):
+    if not refresh and _inventory_ready():
+        # Straight from memory: building a manager re-reads config.json and the .ovpn catalog
+        return {"status": "ok", "items": [_proxy_info(r) for r in POOL.inventory.items()]}
     try:
         manager = _get_manager()
-        return manager.list_proxies()
+        return manager.list_proxies(refresh=refresh)
     except Exception as exc:
         logger.exception("Failed to list proxies")
         raise HTTPException(status_code=500, detail={"status": "error", "message": str(exc)})
 
 
 @app.get("/proxy/{name}")
-def get_proxy(name: str):
+def get_proxy(name: str, refresh: bool = False):
+    if not refresh and _inventory_ready():
+        record = POOL.inventory.get(name)
+        if record is None:
+            raise HTTPException(status_code=404, detail={"status": "error", "message": "not_found"})
+        info = _proxy_info(record)
+        info["state"] = info.pop("status", None)
+        return {"status": "ok", **info}
     try:
         manager = _get_manager()
-        res = manager.get_proxy(name)
-        if res.get("status") == "ok":
-            return res
-        raise HTTPException(status_code=404, detail=res)
+        res = manager.get_proxy(name, refresh=refresh)
     except Exception as exc:
         logger.exception("Failed to get proxy")
         raise HTTPException(status_code=500, detail={"status": "error", "message": str(exc)})
+    if res.get("status") == "ok":
+        return res
+    raise HTTPException(status_code=404, detail=res)
+
+
+@app.get("/pools")
+def pools():
+    return {"status": "ok", "items": [pool.describe() for pool in POOLS.values()]}
+
+
+@app.get("/slo")
+def slo():
+    return {"status": "ok", "items": {name: pool.admission.stats() for name, pool in POOLS.items()}}
+
+
+@app.get("/events")
+def events(since: Optional[int] = Query(None, ge=0), profile: Optional[str] = None,
+           last_event_id: Optional[str] = Header(None)):
+    if profile is not None:
+        _pool_named(profile)
+    if since is None and last_event_id and last_event_id.isdigit():
+        # EventSource reconnects send the last id they saw
+        since = int(last_event_id)
+    # Async generator: open streams wait on the event loop, not in the sync endpoints' threadpool
+    return StreamingResponse(POOL.events.astream(since=since, profile=profile), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/events/stats")
+def event_stats():
+    return {"status": "ok", **POOL.events.stats()}
+
+
+@app.get("/gateway")
+def gateway():
+    if GATEWAY is None:
+        raise HTTPException(status_code=404, detail={"status": "error", "message": "gateway_disabled"})
+    return {"status": "ok", **GATEWAY.stats()}
+
+
+@app.get("/launch_profiles")
+def launch_profiles():
+    return {"status": "ok", **POOL.launch_experiment.stats()}
+
+
+@app.delete("/launch_profiles")
+def reset_launch_profiles():
+    POOL.launch_experiment.reset()
+    return {"status": "ok"}
+
+
+def _require_debug() -> None:
+    if not DEBUG_ENABLED:
+        raise HTTPException(status_code=404, detail={"status": "error", "message": "debug_disabled"})
+
+
+@app.get("/debug/threads")
+def debug_threads():
+    _require_debug()
+    items = dump_stacks()
+    return {"status": "ok", "count": len(items), "items": items}
+
+
+@app.get("/debug/profile")
+def debug_profile(seconds: float = Query(DEFAULT_PROFILE_SECONDS, gt=0, le=MAX_PROFILE_SECONDS),
+                  interval_ms: float = Query(DEFAULT_SAMPLE_INTERVAL * 1000, ge=1, le=1000),
+                  top: int = Query(DEFAULT_TOP, ge=1, le=1000),
+                  thread: Optional[str] = None):
+    _require_debug()
+    report = PROFILER.profile(seconds, interval_ms / 1000, top, thread_prefix=thread)
+    if report is None:
+        raise HTTPException(status_code=409, detail={"status": "error", "message": "profile_in_progress"})
+    return {"status": "ok", **report}
+
+
+@app.get("/debug/locks")
+def debug_locks():
+    _require_debug()
+    return {"status": "ok", "items": [pool.lock.stats() for pool in POOLS.values()]}
+
+
+@app.delete("/debug/locks")
+def reset_debug_locks():
+    _require_debug()
+    for pool in POOLS.values():
+        pool.lock.reset()
+    return {"status": "ok"}
+
+
+@app.get("/protocols")
+def protocols():
+    return {"status": "ok", **POOL.protocols.stats()}
+
+
+@app.get("/exit_ips")
+def exit_ips():
+    return {"status": "ok", **POOL.exit_ip_stats()}
+
+
+@app.get("/hosts")
+def hosts():
+    return {"status": "ok", **POOL.host_stats()}
+
+
+@app.get("/scheduler")
+def scheduler():
+    return {"status": "ok", **POOL.scheduler_stats()}
+
+
+@app.get("/alerts")
+def alerts():
+    return {"status": "ok", "items": POOL.alerts()}
+
+
+@app.delete("/alerts")
+def clear_alerts():
+    return {"status": "ok", "cleared": POOL.clear_halt()}
+
+
+@app.get("/health_monitor")
+def health_monitor():
+    return {"status": "ok", **POOL.health_stats()}
+
+
+@app.get("/resources")
+def resources():
+    items = {}
+    for pool in POOLS.values():
+        items.update(pool.resource_report())
+    return {"status": "ok", "items": items}
+
+
+@app.get("/proxy/{name}/status")
+def proxy_status(name: str):
+    try:
+        manager = _get_manager()
+        res = manager.tunnel_status(name)
+    except Exception as exc:
+        logger.exception("Failed to read tunnel status")
+        raise HTTPException(status_code=500, detail={"status": "error", "message": str(exc)})
+    if res.get("status") == "ok":
+        return res
+    raise HTTPException(status_code=404, detail=res)
 
 
 @app.post("/maintenance/sweep")
 def maintenance_sweep():
-    return POOL.run_sweeper()
+    result = POOL.run_sweeper()
+    for pool in POOLS.values():
+        if pool is not POOL:
+            result["processed"].extend(pool.run_sweeper()["processed"])
+    return result
 
 
 @app.delete("/proxy/{name}")
@@ -589,7 +1612,7 @@ def delete_proxy(name: str):
         manager = _get_manager()
         res = manager.delete_proxy(name)
         if res.get("status") == "ok":
-            POOL.remove_container(name)
+            _pool_of(name).remove_container(name)
             return res
         raise HTTPException(status_code=404, detail=res)
     except Exception as exc:
@@ -602,7 +1625,8 @@ def delete_all_proxies():
     try:
         manager = _get_manager()
         res = manager.delete_all_proxies()
-        POOL.reset_state()
+        for pool in list(POOLS.values()):
+            pool.reset_state()
         return res
     except Exception as exc:
         logger.exception("Failed to delete all proxies")
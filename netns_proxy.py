@@ -0,0 +1,120 @@
+"""Minimal HTTP/CONNECT forward proxy used by the network-namespace backend.
+
+The backend binds the listening socket in the host namespace and hands it to
+this process (``--fd``), which is started with ``ip netns exec`` so every
+outbound connection leaves through the namespace's VPN tunnel.
+"""
+import argparse
+import logging
+import select
+import socket
+import socketserver
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_HEAD_BYTES = 64 * 1024
+CONNECT_TIMEOUT = 15
+IDLE_TIMEOUT = 300
+HOP_HEADERS = {"proxy-connection", "proxy-authorization", "connection", "keep-alive"}
+
+
+def _read_head(sock: socket.socket) -> Tuple[bytes, bytes]:
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > MAX_HEAD_BYTES:
+            raise ValueError("request_head_too_large")
+    head, _, rest = data.partition(b"\r\n\r\n")
+    return head, rest
+
+
+def _split_hostport(value: str, default_port: int) -> Tuple[str, int]:
+    if value.startswith("["):
+        host, _, port = value[1:].partition("]")
+        port = port.lstrip(":")
+    else:
+        host, _, port = value.rpartition(":") if value.count(":") == 1 else (value, "", "")
+    return host, int(port) if port else default_port
+
+
+def _relay(a: socket.socket, b: socket.socket) -> None:
+    sockets = [a, b]
+    while True:
+        readable, _, errored = select.select(sockets, [], sockets, IDLE_TIMEOUT)
+        if errored or not readable:
+            return
+        for src in readable:
+            dst = b if src is a else a
+            data = src.recv(65536)
+            if not data:
+                return
+            dst.sendall(data)
+
+
+class ProxyHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        client = self.request
+        upstream: Optional[socket.socket] = None
+        try:
+            head, rest = _read_head(client)
+            if not head:
+                return
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, version = lines[0].split(" ", 2)
+            if method.upper() == "CONNECT":
+                host, port = _split_hostport(target, 443)
+                upstream = socket.create_connection((host, port), timeout=CONNECT_TIMEOUT)
+                client.sendall(b"HTTP/1.1 200 Connection established\r\n\r\n")
+                if rest:
+                    upstream.sendall(rest)
+            else:
+                url = urlsplit(target)
+                if url.scheme != "http" or not url.hostname:
+                    client.sendall(b"HTTP/1.1 400 Bad Request\r\nConnection: close\r\n\r\n")
+                    return
+                path = url.path or "/"
+                if url.query:
+                    path = f"{path}?{url.query}"
+                headers = [h for h in lines[1:] if h.split(":", 1)[0].strip().lower() not in HOP_HEADERS]
+                headers.append("Connection: close")
+                request_head = "\r\n".join([f"{method} {path} {version}"] + headers) + "\r\n\r\n"
+                upstream = socket.create_connection((url.hostname, url.port or 80), timeout=CONNECT_TIMEOUT)
+                upstream.sendall(request_head.encode("latin-1") + rest)
+            upstream.settimeout(None)
+            _relay(client, upstream)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Proxy request failed: {e}")
+            try:
+                client.sendall(b"HTTP/1.1 502 Bad Gateway\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+        finally:
+            if upstream is not None:
+                upstream.close()
+
+
+class InheritedSocketServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self, fd: int) -> None:
+        super().__init__(("0.0.0.0", 0), ProxyHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = socket.socket(fileno=fd)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fd", type=int, required=True, help="inherited listening socket")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = InheritedSocketServer(args.fd)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import time
+import random
+import logging
+from threading import Lock
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST_CAPACITY = 50
+HEALTH_CHECK_INTERVAL = 30
+MAX_LAUNCH_FAILURES = 3
+
+
+class DockerHost:
+    """One Docker endpoint the pool may place proxies on.
+
+    ``address`` is how the manager reaches published ports (validation,
+    gluetun's control server); ``public_address`` is what goes into the
+    ``proxy_url`` handed to clients.
+    """
+
+    def __init__(self, name: str, base_url: Optional[str] = None, address: str = "127.0.0.1",
+                 public_address: Optional[str] = None, capacity: int = DEFAULT_HOST_CAPACITY,
+                 port_min: int = 8887, port_max: int = 20000,
+                 backend_options: Optional[Dict] = None, backend=None) -> None:
+        self.name = name
+        self.base_url = base_url
+        self.address = address
+        self.public_address = public_address or address
+        self.capacity = max(0, int(capacity))
+        self.port_min = int(port_min)
+        self.port_max = int(port_max)
+        self.backend_options = dict(backend_options or {})
+        self.backend = backend
+        self.local = not base_url or base_url.startswith("unix://")
+        self.healthy = True
+        self.last_error: Optional[str] = None
+        self.launch_failures = 0
+        self.checked_at = 0.0
+        self.containers: Dict[str, int] = {}
+        self.pending = 0
+
+    @property
+    def load(self) -> int:
+        return len(self.containers) + self.pending
+
+    def describe(self) -> Dict:
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "public_address": self.public_address,
+            "capacity": self.capacity,
+            "containers": len(self.containers),
+            "pending": self.pending,
+            "healthy": self.healthy,
+            "last_error": self.last_error,
+            "port_range": [self.port_min, self.port_max],
+        }
+
+
+class HostPlacement:
+    """Spread pool containers across Docker hosts by relative load.
+
+    Built from ``docker_hosts`` in config.json. ``VPNManager`` reserves a
+    host before launching, commits the container name on success and the
+    pool releases it on removal, so load and used ports stay in sync
+    without asking every daemon.
+    """
+
+    def __init__(self, hosts: List[DockerHost], health_interval: float = HEALTH_CHECK_INTERVAL) -> None:
+        if not hosts:
+            raise ValueError("HostPlacement needs at least one host")
+        self.hosts = {h.name: h for h in hosts}
+        self.health_interval = health_interval
+        self.lock = Lock()
+        self.located: Dict[str, str] = {}
+        self.inventory_loaded = False
+
+    @classmethod
+    def from_config(cls, entries: List[Dict]) -> "HostPlacement":
+        hosts = []
+        for i, entry in enumerate(entries):
+            spec = dict(entry)
+            spec.setdefault("name", f"host-{i}")
+            hosts.append(DockerHost(**spec))
+        return cls(hosts)
+
+    def reserve(self) -> Optional[DockerHost]:
+        """Pick the healthy host with the lowest load/capacity ratio and hold a slot on it."""
+        self._check_health_if_due()
+        with self.lock:
+            candidates = [h for h in self.hosts.values() if h.healthy and h.load < h.capacity]
+            if not candidates:
+                return None
+            host = min(candidates, key=lambda h: (h.load / h.capacity, h.load))
+            host.pending += 1
+            return host
+
+    def commit(self, host: DockerHost, name: str, port: int) -> None:
+        with self.lock:
+            host.pending = max(0, host.pending - 1)
+            host.containers[name] = port
+            host.launch_failures = 0
+            self.located[name] = host.name
+
+    def cancel(self, host: DockerHost, error: Optional[str] = None) -> None:
+        with self.lock:
+            host.pending = max(0, host.pending - 1)
+            if error:
+                host.launch_failures += 1
+                host.last_error = error
+                if host.launch_failures >= MAX_LAUNCH_FAILURES and host.healthy:
+                    logger.warning("Host %s marked unhealthy after %s launch failures", host.name,
+                                   host.launch_failures)
+                    host.healthy = False
+
+    def release(self, name: str) -> None:
+        with self.lock:
+            host_name = self.located.pop(name, None)
+            for host in self.hosts.values():
+                if host_name is None or host.name == host_name:
+                    host.containers.pop(name, None)
+
+    def locate(self, name: str) -> Optional[DockerHost]:
+        with self.lock:
+            host_name = self.located.get(name)
+            return self.hosts.get(host_name) if host_name else None
+
+    def remember(self, host: DockerHost, name: str, port: Optional[int] = None) -> None:
+        with self.lock:
+            self.located[name] = host.name
+            if port:
+                host.containers[name] = int(port)
+
+    def pick_port(self, host: DockerHost, port_min: int, port_max: int) -> int:
+        """Random port in the host's range that no tracked container uses."""
+        low, high = max(port_min, host.port_min), min(port_max, host.port_max)
+        if low > high:
+            raise RuntimeError(f"No port range left on host {host.name}")
+        with self.lock:
+            used = set(host.containers.values())
+        for _ in range(50):
+            port = random.randint(low, high)
+            if port not in used:
+                return port
+        for port in range(low, high + 1):
+            if port not in used:
+                return port
+        raise RuntimeError(f"No free port available on host {host.name}")
+
+    def all_hosts(self) -> List[DockerHost]:
+        return list(self.hosts.values())
+
+    def stats(self) -> Dict:
+        with self.lock:
+            hosts = [h.describe() for h in self.hosts.values()]
+        return {
+            "hosts": hosts,
+            "capacity": sum(h["capacity"] for h in hosts if h["healthy"]),
+            "containers": sum(h["containers"] for h in hosts),
+        }
+
+    def check_health(self) -> None:
+        for host in self.all_hosts():
+            ok, error = True, None
+            if host.backend is not None:
+                try:
+                    ok = bool(host.backend.ping())
+                except Exception as exc:
+                    ok, error = False, str(exc)
+            with self.lock:
+                host.checked_at = time.time()
+                if ok and not host.healthy:
+                    logger.info("Host %s is healthy again", host.name)
+                    host.launch_failures = 0
+                host.healthy = ok
+                if error:
+                    host.last_error = error
+
+    def _check_health_if_due(self) -> None:
+        now = time.time()
+        if any(now - h.checked_at >= self.health_interval for h in self.hosts.values()):
+            self.check_health()
@@ -0,0 +1,187 @@
+import json
+import time
+import asyncio
+from collections import deque
+from threading import Condition
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional
+
+DEFAULT_HISTORY = 2048
+DEFAULT_BUFFER = 256
+HEARTBEAT_SECONDS = 15.0
+
+EVENT_CREATED = "created"
+EVENT_VALIDATED = "validated"
+EVENT_INVALIDATED = "invalidated"
+EVENT_REPAIR_STARTED = "repair_started"
+EVENT_REPLACED = "replaced"
+EVENT_REMOVED = "removed"
+# Sent to a subscriber instead of events it can no longer get: resync from GET /proxies
+EVENT_RESET = "reset"
+# Last message to a subscriber that fell ``buffer`` events behind; reconnect with Last-Event-ID
+EVENT_OVERFLOW = "overflow"
+
+
+class Subscriber:
+    def __init__(self, buffer: int, profile: Optional[str] = None,
+                 wakeup: Optional[Callable[[], None]] = None) -> None:
+        self.queue: Deque[Dict] = deque()
+        self.buffer = buffer
+        self.profile = profile
+        # Called (from the publishing thread) when there is something new; async streams use it
+        self.wakeup = wakeup
+        self.overflowed = False
+        self.closed = False
+        # Last seq handed to the client; where it resumes after an overflow
+        self.last_seq = 0
+
+    def wants(self, event: Dict) -> bool:
+        return self.profile is None or event.get("pool") == self.profile
+
+
+class EventBus:
+    """Fan-out of pool state changes with sequence numbers for resuming.
+
+    ``publish`` is called with the pool lock held, so it only appends: the
+    event goes into a shared ``history`` ring and into each subscriber's
+    queue. A subscriber that falls ``buffer`` events behind is dropped
+    (with a final ``overflow`` event) rather than slowing the pool down or
+    growing without bound; it reconnects with the last ``seq`` it saw and
+    is replayed from history. If that ``seq`` is no longer in history it
+    gets a ``reset`` event first.
+
+    ``astream`` serves HTTP clients from the event loop, so open streams
+    don't each hold a threadpool thread the sync endpoints need.
+    """
+
+    def __init__(self, history: int = DEFAULT_HISTORY, buffer: int = DEFAULT_BUFFER) -> None:
+        self.condition = Condition()
+        self.history: Deque[Dict] = deque(maxlen=max(1, int(history)))
+        self.buffer = max(1, int(buffer))
+        self.seq = 0
+        self.subscribers: List[Subscriber] = []
+        self.dropped = 0
+
+    def publish(self, event_type: str, pool: str, entry: Optional[Dict] = None, **fields) -> Dict:
+        with self.condition:
+            self.seq += 1
+            event = {"seq": self.seq, "type": event_type, "ts": round(time.time(), 3), "pool": pool,
+                     "entry": entry, **fields}
+            self.history.append(event)
+            for subscriber in list(self.subscribers):
+                if not subscriber.wants(event):
+                    continue
+                if len(subscriber.queue) >= subscriber.buffer:
+                    subscriber.overflowed = True
+                    self.subscribers.remove(subscriber)
+                    self.dropped += 1
+                else:
+                    subscriber.queue.append(event)
+                self._wake(subscriber)
+            self.condition.notify_all()
+            return event
+
+    def subscribe(self, since: Optional[int] = None, profile: Optional[str] = None,
+                  buffer: Optional[int] = None, wakeup: Optional[Callable[[], None]] = None) -> Subscriber:
+        """New subscriber, first replaying the events after ``since`` that are still in history."""
+        subscriber = Subscriber(self.buffer if buffer is None else max(1, int(buffer)), profile, wakeup)
+        with self.condition:
+            subscriber.last_seq = self.seq if since is None else since
+            if since is not None:
+                oldest = self.history[0]["seq"] if self.history else self.seq + 1
+                if since > self.seq or since < oldest - 1:
+                    # Unknown position (history rolled over or the service restarted)
+                    subscriber.queue.append({"seq": self.seq, "type": EVENT_RESET, "ts": round(time.time(), 3),
+                                             "pool": profile, "entry": None})
+                else:
+                    subscriber.queue.extend(e for e in self.history if e["seq"] > since and subscriber.wants(e))
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self.condition:
+            subscriber.closed = True
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def next_event(self, subscriber: Subscriber, timeout: float) -> Optional[Dict]:
+        """Next queued event, the overflow marker once dropped, or None after ``timeout``."""
+        deadline = time.time() + timeout
+        with self.condition:
+            while not subscriber.queue:
+                if subscriber.overflowed:
+                    subscriber.overflowed = False
+                    subscriber.closed = True
+                    return {"seq": subscriber.last_seq, "type": EVENT_OVERFLOW, "ts": round(time.time(), 3),
+                            "pool": subscriber.profile, "entry": None}
+                if subscriber.closed:
+                    return None
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            event = subscriber.queue.popleft()
+            subscriber.last_seq = event["seq"]
+            return event
+
+    def stream(self, since: Optional[int] = None, profile: Optional[str] = None,
+               heartbeat: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+        """Server-sent events for one client; comment lines keep idle connections alive."""
+        subscriber = self.subscribe(since, profile)
+        try:
+            yield f"retry: 2000\n: subscribed at seq {self.seq}\n\n"
+            while not subscriber.closed:
+                event = self.next_event(subscriber, heartbeat)
+                if event is None:
+                    if subscriber.closed:
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def astream(self, since: Optional[int] = None, profile: Optional[str] = None,
+                      heartbeat: float = HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+        """``stream`` for the event loop: waits on an ``asyncio.Event`` set by ``publish``."""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        def wakeup() -> None:
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                # Loop already closed; the stream is gone
+                pass
+
+        subscriber = self.subscribe(since, profile, wakeup=wakeup)
+        try:
+            yield f"retry: 2000\n: subscribed at seq {self.seq}\n\n"
+            while not subscriber.closed:
+                ready.clear()
+                # timeout=0 never blocks; anything published after clear() sets ``ready`` again
+                event = self.next_event(subscriber, 0)
+                if event is not None:
+                    yield format_sse(event)
+                    continue
+                if subscriber.closed:
+                    return
+                try:
+                    await asyncio.wait_for(ready.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> Dict:
+        with self.condition:
+            return {"seq": self.seq, "subscribers": len(self.subscribers), "history": len(self.history),
+                    "buffer": self.buffer, "dropped_subscribers": self.dropped}
+
+    @staticmethod
+    def _wake(subscriber: Subscriber) -> None:
+        if subscriber.wakeup is not None:
+            subscriber.wakeup()
+
+
+def format_sse(event: Dict) -> str:
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
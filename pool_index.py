@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class ValidRing:
+    """Round-robin order of valid container names.
+
+    An ``OrderedDict`` used as an ordered set: add, discard and rotate are
+    all O(1), unlike ``deque.remove``. It carries its own lock so hand-outs
+    don't contend with the pool's registry lock.
+    """
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.order: "OrderedDict[str, None]" = OrderedDict()
+
+    def add(self, name: str) -> None:
+        """Insert ``name`` at the back of the rotation (or move it there)."""
+        with self.lock:
+            self.order[name] = None
+            self.order.move_to_end(name)
+
+    def discard(self, name: str) -> None:
+        with self.lock:
+            self.order.pop(name, None)
+
+    def rotate(self) -> Optional[str]:
+        """Return the name at the front and move it to the back."""
+        with self.lock:
+            if not self.order:
+                return None
+            name = next(iter(self.order))
+            self.order.move_to_end(name)
+            return name
+
+    def take(self, count: int, exclude: Iterable[str] = ()) -> List[str]:
+        """Rotate up to ``count`` distinct names (skipping ``exclude``) in one critical section."""
+        exclude = set(exclude)
+        with self.lock:
+            names = []
+            for name in self.order:
+                if len(names) >= count:
+                    break
+                if name not in exclude:
+                    names.append(name)
+            for name in names:
+                self.order.move_to_end(name)
+            return names
+
+    def clear(self) -> None:
+        with self.lock:
+            self.order.clear()
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.order
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __iter__(self) -> Iterator[str]:
+        with self.lock:
+            return iter(list(self.order))
+
+
+class PoolEntry:
+    """Slotted registry record with the dict interface the pool code uses.
+
+    Known fields live in slots (``None`` means unset, as with a missing
+    key); anything else a backend returns is kept in ``extra``.
+    """
+
+    __slots__ = ("status", "container_id", "container_name", "proxy_url", "proxy_port", "ip_seen",
+                 "host", "config", "state", "last_updated", "resources", "resource_strikes", "extra")
+    FIELDS = frozenset(__slots__) - {"extra"}
+
+    def __init__(self, **values) -> None:
+        for field in self.FIELDS:
+            object.__setattr__(self, field, None)
+        self.extra: Optional[Dict] = None
+        for key, value in values.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PoolEntry":
+        return cls(**data)
+
+    def __getitem__(self, key: str):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value) -> None:
+        if key in self.FIELDS:
+            object.__setattr__(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+        else:
+            value = (self.extra or {}).get(key)
+        return default if value is None else value
+
+    def setdefault(self, key: str, default=None):
+        value = self.get(key)
+        if value is None:
+            self[key] = default
+            return default
+        return value
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def to_dict(self) -> Dict:
+        data = {field: getattr(self, field) for field in self.__slots__[:-1] if getattr(self, field) is not None}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __repr__(self) -> str:
+        return f"PoolEntry({self.to_dict()!r})"
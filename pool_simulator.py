@@ -0,0 +1,653 @@
+"""Offline discrete-event simulation of the container pool for sizing and policy tuning.
+
+Runs the real ``main.ContainerPool`` (task queue, retry backoff, repair and
+sweep logic, health monitor, admission) on a virtual clock. Only Docker is
+simulated: creates, restarts and container failures are drawn from a
+model of measured durations and failure rates. Clients arrive as a
+Poisson stream (``--rate``) or replay the ``/new_proxy`` calls of a
+recorded traffic file (``--traffic``). Every combination of the policy
+options is simulated with the same seed, and for each one the report gives
+the 503 rate, wait-time percentiles, SLO attainment and container-minutes.
+The cheapest policy that meets the SLO target is marked.
+
+    python pool_simulator.py --rate 0.2 --hours 6 --pool-size 4,6,8 \\
+        --max-repair-attempts 1,2,3 --health-timeout 30,45,60 --restart-wait 15,30
+
+``--model`` takes a JSON file with the Docker-side numbers (see
+``SimModel``); the time-to-healthy percentiles are what ``GET /protocols``
+and ``GET /launch_profiles`` report for a running pool.
+"""
+import argparse
+import heapq
+import importlib
+import itertools
+import json
+import logging
+import math
+import random
+import sys
+import threading
+from collections import deque
+from contextlib import contextmanager
+from queue import Empty
+from typing import Callable, Dict, Iterator, List, Optional
+
+import main
+from admission import quantile
+from task_scheduler import PRIORITY_CREATE
+from traffic_log import load_traffic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOURS = 6.0
+DEFAULT_RATE = 0.2
+DEFAULT_DEADLINE_SECONDS = 10.0
+DEFAULT_WARMUP_SECONDS = 300.0
+DEFAULT_SWEEP_INTERVAL = 60.0
+DEFAULT_SEED = 1
+# Modules whose ``time`` the pool logic reads; swapped for the virtual clock during a run
+SIMULATED_MODULES = ("main", "task_scheduler", "admission", "health_monitor", "exit_ip_index",
+                     "config_breakers", "failure_classifier", "pool_events")
+# z-score of the 90th percentile, to fit a lognormal through p50/p90
+Z_P90 = 1.2816
+POLICY_KEYS = ("pool_size", "max_repair_attempts", "health_timeout", "restart_wait_seconds")
+
+
+class VirtualClock:
+    """Stands in for the ``time`` module: every reading is the simulated now,
+    and ``sleep`` suspends the calling simulated thread instead of blocking."""
+
+    def __init__(self, start: float = 0.0, sleeper: Optional[Callable[[float], None]] = None) -> None:
+        self.now = float(start)
+        self.sleeper = sleeper
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        if self.sleeper is not None:
+            self.sleeper(seconds)
+
+
+@contextmanager
+def virtual_time(clock: VirtualClock) -> Iterator[None]:
+    saved = {}
+    for name in SIMULATED_MODULES:
+        module = sys.modules.get(name) or importlib.import_module(name)
+        saved[module] = module.time
+        module.time = clock
+    try:
+        yield
+    finally:
+        for module, original in saved.items():
+            module.time = original
+
+
+class DurationModel:
+    """Seconds for a create or restart: replayed from recorded ``samples`` if
+    given, else drawn from a lognormal through ``p50``/``p90``."""
+
+    def __init__(self, p50: float, p90: Optional[float] = None, samples: Optional[List[float]] = None) -> None:
+        self.p50 = max(0.001, float(p50))
+        self.p90 = max(self.p50, float(p90 if p90 is not None else p50))
+        self.samples = [float(s) for s in samples or [] if s is not None and float(s) >= 0]
+        self.sigma = math.log(self.p90 / self.p50) / Z_P90
+
+    def sample(self, rng: random.Random) -> float:
+        if self.samples:
+            return rng.choice(self.samples)
+        return rng.lognormvariate(math.log(self.p50), self.sigma)
+
+
+class SimModel:
+    """What Docker and the VPN servers do, as seen by the pool.
+
+    A launch (or the tunnel rotation the manager tries after a timeout)
+    fails outright with ``create_failure_rate`` and otherwise becomes
+    healthy after a ``create`` duration; a repair restart likewise with
+    ``restart_failure_rate`` and ``restart``. Anything slower than the
+    policy's ``health_timeout`` counts as a timeout. Healthy containers
+    die after an exponential lifetime with mean ``mtbf_seconds``; a client
+    handed a dead one reports it (``/restart_and_check``) with
+    ``report_ratio``.
+    """
+
+    def __init__(self, create: Optional[DurationModel] = None, restart: Optional[DurationModel] = None,
+                 create_failure_rate: float = 0.15, restart_failure_rate: float = 0.2,
+                 mtbf_seconds: float = 6 * 3600, report_ratio: float = 0.5) -> None:
+        self.create = create or DurationModel(20, 40)
+        self.restart = restart or DurationModel(8, 20)
+        self.create_failure_rate = min(max(float(create_failure_rate), 0.0), 1.0)
+        self.restart_failure_rate = min(max(float(restart_failure_rate), 0.0), 1.0)
+        self.mtbf_seconds = max(1.0, float(mtbf_seconds))
+        self.report_ratio = min(max(float(report_ratio), 0.0), 1.0)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "SimModel":
+        config = dict(config or {})
+        kwargs = {}
+        for kind in ("create", "restart"):
+            if any(k.startswith(f"{kind}_p") or k == f"{kind}_samples" for k in config):
+                defaults = cls().create if kind == "create" else cls().restart
+                kwargs[kind] = DurationModel(config.get(f"{kind}_p50_seconds", defaults.p50),
+                                             config.get(f"{kind}_p90_seconds", defaults.p90),
+                                             config.get(f"{kind}_samples"))
+        for key in ("create_failure_rate", "restart_failure_rate", "mtbf_seconds", "report_ratio"):
+            if key in config:
+                kwargs[key] = config[key]
+        return cls(**kwargs)
+
+
+class _Stopped(BaseException):
+    """Unwinds simulated threads that are still waiting when the run ends."""
+
+
+class _Process:
+    def __init__(self, target: Callable[[], None]) -> None:
+        self.target = target
+        self.go = threading.Semaphore(0)
+        self.thread: Optional[threading.Thread] = None
+        self.finished = False
+
+
+class SimManager:
+    """The ``VPNManager`` calls the pool makes, answered from the model.
+
+    Durations pass on the virtual clock, so a worker running a create is
+    busy for exactly as long as the create would take.
+    """
+
+    def __init__(self, sim: "Simulation") -> None:
+        self.sim = sim
+        self.model = sim.model
+        self.rng = sim.rng
+        self.health_timeout = float(sim.policy["health_timeout"])
+        self.max_attempts = max(1, int(sim.pool.manager_kwargs.get("max_attempts") or 1))
+
+    def create_vpn_proxy(self) -> Dict:
+        for _ in range(self.max_attempts):
+            name = self.sim.launch_container()
+            # A timed-out launch gets one tunnel rotation before it is thrown away
+            if (self._wait_ready(self.model.create, self.model.create_failure_rate)
+                    or self._wait_ready(self.model.restart, self.model.create_failure_rate)):
+                return self._healthy(name)
+            self.sim.remove_container(name)
+        return {"status": "error", "message": "health_timeout"}
+
+    def restart_and_check(self, name: str) -> Dict:
+        if name not in self.sim.containers:
+            return {"status": "error", "message": "not_found"}
+        self.sim.restarts += 1
+        if self._wait_ready(self.model.restart, self.model.restart_failure_rate):
+            return self._healthy(name)
+        return {"status": "error", "message": "health_timeout"}
+
+    def check_container(self, name: str, end_to_end: Optional[bool] = None) -> Dict:
+        container = self.sim.containers.get(name)
+        if container is None:
+            return {"status": "error", "message": "not_found"}
+        if container["fails_at"] <= self.sim.clock.now:
+            return {"status": "error", "message": "proxy_validation_failed"}
+        return self._result(name)
+
+    def probe_proxy(self, name: str) -> Dict:
+        return self.check_container(name)
+
+    def delete_proxy(self, name: str) -> Dict:
+        self.sim.remove_container(name)
+        return {"status": "ok"}
+
+    def _wait_ready(self, durations: DurationModel, failure_rate: float) -> bool:
+        if self.rng.random() >= failure_rate:
+            seconds = durations.sample(self.rng)
+            if seconds <= self.health_timeout:
+                self.sim.hold(seconds)
+                return True
+        self.sim.hold(self.health_timeout)
+        return False
+
+    def _healthy(self, name: str) -> Dict:
+        container = self.sim.containers[name]
+        container["fails_at"] = self.sim.clock.now + self.rng.expovariate(1.0 / self.model.mtbf_seconds)
+        container["ip"] = self.sim.next_ip()
+        return self._result(name)
+
+    def _result(self, name: str) -> Dict:
+        container = self.sim.containers[name]
+        return {"status": "ok", "container_id": name, "container_name": name, "config": "simulated.ovpn",
+                "proxy_port": container["port"], "proxy_url": f"http://simulated:{container['port']}",
+                "ip_seen": container["ip"]}
+
+
+class Simulation:
+    """One policy, one arrival stream, one seed.
+
+    Pool tasks, health checks and sweeps run on short-lived threads that
+    take turns with the event loop: only one runs at a time, and a thread
+    that waits (a create in progress, a sweep's sleep) yields until its
+    virtual wake-up time. ``/new_proxy`` callers follow
+    ``ContainerPool.acquire`` step for step, with its blocking wait turned
+    into a waiter that is served in arrival order or times out.
+    """
+
+    def __init__(self, model: SimModel, policy: Dict, arrivals: List[float], duration: float,
+                 deadline: float = DEFAULT_DEADLINE_SECONDS, sweep_interval: float = DEFAULT_SWEEP_INTERVAL,
+                 seed: int = DEFAULT_SEED, config: Optional[Dict] = None) -> None:
+        self.model = model
+        self.policy = dict(policy)
+        self.arrivals = sorted(a for a in arrivals if 0 <= a <= duration)
+        self.duration = float(duration)
+        self.deadline = max(0.0, float(deadline))
+        self.sweep_interval = max(0.0, float(sweep_interval))
+        self.seed = seed
+        self.config = dict(config if config is not None else main._RUNTIME_CONFIG)
+        self.rng = random.Random(seed)
+        self.clock = VirtualClock(sleeper=self.hold)
+        self.pool = None
+        self.manager = None
+        self.events = []
+        self.counter = itertools.count()
+        self.current: Optional[_Process] = None
+        self.processes: List[_Process] = []
+        self.yielded = threading.Semaphore(0)
+        self.stopped = False
+        self.busy = 0
+        self.sweeping = False
+        self.wake_at = None
+        self.ticks = set()
+        self.waiters = deque()
+        # Docker side: live containers and (start, end) of every container that existed
+        self.containers: Dict[str, Dict] = {}
+        self.lifetimes: List[List[float]] = []
+        self.names = itertools.count(1)
+        self.ips = itertools.count(1)
+        self.launches = 0
+        self.restarts = 0
+        # Client side
+        self.waits: List[float] = []
+        self.misses = {"rejected": 0, "timed_out": 0, "shed": 0}
+        self.bad_handouts = 0
+
+    def run(self) -> Dict:
+        state = random.getstate()
+        random.seed(self.seed)
+        try:
+            with virtual_time(self.clock):
+                self.pool = self._build_pool()
+                self.manager = SimManager(self)
+                self.pool._new_manager = lambda priority=PRIORITY_CREATE: self.manager
+                self._loop()
+        finally:
+            random.setstate(state)
+        return self.report()
+
+    def _build_pool(self) -> "main.ContainerPool":
+        request_config = dict(main.NewProxyRequest().model_dump(), health_timeout=self.policy["health_timeout"])
+        pool = main.ContainerPool(
+            target_size=self.policy["pool_size"],
+            request_config=request_config,
+            max_repair_attempts=self.policy["max_repair_attempts"],
+            monitor_config=self.config.get("health_monitor"),
+            workers=self.config.get("pool_workers", main.DEFAULT_POOL_WORKERS),
+            retry_config=self.config.get("retry"),
+            admission_config=self.config.get("admission"),
+            name="simulated",
+        )
+        pool.restart_wait_seconds = self.policy["restart_wait_seconds"]
+        # Probes answer instantly here; one at a time keeps runs reproducible
+        pool.monitor.concurrency = 1
+        return pool
+
+    # Event loop
+    def _at(self, when: float, kind: str, payload=None) -> None:
+        heapq.heappush(self.events, (when, next(self.counter), kind, payload))
+
+    def _loop(self) -> None:
+        for arrival in self.arrivals:
+            self._at(arrival, "arrival")
+        if self.sweep_interval > 0:
+            self._at(self.sweep_interval, "sweep")
+        self.pool._initial_fill()
+        self._settle()
+        try:
+            while self.events:
+                when, _, kind, payload = heapq.heappop(self.events)
+                if when > self.duration:
+                    break
+                self.clock.now = when
+                if kind == "arrival":
+                    self._arrive()
+                elif kind == "deadline":
+                    self._time_out(payload)
+                elif kind == "resume":
+                    self._resume(payload)
+                elif kind == "tick":
+                    self.ticks.discard(payload)
+                    self.pool.monitor.run_once(when)
+                elif kind == "sweep":
+                    self._at(when + self.sweep_interval, "sweep")
+                    if not self.sweeping:
+                        self._spawn(self._sweep)
+                elif kind == "wake":
+                    self.wake_at = None
+                self._settle()
+            self.clock.now = self.duration
+        finally:
+            self._stop()
+
+    def _settle(self) -> None:
+        """Start queued tasks on idle workers, serve waiters, and book the next wake-ups."""
+        while self.busy < self.pool.workers:
+            try:
+                task = self.pool.task_queue.get_nowait()
+            except Empty:
+                break
+            self.busy += 1
+            self._spawn(lambda task=task: self._work(task))
+        self._serve_waiters()
+        delayed = self.pool.task_queue.delayed
+        if delayed and self.busy < self.pool.workers and self.wake_at != delayed[0][0]:
+            self.wake_at = delayed[0][0]
+            self._at(self.wake_at, "wake")
+        schedule = self.pool.monitor.schedule
+        if schedule and schedule[0][0] not in self.ticks:
+            self.ticks.add(schedule[0][0])
+            self._at(max(schedule[0][0], self.clock.now), "tick", schedule[0][0])
+
+    # Simulated threads
+    def hold(self, seconds: float) -> None:
+        """Let ``seconds`` of virtual time pass for the calling simulated thread."""
+        process = self.current
+        if process is None or threading.current_thread() is not process.thread:
+            return
+        if self.stopped:
+            raise _Stopped()
+        self._at(self.clock.now + max(0.0, seconds), "resume", process)
+        self.yielded.release()
+        process.go.acquire()
+        if self.stopped:
+            raise _Stopped()
+
+    def _spawn(self, target: Callable[[], None]) -> None:
+        process = _Process(target)
+        process.thread = threading.Thread(target=self._body, args=(process,), name="sim-process", daemon=True)
+        self.processes.append(process)
+        process.thread.start()
+        self._resume(process)
+
+    def _body(self, process: _Process) -> None:
+        process.go.acquire()
+        try:
+            if not self.stopped:
+                process.target()
+        except _Stopped:
+            pass
+        except Exception:
+            logger.exception("Simulated thread failed")
+        finally:
+            process.finished = True
+            self.yielded.release()
+
+    def _resume(self, process: _Process) -> None:
+        """Run ``process`` until it holds again or finishes."""
+        self.current = process
+        process.go.release()
+        self.yielded.acquire()
+        self.current = None
+        if process.finished:
+            self.processes.remove(process)
+
+    def _stop(self) -> None:
+        self.stopped = True
+        for process in list(self.processes):
+            self._resume(process)
+        for process in self.processes:
+            process.thread.join(timeout=1)
+
+    def _work(self, task: Dict) -> None:
+        try:
+            self.pool._run_task(task)
+        finally:
+            self.pool.task_queue.task_done()
+            self.busy -= 1
+
+    def _sweep(self) -> None:
+        self.sweeping = True
+        try:
+            self.pool.run_sweeper()
+        finally:
+            self.sweeping = False
+
+    # Clients
+    def _arrive(self) -> None:
+        pool = self.pool
+        entry = pool.get_valid()
+        if entry:
+            pool.admission.record_served(0.0)
+            self._handed_out(entry, 0.0)
+            return
+        with pool.condition:
+            in_flight = pool.pending_creates
+        admitted, _ = pool.admission.admit(self.deadline, pool.workers, in_flight)
+        if pool.admission.should_shed(pool.task_queue.qsize()):
+            self._miss("shed")
+            return
+        pool.request_fill(1)
+        if not admitted:
+            self._miss("rejected")
+            return
+        pool.admission.enter()
+        waiter = {"arrived": self.clock.now}
+        self.waiters.append(waiter)
+        self._at(self.clock.now + self.deadline, "deadline", waiter)
+
+    def _serve_waiters(self) -> None:
+        while self.waiters:
+            entry = self.pool.get_valid()
+            if not entry:
+                return
+            waiter = self.waiters.popleft()
+            waited = self.clock.now - waiter["arrived"]
+            self.pool.admission.leave()
+            self.pool.admission.record_served(waited)
+            self._handed_out(entry, waited)
+
+    def _time_out(self, waiter: Dict) -> None:
+        if waiter in self.waiters:
+            self.waiters.remove(waiter)
+            self.pool.admission.leave()
+            self._miss("timed_out")
+
+    def _miss(self, kind: str) -> None:
+        self.pool.admission.record_miss(kind)
+        self.misses[kind] += 1
+
+    def _handed_out(self, entry: Dict, waited: float) -> None:
+        self.waits.append(waited)
+        name = entry["container_name"]
+        container = self.containers.get(name)
+        if container is not None and container["fails_at"] <= self.clock.now:
+            self.bad_handouts += 1
+            if self.rng.random() < self.model.report_ratio:
+                self.pool.trigger_repair(name)
+
+    # Docker side
+    def launch_container(self) -> str:
+        number = next(self.names)
+        name = f"sim-proxy-{number}"
+        lifetime = [self.clock.now, None]
+        self.lifetimes.append(lifetime)
+        self.containers[name] = {"port": 20000 + number, "ip": None, "fails_at": self.clock.now,
+                                 "lifetime": lifetime}
+        self.launches += 1
+        return name
+
+    def remove_container(self, name: str) -> None:
+        container = self.containers.pop(name, None)
+        if container is not None:
+            container["lifetime"][1] = self.clock.now
+
+    def next_ip(self) -> str:
+        number = next(self.ips)
+        return f"10.{(number >> 16) & 255}.{(number >> 8) & 255}.{number & 255}"
+
+    # Results
+    def report(self) -> Dict:
+        requests = len(self.waits) + sum(self.misses.values())
+        slo_seconds = self.pool.admission.slo_seconds
+        within = sum(1 for w in self.waits if w <= slo_seconds)
+        container_seconds = sum(min(end if end is not None else self.duration, self.duration) - start
+                                for start, end in self.lifetimes)
+        attainment = within / requests if requests else None
+        return {
+            "policy": self.policy,
+            "requests": requests,
+            "served": len(self.waits),
+            "rate_503": round(sum(self.misses.values()) / requests, 4) if requests else 0.0,
+            **self.misses,
+            "wait_p50_s": _round(quantile(self.waits, 0.5)),
+            "wait_p95_s": _round(quantile(self.waits, 0.95)),
+            "wait_p99_s": _round(quantile(self.waits, 0.99)),
+            "slo_seconds": slo_seconds,
+            "slo_attainment": None if attainment is None else round(attainment, 4),
+            "meets_slo": None if attainment is None else attainment >= self.pool.admission.slo_target,
+            "bad_handouts": self.bad_handouts,
+            "container_minutes": round(container_seconds / 60, 1),
+            "avg_containers": round(container_seconds / self.duration, 2) if self.duration else 0.0,
+            "launches": self.launches,
+            "restarts": self.restarts,
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
+
+
+def poisson_arrivals(rate: float, duration: float, start: float = 0.0, seed: int = DEFAULT_SEED) -> List[float]:
+    """Arrival times of a Poisson stream of ``rate`` calls per second."""
+    if rate <= 0:
+        return []
+    rng = random.Random(seed)
+    arrivals = []
+    now = start + rng.expovariate(rate)
+    while now <= duration:
+        arrivals.append(now)
+        now += rng.expovariate(rate)
+    return arrivals
+
+
+def recorded_arrivals(records: List[Dict], start: float = 0.0, speed: float = 1.0) -> List[float]:
+    """Arrival times of the recorded ``/new_proxy`` calls, keeping their gaps (compressed by ``speed``)."""
+    calls = [r for r in records if (r.get("route") or r.get("path")) == "/new_proxy"]
+    if not calls:
+        return []
+    first = calls[0].get("ts", 0)
+    return [start + (r.get("ts", first) - first) / max(0.001, speed) for r in calls]
+
+
+def default_policy() -> Dict:
+    """The policy the service runs with today (config.json and code defaults)."""
+    return {"pool_size": main.POOL.target_size, "max_repair_attempts": main.POOL.max_repair_attempts,
+            "health_timeout": main.POOL.manager_kwargs["health_timeout"],
+            "restart_wait_seconds": main.POOL.restart_wait_seconds}
+
+
+def policy_grid(options: Dict[str, List]) -> List[Dict]:
+    """Every combination of the given values; keys that aren't given keep the current setting."""
+    base = default_policy()
+    values = [options.get(key) or [base[key]] for key in POLICY_KEYS]
+    return [dict(zip(POLICY_KEYS, combo)) for combo in itertools.product(*values)]
+
+
+def simulate_policies(model: SimModel, policies: List[Dict], arrivals: List[float], duration: float,
+                      **kwargs) -> Dict:
+    """Run every policy on the same arrivals and seed; ``recommended`` is the cheapest
+    (fewest container-minutes) that meets the SLO target, or None."""
+    results = [Simulation(model, policy, arrivals, duration, **kwargs).run() for policy in policies]
+    meeting = [r for r in results if r["meets_slo"]]
+    best = min(meeting, key=lambda r: (r["container_minutes"], r["rate_503"])) if meeting else None
+    return {"results": results, "recommended": best["policy"] if best else None}
+
+
+def _print_report(report: Dict) -> None:
+    print(f"{'size':>4} {'repair':>6} {'health_s':>8} {'restart_s':>9} {'calls':>7} {'503 %':>7} "
+          f"{'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'SLO %':>7} {'bad':>5} {'ctr-min':>9}")
+    for row in report["results"]:
+        policy = row["policy"]
+        attainment = "-" if row["slo_attainment"] is None else f"{row['slo_attainment'] * 100:.1f}"
+        marker = "  <- recommended" if policy == report["recommended"] else ""
+        print(f"{policy['pool_size']:>4} {policy['max_repair_attempts']:>6} {policy['health_timeout']:>8} "
+              f"{policy['restart_wait_seconds']:>9} {row['requests']:>7} {row['rate_503'] * 100:>6.2f}% "
+              f"{row['wait_p50_s']!s:>7} {row['wait_p95_s']!s:>7} {row['wait_p99_s']!s:>7} {attainment:>7} "
+              f"{row['bad_handouts']:>5} {row['container_minutes']:>9}{marker}")
+    if report["recommended"] is None:
+        print("\nno policy met the SLO target")
+
+
+def _numbers(text: Optional[str], cast=float) -> Optional[List]:
+    return [cast(part) for part in text.split(",") if part.strip()] if text else None
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="JSON file with SimModel settings")
+    parser.add_argument("--traffic", help="replay /new_proxy arrivals from a recorded traffic JSONL file")
+    parser.add_argument("--speed", type=float, default=1.0, help="arrival-rate multiplier for --traffic")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Poisson arrivals per second")
+    parser.add_argument("--hours", type=float, default=DEFAULT_HOURS)
+    parser.add_argument("--warmup", type=float, default=DEFAULT_WARMUP_SECONDS,
+                        help="seconds the pool fills before the first client")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE_SECONDS,
+                        help="seconds a client waits on an empty pool (X-Deadline-Ms)")
+    parser.add_argument("--sweep-interval", type=float, default=DEFAULT_SWEEP_INTERVAL,
+                        help="seconds between /maintenance/sweep calls; 0 = never")
+    parser.add_argument("--slo-seconds", type=float, help="time-to-proxy SLO (default: config.json admission)")
+    parser.add_argument("--slo-target", type=float, help="share of calls within the SLO")
+    parser.add_argument("--pool-size", help="comma-separated container_pool_size values")
+    parser.add_argument("--max-repair-attempts", help="comma-separated MAX_REPAIR_ATTEMPTS values")
+    parser.add_argument("--health-timeout", help="comma-separated health_timeout values (s)")
+    parser.add_argument("--restart-wait", help="comma-separated restart_wait_seconds values")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--json", dest="json_path", help="also write the full report here")
+    parser.add_argument("--verbose", action="store_true", help="show the pool's own log output")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+    model_config = {}
+    if args.model:
+        with open(args.model) as handle:
+            model_config = json.load(handle)
+    duration = args.hours * 3600
+    if args.traffic:
+        arrivals = recorded_arrivals(load_traffic(args.traffic), start=args.warmup, speed=args.speed)
+    else:
+        arrivals = poisson_arrivals(args.rate, duration, start=args.warmup, seed=args.seed)
+    config = dict(main._RUNTIME_CONFIG)
+    admission = dict(config.get("admission") or {})
+    if args.slo_seconds is not None:
+        admission["slo_seconds"] = args.slo_seconds
+    if args.slo_target is not None:
+        admission["slo_target"] = args.slo_target
+    config["admission"] = admission
+    policies = policy_grid({"pool_size": _numbers(args.pool_size, int),
+                            "max_repair_attempts": _numbers(args.max_repair_attempts, int),
+                            "health_timeout": _numbers(args.health_timeout),
+                            "restart_wait_seconds": _numbers(args.restart_wait)})
+    report = simulate_policies(SimModel.from_config(model_config), policies, arrivals, duration,
+                               deadline=args.deadline, sweep_interval=args.sweep_interval, seed=args.seed,
+                               config=config)
+    _print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
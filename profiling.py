@@ -0,0 +1,218 @@
+import sys
+import time
+import threading
+import traceback
+from collections import Counter, deque
+from threading import Lock
+from typing import Deque, Dict, List, Optional
+
+from admission import quantile
+
+DEFAULT_PROFILE_SECONDS = 5.0
+MAX_PROFILE_SECONDS = 60.0
+DEFAULT_SAMPLE_INTERVAL = 0.005
+DEFAULT_TOP = 40
+# Most recent lock waits/holds kept for percentiles
+LOCK_SAMPLES = 4096
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})"
+
+
+def dump_stacks() -> List[Dict]:
+    """Current stack of every live thread, innermost frame last."""
+    frames = sys._current_frames()
+    items = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        items.append({
+            "name": thread.name,
+            "ident": thread.ident,
+            "daemon": thread.daemon,
+            "stack": [line.rstrip() for line in stack],
+        })
+    items.sort(key=lambda item: item["name"])
+    return items
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler over all threads.
+
+    Every ``interval`` seconds it snapshots each thread's stack (from a
+    helper thread, so the sampled code is not instrumented). Time spent
+    blocked in ``restart()``, a socket read or a lock wait shows up the same
+    as CPU work, which is what a stall investigation needs. Only one
+    profile runs at a time.
+    """
+
+    def __init__(self) -> None:
+        self.running = Lock()
+
+    def profile(self, seconds: float = DEFAULT_PROFILE_SECONDS, interval: float = DEFAULT_SAMPLE_INTERVAL,
+                top: int = DEFAULT_TOP, thread_prefix: Optional[str] = None) -> Optional[Dict]:
+        """Sample for ``seconds``; None if another profile is already running."""
+        seconds = min(max(float(seconds), 0.01), MAX_PROFILE_SECONDS)
+        interval = max(float(interval), 0.001)
+        if not self.running.acquire(blocking=False):
+            return None
+        try:
+            return self._run(seconds, interval, max(1, int(top)), thread_prefix)
+        finally:
+            self.running.release()
+
+    def _run(self, seconds: float, interval: float, top: int, thread_prefix: Optional[str]) -> Dict:
+        me = threading.get_ident()
+        own = Counter()
+        inclusive = Counter()
+        folded = Counter()
+        per_thread = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if ident == me or (thread_prefix and not name.startswith(thread_prefix)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                own[stack[0]] += 1
+                for label in set(stack):
+                    inclusive[label] += 1
+                folded[";".join([name] + stack[::-1])] += 1
+                per_thread[name] += 1
+            samples += 1
+            time.sleep(interval)
+        elapsed = time.perf_counter() - started
+
+        def share(counter: Counter) -> List[Dict]:
+            return [{"frame": label, "samples": count, "share": round(count / samples, 4)}
+                    for label, count in counter.most_common(top)]
+
+        return {
+            "seconds": round(elapsed, 3),
+            "interval_ms": round(interval * 1000, 3),
+            "samples": samples,
+            "threads": dict(per_thread.most_common()),
+            "self": share(own),
+            "inclusive": share(inclusive),
+            # "thread;outer;...;inner count" lines, ready for flamegraph.pl / speedscope
+            "folded": [f"{stack} {count}" for stack, count in folded.most_common()],
+        }
+
+
+class InstrumentedLock:
+    """A ``threading.Lock`` that records how long callers wait for it and hold it.
+
+    Drop-in for ``Condition(lock)``: a condition ``wait`` ends the hold and
+    its wake-up counts as a new wait. ``stats`` also names the current
+    holder, which is usually the answer when the pool stalls.
+    """
+
+    def __init__(self, name: str = "lock") -> None:
+        self.name = name
+        self._lock = Lock()
+        self._owner: Optional[int] = None
+        self._owner_name: Optional[str] = None
+        self._acquired_at = 0.0
+        self._stats_lock = Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.hold_total = 0.0
+        self.wait_max = 0.0
+        self.hold_max = 0.0
+        self.waits: Deque[float] = deque(maxlen=LOCK_SAMPLES)
+        self.holds: Deque[float] = deque(maxlen=LOCK_SAMPLES)
+        self.longest_holder: Optional[str] = None
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(False):
+            waited = 0.0
+        else:
+            if not blocking:
+                return False
+            started = time.perf_counter()
+            if not self._lock.acquire(True, timeout):
+                return False
+            waited = time.perf_counter() - started
+        self._acquired_at = time.perf_counter()
+        self._owner = threading.get_ident()
+        self._owner_name = threading.current_thread().name
+        with self._stats_lock:
+            self.acquisitions += 1
+            if waited:
+                self.contended += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            self.waits.append(waited)
+        return True
+
+    def release(self) -> None:
+        held = time.perf_counter() - self._acquired_at
+        holder = self._owner_name
+        self._owner = None
+        self._owner_name = None
+        self._lock.release()
+        with self._stats_lock:
+            self.hold_total += held
+            if held > self.hold_max:
+                self.hold_max = held
+                self.longest_holder = holder
+            self.holds.append(held)
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def _is_owned(self) -> bool:
+        # Used by Condition; the default probe would acquire the lock and skew the stats
+        return self._owner == threading.get_ident()
+
+    def reset(self) -> None:
+        with self._stats_lock:
+            self.acquisitions = self.contended = 0
+            self.wait_total = self.hold_total = self.wait_max = self.hold_max = 0.0
+            self.waits.clear()
+            self.holds.clear()
+            self.longest_holder = None
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            waits = list(self.waits)
+            holds = list(self.holds)
+            data = {
+                "name": self.name,
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "wait_total_ms": _ms(self.wait_total),
+                "wait_max_ms": _ms(self.wait_max),
+                "hold_total_ms": _ms(self.hold_total),
+                "hold_max_ms": _ms(self.hold_max),
+                "longest_holder": self.longest_holder,
+            }
+        owner = self._owner_name
+        data.update({
+            "wait_p99_ms": _ms(quantile(waits, 0.99)),
+            "hold_p50_ms": _ms(quantile(holds, 0.5)),
+            "hold_p99_ms": _ms(quantile(holds, 0.99)),
+            "held_by": owner,
+            "held_for_ms": _ms(time.perf_counter() - self._acquired_at) if owner else None,
+        })
+        return data
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 3)
@@ -0,0 +1,216 @@
+import time
+import random
+import logging
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, Optional
+
+from admission import SampleWindow, quantile
+
+logger = logging.getLogger(__name__)
+
+UDP = "udp"
+TCP = "tcp"
+WIREGUARD = "wireguard"
+# OpenVPN transports the selector chooses between
+PROTOCOLS = (UDP, TCP)
+# Also measured, so WireGuard pools show up next to OpenVPN in the stats
+REPORTED = PROTOCOLS + (WIREGUARD,)
+MODE_AUTO = "auto"
+DEFAULT_EXPLORE_RATIO = 0.1
+DEFAULT_MIN_SAMPLES = 5
+DEFAULT_BLOCK_THRESHOLD = 3
+DEFAULT_BLOCK_SECONDS = 1800
+DEFAULT_WINDOW_SECONDS = 6 * 3600
+DEFAULT_THROUGHPUT_URL = "https://speed.cloudflare.com/__down?bytes=5000000"
+DEFAULT_THROUGHPUT_BYTES = 5_000_000
+DEFAULT_THROUGHPUT_RATIO = 0.1
+DEFAULT_THROUGHPUT_TIMEOUT = 20
+# Failures that look like UDP being dropped on the way rather than a bad server
+BLOCKING_FAILURES = {"health_timeout", "post_restart_health_timeout", "tls_error", "network_error",
+                     "server_unreachable"}
+
+
+def protocol_of(config) -> str:
+    """``udp`` or ``tcp`` from a NordVPN-style name (``uk1.nordvpn.com.udp.ovpn``),
+    else from the config's ``proto`` line; TCP when neither says."""
+    name = getattr(config, "name", str(config)).lower()
+    for protocol in PROTOCOLS:
+        if f".{protocol}." in name or name.endswith(f".{protocol}"):
+            return protocol
+    if isinstance(config, Path):
+        try:
+            with open(config, errors="replace") as handle:
+                for line in handle:
+                    parts = line.split()
+                    if len(parts) >= 2 and parts[0] == "proto":
+                        return UDP if parts[1].startswith(UDP) else TCP
+        except OSError:
+            pass
+    return TCP
+
+
+def server_of(config_name: str) -> str:
+    """Server hostname from a catalog entry: ``uk1.nordvpn.com.udp.ovpn`` -> ``uk1.nordvpn.com``."""
+    name = config_name
+    for suffix in (".ovpn", ".conf"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    for protocol in PROTOCOLS:
+        if name.endswith(f".{protocol}"):
+            name = name[:-len(protocol) - 1]
+    return name
+
+
+class ProtocolSelector:
+    """Chooses UDP or TCP OpenVPN configs from measured outcomes.
+
+    Every launch records its time to healthy and whether it got there; a
+    sample of successful creates also downloads ``throughput_bytes``
+    through the new proxy. In ``auto`` mode the protocol with the higher
+    median throughput wins (or, before enough downloads, the one with the
+    lower expected time per healthy tunnel), and ``explore_ratio`` of
+    launches go to the other one so its numbers stay current. A fixed
+    ``mode`` of ``udp``/``tcp`` only prefers that protocol.
+
+    UDP that times out ``block_threshold`` times in a row on one Docker
+    host counts as blocked there: that host uses TCP for ``block_seconds``.
+
+    WireGuard launches are recorded alongside for comparison but are not
+    part of the choice; they are a pool setting (``vpn_type``).
+    """
+
+    def __init__(self, mode: str = MODE_AUTO, explore_ratio: float = DEFAULT_EXPLORE_RATIO,
+                 min_samples: int = DEFAULT_MIN_SAMPLES, block_threshold: int = DEFAULT_BLOCK_THRESHOLD,
+                 block_seconds: float = DEFAULT_BLOCK_SECONDS, window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 throughput_url: str = DEFAULT_THROUGHPUT_URL, throughput_bytes: int = DEFAULT_THROUGHPUT_BYTES,
+                 throughput_ratio: float = DEFAULT_THROUGHPUT_RATIO,
+                 throughput_timeout: float = DEFAULT_THROUGHPUT_TIMEOUT) -> None:
+        mode = str(mode).lower()
+        self.mode = mode if mode in PROTOCOLS else MODE_AUTO
+        self.explore_ratio = min(max(float(explore_ratio), 0.0), 1.0)
+        self.min_samples = max(1, int(min_samples))
+        self.block_threshold = max(1, int(block_threshold))
+        self.block_seconds = float(block_seconds)
+        self.throughput_url = throughput_url
+        self.throughput_bytes = max(1, int(throughput_bytes))
+        self.throughput_ratio = min(max(float(throughput_ratio), 0.0), 1.0)
+        self.throughput_timeout = float(throughput_timeout)
+        self.lock = Lock()
+        self.handshakes = {p: SampleWindow(window_seconds) for p in REPORTED}
+        self.throughput = {p: SampleWindow(window_seconds) for p in REPORTED}
+        self.counts = {p: {"launches": 0, "healthy": 0, "failed": 0} for p in REPORTED}
+        # scope (Docker host) -> consecutive UDP timeouts / blocked until
+        self.udp_strikes: Dict[str, int] = {}
+        self.blocked_until: Dict[str, float] = {}
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "ProtocolSelector":
+        config = dict(config or {})
+        kwargs = {}
+        for key, arg in (("mode", "mode"), ("explore_ratio", "explore_ratio"), ("min_samples", "min_samples"),
+                         ("udp_block_threshold", "block_threshold"), ("udp_block_seconds", "block_seconds"),
+                         ("window_seconds", "window_seconds"), ("throughput_url", "throughput_url"),
+                         ("throughput_bytes", "throughput_bytes"), ("throughput_sample_ratio", "throughput_ratio"),
+                         ("throughput_timeout_seconds", "throughput_timeout")):
+            if key in config:
+                kwargs[arg] = config[key]
+        return cls(**kwargs)
+
+    # Selection
+    def choose(self, scope: str, available: Iterable[str], exclude: Iterable[str] = ()) -> Optional[str]:
+        """Protocol for the next launch on ``scope`` among those with configs in ``available``."""
+        available = [p for p in PROTOCOLS if p in set(available)]
+        candidates = [p for p in available if p not in set(exclude)] or available
+        if len(candidates) < 2:
+            return candidates[0] if candidates else None
+        if self.udp_blocked(scope):
+            return TCP
+        preferred = self.mode if self.mode in PROTOCOLS else self.better()
+        if self.mode == MODE_AUTO and random.random() < self.explore_ratio:
+            return TCP if preferred == UDP else UDP
+        return preferred
+
+    def better(self) -> str:
+        now = time.time()
+        with self.lock:
+            speeds = {p: self.throughput[p].values(now) for p in PROTOCOLS}
+            handshakes = {p: self.handshakes[p].values(now) for p in PROTOCOLS}
+            counts = {p: dict(c) for p, c in self.counts.items()}
+        if all(len(speeds[p]) >= self.min_samples for p in PROTOCOLS):
+            return max(PROTOCOLS, key=lambda p: quantile(speeds[p], 0.5))
+        if all(counts[p]["launches"] >= self.min_samples and handshakes[p] for p in PROTOCOLS):
+            return min(PROTOCOLS, key=lambda p: self._seconds_per_healthy(handshakes[p], counts[p]))
+        # Unmeasured: UDP avoids TCP-over-TCP for the proxied traffic
+        return UDP
+
+    @staticmethod
+    def _seconds_per_healthy(handshakes, counts: Dict) -> float:
+        finished = counts["healthy"] + counts["failed"]
+        success = counts["healthy"] / finished if finished else 0.0
+        return quantile(handshakes, 0.5) / success if success else float("inf")
+
+    def udp_blocked(self, scope: str) -> bool:
+        with self.lock:
+            return self.blocked_until.get(scope, 0.0) > time.time()
+
+    def wants_throughput_sample(self) -> bool:
+        return self.throughput_ratio > 0 and random.random() < self.throughput_ratio
+
+    # Outcomes
+    def record_launch(self, scope: str, protocol: str, seconds: Optional[float], healthy: bool,
+                      reason: Optional[str] = None) -> None:
+        if protocol not in REPORTED:
+            return
+        now = time.time()
+        with self.lock:
+            counts = self.counts[protocol]
+            counts["launches"] += 1
+            if healthy:
+                counts["healthy"] += 1
+                if seconds is not None:
+                    self.handshakes[protocol].add(seconds, now)
+                if protocol == UDP:
+                    self.udp_strikes.pop(scope, None)
+                return
+            counts["failed"] += 1
+            if protocol != UDP or reason not in BLOCKING_FAILURES:
+                return
+            strikes = self.udp_strikes.get(scope, 0) + 1
+            self.udp_strikes[scope] = strikes
+            if strikes >= self.block_threshold and self.blocked_until.get(scope, 0.0) <= now:
+                logger.warning("UDP looks blocked on %s after %s timeouts; using TCP for %ss",
+                               scope, strikes, int(self.block_seconds))
+                self.blocked_until[scope] = now + self.block_seconds
+                self.udp_strikes[scope] = 0
+
+    def record_throughput(self, protocol: str, bytes_per_second: float) -> None:
+        if protocol in REPORTED and bytes_per_second > 0:
+            with self.lock:
+                self.throughput[protocol].add(bytes_per_second, time.time())
+
+    def stats(self) -> Dict:
+        now = time.time()
+        items = {}
+        with self.lock:
+            for protocol in REPORTED:
+                handshakes = self.handshakes[protocol].values(now)
+                speeds = self.throughput[protocol].values(now)
+                counts = dict(self.counts[protocol])
+                finished = counts["healthy"] + counts["failed"]
+                median_speed = quantile(speeds, 0.5)
+                items[protocol] = {
+                    **counts,
+                    "success_rate": round(counts["healthy"] / finished, 4) if finished else None,
+                    "time_to_healthy_p50_s": _round(quantile(handshakes, 0.5)),
+                    "time_to_healthy_p90_s": _round(quantile(handshakes, 0.9)),
+                    "throughput_samples": len(speeds),
+                    "throughput_p50_mbps": None if median_speed is None else round(median_speed * 8 / 1e6, 2),
+                }
+            blocked = {scope: round(until - now) for scope, until in self.blocked_until.items() if until > now}
+        return {"mode": self.mode, "preferred": self.mode if self.mode in PROTOCOLS else self.better(),
+                "udp_blocked": blocked, "items": items}
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
@@ -0,0 +1,156 @@
+"""Replay recorded API traffic against a running instance.
+
+Reads a JSONL file written by ``traffic_log.TrafficRecorder`` and re-issues
+every call with the original arrival pattern, compressed by ``--speed``
+(1 = real time, 10, 100, ...). While it runs it samples ``GET /pools`` for
+pool depth. At the end it prints latency percentiles and 503 rates per
+route, plus the valid-container count over time. Point it at an instance
+running with ``"backend": "fake"`` so no real tunnels are started.
+
+    python replay_traffic.py db/traffic.jsonl --target http://127.0.0.1:8000 --speed 10
+"""
+import argparse
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+from traffic_log import load_traffic
+
+
+def percentile(sorted_values: List[float], share: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * share))
+    return round(sorted_values[index], 1)
+
+
+def summarize(results: List[Dict]) -> Dict:
+    """Latency percentiles and error rates, overall and per ``METHOD route``."""
+    groups: Dict[str, List[Dict]] = {"all": results}
+    for result in results:
+        groups.setdefault(f"{result['method']} {result['route']}", []).append(result)
+    summary = {}
+    for key, items in groups.items():
+        latencies = sorted(r["latency_ms"] for r in items)
+        summary[key] = {
+            "calls": len(items),
+            "p50_ms": percentile(latencies, 0.50),
+            "p90_ms": percentile(latencies, 0.90),
+            "p99_ms": percentile(latencies, 0.99),
+            "max_ms": round(latencies[-1], 1) if latencies else None,
+            "rate_503": round(sum(1 for r in items if r["status"] == 503) / len(items), 4) if items else 0.0,
+            "errors": sum(1 for r in items if r["status"] is None or r["status"] >= 500),
+        }
+    return summary
+
+
+class Replayer:
+    def __init__(self, target: str, speed: float = 1.0, concurrency: int = 256, timeout: float = 120,
+                 sample_interval: float = 1.0) -> None:
+        self.target = target.rstrip("/")
+        self.speed = max(0.001, float(speed))
+        self.timeout = timeout
+        self.sample_interval = sample_interval
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.session = requests.Session()
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+        self.lock = threading.Lock()
+        self.results: List[Dict] = []
+        self.depth: List[Dict] = []
+        self.done = threading.Event()
+        self.started = time.monotonic()
+
+    def run(self, records: List[Dict]) -> Dict:
+        if not records:
+            return {"results": summarize([]), "depth": []}
+        sampler = threading.Thread(target=self._sample_loop, daemon=True)
+        self.started = time.monotonic()
+        sampler.start()
+        first = records[0]["ts"]
+        futures = []
+        for record in records:
+            # Keep the recorded gaps between arrivals, compressed by the speed factor
+            due = self.started + (record["ts"] - first) / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(self.executor.submit(self._send, record, time.monotonic() - due))
+        for future in futures:
+            future.result()
+        self.done.set()
+        sampler.join(timeout=self.sample_interval + self.timeout)
+        return {"results": summarize(self.results), "depth": self.depth}
+
+    def _send(self, record: Dict, lag: float) -> None:
+        url = self.target + record["path"] + (f"?{record['query']}" if record.get("query") else "")
+        body = record.get("body")
+        headers = {"Content-Type": "application/json"} if body else {}
+        started = time.perf_counter()
+        status = None
+        try:
+            # Streamed answers (/proxies/lease) count until the last line arrives
+            response = self.session.request(record["method"], url, data=body, headers=headers,
+                                            timeout=self.timeout)
+            status = response.status_code
+        except requests.RequestException:
+            pass
+        latency = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.results.append({"method": record["method"], "route": record.get("route") or record["path"],
+                                 "status": status, "latency_ms": latency,
+                                 "recorded_ms": record.get("duration_ms"), "lag_ms": lag * 1000})
+
+    def _sample_loop(self) -> None:
+        while not self.done.is_set():
+            elapsed = round(time.monotonic() - self.started, 2)
+            try:
+                items = self.session.get(f"{self.target}/pools", timeout=5).json().get("items", [])
+                self.depth.append({"t": elapsed, **{p["name"]: p["valid"] for p in items}})
+            except (requests.RequestException, ValueError):
+                self.depth.append({"t": elapsed})
+            self.done.wait(self.sample_interval)
+
+
+def _print_report(report: Dict, depth_rows: int) -> None:
+    print(f"{'route':<40} {'calls':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'503 %':>7}")
+    for key, row in sorted(report["results"].items(), key=lambda kv: (kv[0] != "all", kv[0])):
+        print(f"{key[:40]:<40} {row['calls']:>7} {row['p50_ms']!s:>9} {row['p90_ms']!s:>9} "
+              f"{row['p99_ms']!s:>9} {row['max_ms']!s:>9} {row['rate_503'] * 100:>6.1f}%")
+    depth = report["depth"]
+    if depth:
+        print("\npool depth (valid containers)")
+        step = max(1, len(depth) // max(1, depth_rows))
+        for sample in depth[::step]:
+            pools = ", ".join(f"{k}={v}" for k, v in sample.items() if k != "t") or "unavailable"
+            print(f"  t={sample['t']:>8}s  {pools}")
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traffic", help="JSONL file written by the traffic recorder")
+    parser.add_argument("--target", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="arrival-rate multiplier (1, 10, 100, ...)")
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="seconds between /pools samples")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N calls")
+    parser.add_argument("--depth-rows", type=int, default=20)
+    parser.add_argument("--json", dest="json_path", help="also write the full report here")
+    args = parser.parse_args()
+
+    records = load_traffic(args.traffic)[:args.limit]
+    replayer = Replayer(args.target, speed=args.speed, concurrency=args.concurrency, timeout=args.timeout,
+                        sample_interval=args.sample_interval)
+    report = replayer.run(records)
+    _print_report(report, args.depth_rows)
+    if args.json_path:
+        with open(args.json_path, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import fcntl
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    name TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    handout_seq INTEGER NOT NULL DEFAULT 0,
+    last_updated INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_valid ON entries (state, handout_seq);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    name TEXT,
+    created INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SharedPoolStore:
+    """Pool state shared by every uvicorn worker on this host.
+
+    Entries, the round-robin hand-out order, async jobs and work requests
+    live in one SQLite file (WAL mode). Exactly one process holds the
+    coordinator ``flock`` and runs creates and repairs; the others hand out
+    proxies straight from the store and forward work through ``tasks``.
+    The lock is released by the OS when its holder dies, so another worker
+    takes over.
+    """
+
+    def __init__(self, path: str = "./db/pool_state.sqlite3", lock_path: Optional[str] = None) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock_path = Path(lock_path) if lock_path else self.path.with_suffix(".lock")
+        self.local = threading.local()
+        self.lock_fd: Optional[int] = None
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    # Coordinator election
+    def try_become_coordinator(self) -> bool:
+        if self.lock_fd is not None:
+            return True
+        fd = os.open(str(self.lock_path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self.lock_fd = fd
+        self.set_meta("coordinator_pid", str(os.getpid()))
+        return True
+
+    @property
+    def is_coordinator(self) -> bool:
+        return self.lock_fd is not None
+
+    def resign(self) -> None:
+        if self.lock_fd is None:
+            return
+        fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+        os.close(self.lock_fd)
+        self.lock_fd = None
+
+    # Registry
+    def upsert(self, name: str, entry: Dict) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT handout_seq FROM entries WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                # New entries join the end of the round-robin like valid_queue.append
+                seq = conn.execute("SELECT COALESCE(MAX(handout_seq), 0) + 1 FROM entries").fetchone()[0]
+            else:
+                seq = row[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (name, payload, state, handout_seq, last_updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (name, json.dumps(entry), entry.get("state", "valid"), seq, int(time.time())),
+            )
+
+    def set_state(self, name: str, state: str) -> bool:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT payload FROM entries WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return False
+            entry = json.loads(row[0])
+            entry["state"] = state
+            entry["last_updated"] = int(time.time())
+            conn.execute("UPDATE entries SET payload = ?, state = ?, last_updated = ? WHERE name = ?",
+                         (json.dumps(entry), state, entry["last_updated"], name))
+            return True
+
+    def delete(self, name: str) -> bool:
+        conn = self._conn()
+        with conn:
+            return conn.execute("DELETE FROM entries WHERE name = ?", (name,)).rowcount > 0
+
+    def clear(self) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM entries")
+
+    def get(self, name: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT payload FROM entries WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def entries(self) -> Dict[str, Dict]:
+        rows = self._conn().execute("SELECT name, payload FROM entries").fetchall()
+        return {name: json.loads(payload) for name, payload in rows}
+
+    def count_valid(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM entries WHERE state = 'valid'").fetchone()[0]
+
+    def next_valid(self) -> Optional[Dict]:
+        """Round-robin hand-out across processes: least recently handed-out valid entry."""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT name, payload FROM entries WHERE state = 'valid' ORDER BY handout_seq LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE entries SET handout_seq = (SELECT MAX(handout_seq) + 1 FROM entries) WHERE name = ?",
+                (row[0],),
+            )
+            return json.loads(row[1])
+
+    def take_valid(self, count: int, exclude: Iterable[str] = ()) -> List[Dict]:
+        """Up to ``count`` distinct valid entries, least recently handed out first, in one transaction."""
+        exclude = set(exclude)
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT name, payload FROM entries WHERE state = 'valid' ORDER BY handout_seq"
+            ).fetchall()
+            rows = [row for row in rows if row[0] not in exclude][:max(0, count)]
+            for row in rows:
+                conn.execute(
+                    "UPDATE entries SET handout_seq = (SELECT MAX(handout_seq) + 1 FROM entries) WHERE name = ?",
+                    (row[0],),
+                )
+            return [json.loads(row[1]) for row in rows]
+
+    # Work forwarded to the coordinator
+    def push_task(self, task_type: str, name: Optional[str] = None) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT INTO tasks (type, name, created) VALUES (?, ?, ?)",
+                         (task_type, name, int(time.time())))
+
+    def pop_tasks(self, limit: int = 100) -> List[Dict]:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT id, type, name FROM tasks ORDER BY id LIMIT ?", (limit,)).fetchall()
+            if rows:
+                conn.execute("DELETE FROM tasks WHERE id <= ?", (rows[-1][0],))
+        return [{"type": task_type, "name": name} for _, task_type, name in rows]
+
+    # Async jobs
+    def put_job(self, job_id: str, job: Dict) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO jobs (id, payload, created) VALUES (?, ?, ?)",
+                         (job_id, json.dumps(job), int(job.get("created_at", time.time()))))
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self.local.conn = conn
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None so BEGIN IMMEDIATE takes the write lock up front
+        return sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
@@ -0,0 +1,295 @@
+import time
+import heapq
+import random
+import itertools
+from queue import Empty
+from threading import Condition, Lock
+from typing import Callable, Dict, List, Optional
+
+# Lower runs first
+PRIORITY_CLIENT = 0
+PRIORITY_REPAIR = 1
+PRIORITY_CREATE = 2
+
+TASK_PRIORITIES = {
+    "repair": PRIORITY_REPAIR,
+    "verify": PRIORITY_REPAIR,
+    "create": PRIORITY_CREATE,
+}
+
+
+def task_priority(task: Dict) -> int:
+    """Explicit ``priority`` on the task, else the default for its type."""
+    if task.get("priority") is not None:
+        return int(task["priority"])
+    return TASK_PRIORITIES.get(task.get("type"), PRIORITY_CREATE)
+
+
+# Base backoff per failure reason; anything else uses RetryPolicy.base
+REASON_BASE_DELAYS = {
+    "no_host_capacity": 15.0,
+    "container_launch_failed": 5.0,
+    "restart_failed": 5.0,
+    "health_timeout": 3.0,
+    "exit_ip_collision": 0.5,
+    "network_error": 20.0,
+}
+
+
+class PriorityTaskQueue:
+    """Drop-in for the pool's ``Queue``: client-blocking work, then repairs,
+    then refill creates.
+
+    Within a priority, tasks of different pools (the task's ``pool`` key)
+    are interleaved by start-time fair queuing, weighted by ``set_weight``,
+    so one pool's backlog can't starve another's; a single pool stays FIFO.
+
+    ``put_later`` parks a task on a timer heap; it joins the ready heap once
+    due, so retry backoff never holds a worker thread.
+    """
+
+    def __init__(self) -> None:
+        self.condition = Condition()
+        self.heap = []
+        self.delayed = []
+        self.counter = itertools.count()
+        self.unfinished = 0
+        # Fair queuing: virtual clock, next start tag per pool, pool weights
+        self.clock = 0.0
+        self.finish: Dict[Optional[str], float] = {}
+        self.weights: Dict[Optional[str], float] = {}
+
+    def set_weight(self, pool: Optional[str], weight: float) -> None:
+        with self.condition:
+            self.weights[pool] = max(0.01, float(weight))
+
+    def put(self, task: Dict) -> None:
+        with self.condition:
+            self._push_ready_locked(task)
+            self.unfinished += 1
+            self.condition.notify()
+
+    def put_later(self, task: Dict, delay: float) -> None:
+        with self.condition:
+            heapq.heappush(self.delayed, (time.monotonic() + max(0.0, delay), next(self.counter), task))
+            self.unfinished += 1
+            # Wake a waiting worker so it shortens its wait to the new due time
+            self.condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Dict:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                self._promote_due_locked(now)
+                if self.heap:
+                    return self._pop_ready_locked()
+                remaining = None if deadline is None else deadline - now
+                if remaining is not None and remaining <= 0:
+                    raise Empty
+                if self.delayed:
+                    until_due = self.delayed[0][0] - now
+                    remaining = until_due if remaining is None else min(remaining, until_due)
+                self.condition.wait(remaining)
+
+    def get_nowait(self) -> Dict:
+        with self.condition:
+            self._promote_due_locked(time.monotonic())
+            if not self.heap:
+                raise Empty
+            return self._pop_ready_locked()
+
+    def task_done(self) -> None:
+        with self.condition:
+            self.unfinished = max(0, self.unfinished - 1)
+
+    def clear(self, match: Optional[Callable[[Dict], bool]] = None) -> None:
+        """Drop ready and delayed tasks alike (only those ``match`` accepts, if given)."""
+        with self.condition:
+            before = len(self.heap) + len(self.delayed)
+            if match is None:
+                self.heap.clear()
+                self.delayed.clear()
+            else:
+                self.heap = [entry for entry in self.heap if not match(entry[-1])]
+                self.delayed = [entry for entry in self.delayed if not match(entry[-1])]
+                heapq.heapify(self.heap)
+                heapq.heapify(self.delayed)
+            self.unfinished = max(0, self.unfinished - (before - len(self.heap) - len(self.delayed)))
+
+    def qsize(self) -> int:
+        with self.condition:
+            return len(self.heap) + len(self.delayed)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def counts(self) -> Dict[int, int]:
+        """Ready tasks per priority."""
+        with self.condition:
+            self._promote_due_locked(time.monotonic())
+            counts: Dict[int, int] = {}
+            for priority, _, _, _ in self.heap:
+                counts[priority] = counts.get(priority, 0) + 1
+            return counts
+
+    def delayed_tasks(self) -> List[Dict]:
+        with self.condition:
+            return [task for _, _, task in sorted(self.delayed)]
+
+    def pools(self) -> Dict[str, int]:
+        """Ready and delayed tasks per pool."""
+        with self.condition:
+            counts: Dict[str, int] = {}
+            for task in [entry[-1] for entry in self.heap] + [entry[-1] for entry in self.delayed]:
+                pool = task.get("pool") or "default"
+                counts[pool] = counts.get(pool, 0) + 1
+            return counts
+
+    def _push_ready_locked(self, task: Dict) -> None:
+        pool = task.get("pool")
+        tag = max(self.clock, self.finish.get(pool, 0.0))
+        self.finish[pool] = tag + 1.0 / self.weights.get(pool, 1.0)
+        heapq.heappush(self.heap, (task_priority(task), tag, next(self.counter), task))
+
+    def _pop_ready_locked(self) -> Dict:
+        _, tag, _, task = heapq.heappop(self.heap)
+        self.clock = max(self.clock, tag)
+        return task
+
+    def _promote_due_locked(self, now: float) -> None:
+        while self.delayed and self.delayed[0][0] <= now:
+            _, _, task = heapq.heappop(self.delayed)
+            self._push_ready_locked(task)
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter, keyed by failure reason.
+
+    Attempt ``n`` waits ``base * factor**(n-1)`` (capped at ``max_delay``);
+    ``jitter`` is the share of that delay that is randomised so retries of
+    a burst of failures spread out instead of returning together.
+    """
+
+    def __init__(self, base: float = 2.0, factor: float = 2.0, max_delay: float = 120.0,
+                 jitter: float = 0.5, reason_delays: Optional[Dict[str, float]] = None) -> None:
+        self.base = float(base)
+        self.factor = max(1.0, float(factor))
+        self.max_delay = float(max_delay)
+        self.jitter = min(max(0.0, float(jitter)), 1.0)
+        self.reason_delays = dict(REASON_BASE_DELAYS, **(reason_delays or {}))
+
+    def delay(self, attempt: int, reason: Optional[str] = None) -> float:
+        base = self.reason_delays.get(reason, self.base)
+        delay = min(self.max_delay, base * self.factor ** max(0, attempt - 1))
+        return delay * (1 - self.jitter) + random.uniform(0, delay * self.jitter)
+
+
+class RetryBudget:
+    """Caps retries to a share of first attempts so a failing backend isn't
+    hammered: every first attempt deposits ``ratio`` tokens, every retry
+    spends one, and ``min_per_minute`` tokens trickle in regardless so a
+    quiet pool can still recover."""
+
+    def __init__(self, ratio: float = 0.5, min_per_minute: float = 6, cap: float = 30) -> None:
+        self.ratio = float(ratio)
+        self.min_rate = float(min_per_minute) / 60
+        self.cap = float(cap)
+        self.tokens = self.cap
+        self.updated = time.monotonic()
+        self.lock = Lock()
+        self.retries = 0
+        self.denied = 0
+
+    def record_attempt(self) -> None:
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.cap, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.retries += 1
+                return True
+            self.denied += 1
+            return False
+
+    def stats(self) -> Dict:
+        with self.lock:
+            self._refill()
+            return {"tokens": round(self.tokens, 2), "retries": self.retries, "denied": self.denied}
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.cap, self.tokens + (now - self.updated) * self.min_rate)
+        self.updated = now
+
+
+class TokenBucket:
+    """Rate limit for Docker calls (launches, restarts).
+
+    Holds up to ``burst`` tokens refilled at ``rate`` per second. Waiters
+    are served in priority order, so a client-blocking launch takes the
+    next token ahead of queued refill creates. ``rate <= 0`` disables the
+    limit.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.condition = Condition()
+        self.waiters = []
+        self.counter = itertools.count()
+        self.granted = 0
+        self.waited_seconds = 0.0
+
+    def acquire(self, priority: int = PRIORITY_CREATE, timeout: Optional[float] = None) -> bool:
+        if self.rate <= 0:
+            return True
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        ticket = (priority, next(self.counter))
+        with self.condition:
+            heapq.heappush(self.waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self.waiters[0] == ticket and self.tokens >= 1:
+                        heapq.heappop(self.waiters)
+                        self.tokens -= 1
+                        self.granted += 1
+                        self.waited_seconds += time.monotonic() - start
+                        return True
+                    wait = (1 - self.tokens) / self.rate if self.waiters[0] == ticket else 1.0
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = min(wait, remaining)
+                    self.condition.wait(max(wait, 0.001))
+            finally:
+                if ticket in self.waiters:
+                    self.waiters.remove(ticket)
+                    heapq.heapify(self.waiters)
+                self.condition.notify_all()
+
+    def stats(self) -> Dict:
+        with self.condition:
+            self._refill()
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": round(self.tokens, 2),
+                "waiting": len(self.waiters),
+                "granted": self.granted,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
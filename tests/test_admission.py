@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from admission import DEFAULT_CREATE_SECONDS, AdmissionController
+
+
+def test_wait_estimate_grows_with_callers_already_waiting():
+    admission = AdmissionController(window_seconds=300)
+    # Nothing measured yet: assume the default create time
+    assert admission.estimate_wait(workers=2, in_flight=1) == DEFAULT_CREATE_SECONDS
+    for _ in range(5):
+        admission.record_create(10.0)
+    assert admission.estimate_wait(workers=2, in_flight=1) == 10.0
+    for _ in range(3):
+        admission.enter()
+    # Three waiting, one create running: the new caller is third behind 2 workers / 10s
+    assert admission.estimate_wait(workers=2, in_flight=1) == 10.0 + 3 / 0.2
+    assert admission.admit(deadline=30, workers=2, in_flight=1) == (True, 25.0)
+    assert admission.admit(deadline=20, workers=2, in_flight=1) == (False, 25.0)
+    assert admission.admit(deadline=None, workers=2, in_flight=1)[0] is False
+    assert admission.retry_after(25.0) == 25 and admission.retry_after(0.2) == 1
+
+
+def test_waits_beyond_the_slo_are_refused_while_it_is_missed():
+    admission = AdmissionController(slo_seconds=5.0, slo_target=0.5)
+    for _ in range(5):
+        admission.record_create(10.0)
+    admission.record_served(1.0)
+    admission.record_served(12.0)
+    # Half served in time meets the target: a 10s wait is still admitted
+    assert admission.admit(deadline=30, workers=2, in_flight=1) == (True, 10.0)
+    admission.record_miss("rejected")
+    assert admission.admit(deadline=30, workers=2, in_flight=1) == (False, 10.0)
+    for _ in range(10):
+        admission.record_create(1.0)
+    # Waits inside the SLO are admitted regardless
+    assert admission.admit(deadline=30, workers=2, in_flight=1)[0] is True
+
+
+def test_stats_track_attainment_and_shedding():
+    admission = AdmissionController(slo_seconds=1.0, slo_target=0.75, max_queue=10)
+    for seconds in (0.01, 0.02, 0.5, 3.0):
+        admission.record_served(seconds)
+    admission.record_miss("rejected")
+    assert not admission.should_shed(9) and admission.should_shed(10)
+    stats = admission.stats()
+    assert stats["attainment"] == 0.6 and stats["meeting_slo"] is False
+    assert stats["time_to_proxy_ms"]["p50"] == 500.0
+    assert (stats["served"], stats["rejected"], stats["shed"]) == (4, 1, 1)
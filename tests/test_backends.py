@@ -0,0 +1,164 @@
+import json
+import socketserver
+import sys
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+if "docker" not in sys.modules:
+    docker_stub = types.ModuleType("docker")
+    docker_errors_stub = types.ModuleType("docker.errors")
+
+    class _DummyError(Exception):
+        pass
+
+    docker_stub.from_env = lambda: None
+    docker_errors_stub.APIError = _DummyError
+    docker_errors_stub.DockerException = _DummyError
+    docker_errors_stub.NotFound = _DummyError
+    docker_stub.errors = docker_errors_stub
+    sys.modules["docker"] = docker_stub
+    sys.modules["docker.errors"] = docker_errors_stub
+
+from backends import CONTROL_PORT, FakeBackend, GluetunBackend, ProxyBackend
+from exit_ip_index import ExitIPIndex
+from vpn_manager import VPNManager
+
+
+def _manager(backend, index=None):
+    return VPNManager(configs_dir=str(ROOT / "openvpn"), backend=backend, exit_ip_index=index)
+
+
+def test_fake_backend_lifecycle_through_manager():
+    backend = FakeBackend()
+    manager = _manager(backend)
+    created = manager.create_vpn_proxy()
+    assert created["status"] == "ok"
+    name = created["container_name"]
+
+    listed = manager.list_proxies()
+    assert [item["name"] for item in listed["items"]] == [name]
+    assert manager.get_proxy(name)["http_port"] == created["proxy_port"]
+
+    rotated = manager.restart_and_check(name)
+    assert rotated["status"] == "ok"
+    assert rotated["ip_seen"] != created["ip_seen"]
+
+    assert manager.delete_proxy(name)["status"] == "ok"
+    assert manager.get_proxy(name)["message"] == "not_found"
+
+
+def test_create_repicks_when_exit_ip_is_taken():
+    backend = FakeBackend()
+    index = ExitIPIndex(history_seconds=60)
+    index.reserve("someone-else", "10.0.0.1")
+    created = _manager(backend, index).create_vpn_proxy()
+    assert created["status"] == "ok"
+    assert created["ip_seen"] == "10.0.0.2"
+    assert len(backend.list()) == 1
+
+
+class _ControlHandler(BaseHTTPRequestHandler):
+    calls = []
+
+    def do_PUT(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).calls.append((self.path, body["status"]))
+        self._reply({"outcome": "ok"})
+
+    def do_GET(self):
+        if self.path == "/v1/publicip/ip":
+            self._reply({"public_ip": "5.6.7.8"})
+        else:
+            self._reply({"status": "running"})
+
+    def _reply(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Container:
+    def __init__(self, ports):
+        self.name = "vpn-proxy-test"
+        self.attrs = {"NetworkSettings": {"Ports": ports}}
+        self.restarted = False
+
+    def reload(self):
+        pass
+
+    def restart(self, timeout=None):
+        self.restarted = True
+
+
+def test_gluetun_rotation_uses_control_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ControlHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        port = server.server_address[1]
+        container = _Container({CONTROL_PORT: [{"HostIp": "127.0.0.1", "HostPort": str(port)}]})
+        # Published ports live on another interface; the control port only on control_bind
+        backend = GluetunBackend(client=object(), address="192.0.2.1")
+        assert backend.rotate(container)
+        assert _ControlHandler.calls == [("/v1/vpn/status", "stopped"), ("/v1/vpn/status", "running")]
+        assert backend.tunnel_status(container) == {"vpn": "running", "public_ip": "5.6.7.8"}
+        assert not container.restarted
+    finally:
+        server.shutdown()
+
+
+def test_remote_daemon_with_loopback_control_bind_warns(caplog):
+    with caplog.at_level("WARNING", logger="backends"):
+        GluetunBackend(client=object(), base_url="unix:///var/run/docker.sock")
+        assert not caplog.records
+        remote = GluetunBackend(client=object(), base_url="tcp://10.0.0.5:2376", address="10.0.0.5")
+    assert "control_bind" in caplog.text and remote._control_host() == "127.0.0.1"
+    assert GluetunBackend(client=object(), address="10.0.0.5", control_bind="0.0.0.0")._control_host() == "10.0.0.5"
+    assert GluetunBackend(client=object(), control_bind="10.0.0.5")._control_host() == "10.0.0.5"
+
+
+def test_rotation_without_control_port_falls_back_to_restart():
+    container = _Container({})
+    manager = _manager(GluetunBackend(client=object()))
+    assert manager._rotate_tunnel(container)
+    assert container.restarted
+
+
+def test_control_mode_checks_skip_the_proxy(monkeypatch):
+    backend = FakeBackend()
+    manager = _manager(backend)
+    name = manager.create_vpn_proxy()["container_name"]
+    manager.check_mode = "control"
+    manager.end_to_end_ratio = 0.0
+    monkeypatch.setattr(backend, "validate", lambda host_port: (_ for _ in ()).throw(AssertionError("e2e")))
+    checked = manager.check_container(name)
+    assert checked["status"] == "ok"
+    assert checked["ip_seen"] == backend.get(name).ip
+
+
+def test_probe_expects_connect_200():
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            if self.request.recv(1024).startswith(b"CONNECT api.ipify.org:443"):
+                self.request.sendall(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            else:
+                self.request.sendall(b"HTTP/1.1 502 Bad Gateway\r\n\r\n")
+
+    server = socketserver.TCPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        backend = ProxyBackend()
+        assert backend.probe(server.server_address[1], timeout=2)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,67 @@
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from config_breakers import ConfigBreakers, country_of
+
+
+def _age(breakers, key, seconds):
+    breaker = breakers.breakers[key]
+    breaker.open_until -= seconds
+    breaker.last_trip -= seconds
+
+
+def test_consecutive_failures_open_and_pick_skips_quarantined():
+    breakers = ConfigBreakers(config_threshold=2, base_quarantine=60)
+    breakers.record_failure("uk1.nordvpn.com.tcp.ovpn", "health_timeout")
+    assert breakers.allows("uk1.nordvpn.com.tcp.ovpn")
+    breakers.record_failure("uk1.nordvpn.com.tcp.ovpn", "health_timeout")
+    assert not breakers.allows("uk1.nordvpn.com.tcp.ovpn")
+    picks = {breakers.pick(["uk1.nordvpn.com.tcp.ovpn", "uk2.nordvpn.com.tcp.ovpn"]) for _ in range(20)}
+    assert picks == {"uk2.nordvpn.com.tcp.ovpn"}
+    assert breakers.pick(["uk1.nordvpn.com.tcp.ovpn"]) is None
+
+
+def test_half_open_allows_one_probation_and_failure_doubles_quarantine():
+    breakers = ConfigBreakers(config_threshold=1, base_quarantine=60, decay_seconds=0)
+    name = "de5.nordvpn.com.udp.ovpn"
+    breakers.record_failure(name, "health_timeout")
+    _age(breakers, f"config:{name}", 61)
+    assert breakers.pick([name]) == name
+    assert breakers.pick([name]) is None  # probation slot taken
+    breakers.record_failure(name, "health_timeout")
+    breaker = breakers.breakers[f"config:{name}"]
+    assert breaker.level == 2
+    assert 110 < breaker.open_until - time.time() <= 120
+
+    _age(breakers, f"config:{name}", 121)
+    assert breakers.pick([name]) == name
+    breakers.record_success(name)
+    assert breakers.allows(name)
+    assert breaker.state(time.time()) == "closed"
+
+
+def test_country_breaker_trips_across_configs_and_levels_decay():
+    breakers = ConfigBreakers(config_threshold=5, country_threshold=3, decay_seconds=100)
+    for i in range(3):
+        breakers.record_failure(f"fr{i}.nordvpn.com.tcp.ovpn", "proxy_validation_failed")
+    assert country_of("fr9.nordvpn.com.tcp.ovpn") == "fr"
+    assert not breakers.allows("fr9.nordvpn.com.tcp.ovpn")
+    assert breakers.allows("nl1.nordvpn.com.tcp.ovpn")
+
+    _age(breakers, "country:fr", 1000)
+    breakers.record_success("fr9.nordvpn.com.tcp.ovpn")
+    assert "country:fr" not in breakers.breakers
+
+
+def test_reports_trip_once_per_report():
+    breakers = ConfigBreakers(config_threshold=3)
+    report = {"config_name": "ch3.nordvpn.com.tcp.ovpn", "reason": "slow", "timestamp": 1}
+    breakers.seed_reports([report])
+    breakers.seed_reports([report])
+    assert not breakers.allows("ch3.nordvpn.com.tcp.ovpn")
+    assert breakers.breakers["config:ch3.nordvpn.com.tcp.ovpn"].level == 1
@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from exit_ip_index import ExitIPIndex
+
+
+def test_reserve_rejects_ip_held_by_another_container():
+    index = ExitIPIndex(history_seconds=60)
+    assert index.reserve("a", "1.1.1.1")
+    assert not index.reserve("b", "1.1.1.1")
+    assert index.reserve("b", "2.2.2.2")
+    assert index.distinct_count() == 2
+    assert index.stats()["collisions"] == 1
+
+
+def test_rotation_back_onto_previous_ip_is_a_collision():
+    index = ExitIPIndex(history_seconds=60)
+    assert index.reserve("a", "1.1.1.1")
+    assert index.reserve("a", "2.2.2.2")
+    assert not index.reserve("a", "1.1.1.1")
+    index.release("a")
+    assert not index.reserve("b", "2.2.2.2")
+
+
+def test_history_window_expires():
+    index = ExitIPIndex(history_seconds=0)
+    assert index.reserve("a", "1.1.1.1")
+    index.release("a")
+    assert index.reserve("b", "1.1.1.1")
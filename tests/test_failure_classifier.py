@@ -0,0 +1,90 @@
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+if "docker" not in sys.modules:
+    docker_stub = types.ModuleType("docker")
+    docker_errors_stub = types.ModuleType("docker.errors")
+
+    class _DummyError(Exception):
+        pass
+
+    docker_stub.from_env = lambda: None
+    docker_errors_stub.APIError = _DummyError
+    docker_errors_stub.DockerException = _DummyError
+    docker_errors_stub.NotFound = _DummyError
+    docker_stub.errors = docker_errors_stub
+    sys.modules["docker"] = docker_stub
+    sys.modules["docker.errors"] = docker_errors_stub
+
+from backends import FakeBackend
+from failure_classifier import CreateHalt, classify, policy_for
+from vpn_manager import VPNManager
+
+
+class _FailingBackend(FakeBackend):
+    """Every tunnel fails its health check with ``log_lines`` in the tail."""
+
+    def __init__(self, log_lines):
+        super().__init__()
+        self.log_lines = log_lines
+        self.launched = []
+
+    def launch(self, name, ovpn_file, host_port):
+        self.launched.append(ovpn_file.name if ovpn_file else None)
+        return super().launch(name, ovpn_file, host_port)
+
+    def wait_ready(self, handle, host_port, timeout, check=None, interval=3):
+        return False
+
+
+def test_log_tail_maps_to_reason_and_policy():
+    assert classify(["2024 ... Initialization", "AUTH: Received control message: AUTH_FAILED"]) == "auth_failed"
+    assert classify(["TLS Error: TLS key negotiation failed to occur within 60 seconds"]) == "tls_error"
+    assert classify(["RESOLVE: Cannot resolve host address: uk1.nordvpn.com"]) == "network_error"
+    assert classify(["Options error: Unrecognized option or missing parameter(s)"]) == "config_error"
+    assert classify(["--ca fails with 'ca.crt': No such file or directory (errno=2)"]) == "config_error"
+    # ENOENT from anything but the config/cert loading is not the config's fault
+    assert classify(["open /tmp/gluetun/ip: No such file or directory"]) is None
+    assert classify(["TCP: connect to [AF_INET]1.2.3.4:443 failed: Connection timed out"]) == "server_unreachable"
+    assert classify(["write UDP: Network is unreachable (code=101)"]) == "network_error"
+    assert classify(["still connecting"]) is None and classify([]) is None
+    assert [policy_for(r) for r in ("auth_failed", "tls_error", "server_unreachable", "network_error", None)] == [
+        "halt", "quarantine", "quarantine", "backoff", "retry"]
+
+
+def test_auth_failure_halts_creates_until_credentials_change():
+    backend = _FailingBackend(["AUTH: Received control message: AUTH_FAILED"])
+    halt = CreateHalt()
+    manager = VPNManager(configs_dir=str(ROOT / "openvpn"), backend=backend, halt=halt)
+    assert manager.create_vpn_proxy() == {"status": "error", "message": "auth_failed"}
+    assert len(backend.launched) == 1 and backend.list() == []
+
+    again = VPNManager(configs_dir=str(ROOT / "openvpn"), backend=backend, halt=halt)
+    assert again.create_vpn_proxy() == {"status": "error", "message": "creates_halted"}
+    assert len(backend.launched) == 1
+    assert halt.alert()["blocked_creates"] == 1
+
+    again.credentials = "rotated-credentials"
+    assert not halt.active(again.credentials)
+
+
+def test_tls_error_quarantines_config_and_moves_on():
+    backend = _FailingBackend(["TLS Error: TLS handshake failed"])
+    manager = VPNManager(configs_dir=str(ROOT / "openvpn"), backend=backend, max_attempts=2)
+    assert manager.create_vpn_proxy()["message"] == "tls_error"
+    first, second = backend.launched
+    assert first != second
+    assert not manager.breakers.allows(first)
+
+
+def test_timed_out_remote_falls_through_to_next_config():
+    backend = _FailingBackend(["TCP: connect to [AF_INET]1.2.3.4:443 failed: Connection timed out"])
+    manager = VPNManager(configs_dir=str(ROOT / "openvpn"), backend=backend, max_attempts=3)
+    assert manager.create_vpn_proxy()["message"] == "server_unreachable"
+    assert len(backend.launched) == 3 and len(set(backend.launched)) == 3
+    assert not any(manager.breakers.allows(name) for name in backend.launched)
@@ -0,0 +1,131 @@
+import asyncio
+import base64
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from gateway import Gateway, parse_username
+
+
+class _Pool:
+    """Round-robin over fixed containers, like ``ContainerPool.get_valid``."""
+
+    def __init__(self, name, ports):
+        self.name = name
+        self.registry = {f"{name}{i}": {"container_name": f"{name}{i}", "state": "valid", "proxy_port": port,
+                                        "proxy_url": f"http://0.0.0.0:{port}"}
+                         for i, port in enumerate(ports)}
+        self.valid_queue = list(self.registry)
+        self.turn = 0
+
+    def get_valid(self):
+        if not self.valid_queue:
+            return None
+        name = self.valid_queue[self.turn % len(self.valid_queue)]
+        self.turn += 1
+        return self.registry[name]
+
+
+def test_usernames_route_to_profile_and_stick_to_session():
+    assert parse_username("profile-fast-session-a-b") == ("fast", "a-b")
+    assert parse_username("session-42") == (None, "42")
+    assert parse_username("anything") == (None, None) and parse_username(None) == (None, None)
+
+    pools = {"default": _Pool("d", [1, 2, 3]), "fast": _Pool("f", [4, 5])}
+    gateway = Gateway(pools, "default", session_ttl=60)
+    assert [gateway.route(None)[0] for _ in range(4)] == ["d0", "d1", "d2", "d0"]
+    assert gateway.route("profile-fast")[0] == "f0"
+    assert gateway.route("profile-missing") is None
+
+    pinned = gateway.route("session-x")[0]
+    assert all(gateway.route("session-x")[0] == pinned for _ in range(3))
+    # A pinned container that leaves rotation hands the session to another one
+    pools["default"].registry[pinned]["state"] = "invalid"
+    pools["default"].valid_queue.remove(pinned)
+    moved = gateway.route("session-x")[0]
+    assert moved != pinned and gateway.route("session-x")[0] == moved
+    assert gateway.stats()["sessions"] == 1
+
+
+def test_drain_waits_for_open_connections():
+    gateway = Gateway({}, "default", drain_seconds=5)
+    assert gateway.drain("c1") is True
+    with gateway._tracked("c1"):
+        assert gateway.drain("c1", timeout=0.05) is False
+        done = []
+        waiter = threading.Thread(target=lambda: done.append(gateway.drain("c1")))
+        waiter.start()
+        time.sleep(0.05)
+        assert not done
+    waiter.join(timeout=2)
+    assert done == [True]
+    assert gateway.stats()["drain_timeouts"] == 1 and gateway.stats()["active"] == {}
+
+
+def test_plain_http_request_is_relayed_through_routed_container():
+    async def scenario():
+        seen = []
+
+        async def upstream(reader, writer):
+            head = await reader.readuntil(b"\r\n\r\n")
+            seen.append(head)
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+            await writer.drain()
+            writer.close()
+
+        upstream_server = await asyncio.start_server(upstream, "127.0.0.1", 0)
+        port = upstream_server.sockets[0].getsockname()[1]
+        # The first container refuses connections: the gateway retries another one
+        gateway = Gateway({"default": _Pool("d", [1, port])}, "default")
+        front = await asyncio.start_server(gateway._handle, "127.0.0.1", 0)
+        front_port = front.sockets[0].getsockname()[1]
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", front_port)
+        auth = base64.b64encode(b"session-s1:x").decode()
+        writer.write(f"GET http://example.com/ HTTP/1.1\r\nHost: example.com\r\n"
+                     f"Proxy-Authorization: Basic {auth}\r\nProxy-Connection: keep-alive\r\n\r\n".encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout=5)
+        writer.close()
+        front.close()
+        upstream_server.close()
+        return seen, response, gateway
+
+    seen, response, gateway = asyncio.run(scenario())
+    assert response.endswith(b"\r\n\r\nok")
+    assert b"Proxy-Authorization" not in seen[0] and b"Connection: close" in seen[0]
+    stats = gateway.stats()
+    assert stats["connections"] == 1 and stats["upstream_failures"] == 1
+    assert gateway.sessions[("d", "s1")][0] == "d1"
+
+
+def test_slow_routing_does_not_stall_the_relay_loop():
+    class _SlowPool(_Pool):
+        def get_valid(self):
+            release.wait(2)
+            return super().get_valid()
+
+    release = threading.Event()
+
+    async def scenario():
+        gateway = Gateway({"default": _SlowPool("d", [1])}, "default")
+        front = await asyncio.start_server(gateway._handle, "127.0.0.1", 0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", front.sockets[0].getsockname()[1])
+        writer.write(b"GET http://example.com/ HTTP/1.1\r\nHost: example.com\r\n\r\n")
+        await writer.drain()
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        await asyncio.sleep(0.05)
+        responsive = time.monotonic() - started
+        release.set()
+        await asyncio.wait_for(reader.read(), timeout=5)
+        writer.close()
+        front.close()
+        return responsive
+
+    assert asyncio.run(scenario()) < 0.5
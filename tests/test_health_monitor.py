@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from health_monitor import HealthMonitor
+
+
+def _monitor(probe_results, full_results=None, **kwargs):
+    calls, failed = [], []
+
+    def probe(name):
+        calls.append(("probe", name))
+        return {"status": "ok" if probe_results.get(name, True) else "error", "message": "probe_failed"}
+
+    def validate(name):
+        calls.append(("full", name))
+        return {"status": "ok" if (full_results or {}).get(name, True) else "error"}
+
+    monitor = HealthMonitor(probe=probe, validate=validate,
+                            on_failure=lambda name, result: failed.append(name), **kwargs)
+    return monitor, calls, failed
+
+
+def test_first_checks_are_spread_over_the_interval():
+    monitor, _, _ = _monitor({}, probe_interval=30)
+    for i in range(200):
+        monitor.track(f"p{i}")
+    dues = sorted(due for due, _ in monitor.schedule)
+    assert dues[-1] - dues[0] > 20
+
+
+def test_validated_proxies_get_probes_until_full_check_is_due():
+    monitor, calls, _ = _monitor({}, probe_interval=10, full_interval=100)
+    monitor.track("a", validated=True)
+    now = monitor.results["a"]["last_full"]
+    monitor.run_once(now=now + 20)
+    assert calls == [("probe", "a")]
+    monitor.run_once(now=now + 200)
+    assert calls[-1] == ("full", "a")
+
+
+def test_probe_failures_reach_threshold_before_invalidating():
+    monitor, calls, failed = _monitor({"a": False}, probe_interval=10, failure_threshold=2, retry_delay=0)
+    monitor.track("a", validated=True)
+    start = monitor.results["a"]["last_full"]
+    monitor.run_once(now=start + 20)
+    assert failed == [] and monitor.results["a"]["failures"] == 1
+    monitor.run_once(now=start + 40)
+    assert failed == ["a"]
+    assert "a" not in monitor.results
+    assert monitor.stats()["invalidated"] == 1
+
+
+def test_full_check_failure_invalidates_immediately():
+    monitor, _, failed = _monitor({}, {"a": False}, probe_interval=10, full_interval=10)
+    monitor.track("a")
+    monitor.run_once(now=monitor.results["a"]["due"])
+    assert failed == ["a"]
@@ -0,0 +1,141 @@
+import queue
+import sys
+import time
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+if "docker" not in sys.modules:
+    docker_stub = types.ModuleType("docker")
+    docker_errors_stub = types.ModuleType("docker.errors")
+
+    class _DummyError(Exception):
+        pass
+
+    docker_stub.from_env = lambda: None
+    docker_errors_stub.APIError = _DummyError
+    docker_errors_stub.DockerException = _DummyError
+    docker_errors_stub.NotFound = _DummyError
+    docker_stub.errors = docker_errors_stub
+    sys.modules["docker"] = docker_stub
+    sys.modules["docker.errors"] = docker_errors_stub
+
+from backends import CONTROL_PORT, GLUETUN_IMAGE, PROXY_PORT, FakeBackend, GluetunBackend
+from inventory import ProxyInventory
+from vpn_manager import VPNManager
+
+
+def test_listing_is_served_from_cache_until_refresh():
+    backend = FakeBackend()
+    inventory = ProxyInventory(ttl=3600)
+    manager = VPNManager(configs_dir=str(ROOT / "openvpn"), backend=backend, inventory=inventory)
+    created = manager.create_vpn_proxy()
+    name = created["container_name"]
+    assert [i["name"] for i in manager.list_proxies()["items"]] == [name]
+
+    outside = backend.launch("vpn-proxy-outside", None, 9999)
+    calls = []
+    original_list = backend.list
+    backend.list = lambda: calls.append(1) or original_list()
+
+    assert [i["name"] for i in manager.list_proxies()["items"]] == [name]
+    assert manager.get_proxy(name)["http_port"] == created["proxy_port"]
+    assert calls == []
+
+    names = {i["name"] for i in manager.list_proxies(refresh=True)["items"]}
+    assert names == {name, outside.name}
+
+    assert manager.delete_proxy(name)["status"] == "ok"
+    assert name not in {i["name"] for i in manager.list_proxies()["items"]}
+
+
+class _EventBackend(FakeBackend):
+    supports_events = True
+
+    def __init__(self):
+        super().__init__()
+        self.stream = queue.Queue()
+
+    def events(self):
+        while True:
+            yield self.stream.get()
+
+
+def test_events_keep_the_cache_current():
+    backend = _EventBackend()
+    inventory = ProxyInventory(ttl=0)
+    inventory.attach("local", backend)
+    proxy = backend.launch("vpn-proxy-a", None, 9100)
+    backend.stream.put(("start", proxy.name))
+    _wait_for(lambda: inventory.get(proxy.name) is not None)
+
+    backend.remove(proxy)
+    backend.stream.put(("destroy", proxy.name))
+    _wait_for(lambda: inventory.get(proxy.name) is None)
+    assert inventory.stats()["watching"] == ["local"]
+
+
+class _Summaries:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def containers(self, all=False, filters=None):
+        return self.rows
+
+
+class _Models:
+    def prepare_model(self, attrs):
+        return types.SimpleNamespace(id=attrs["Id"], name=attrs["Name"].lstrip("/"), attrs=attrs)
+
+
+def test_gluetun_snapshot_builds_handles_without_inspect():
+    rows = [{
+        "Id": "abc",
+        "Names": ["/vpn-proxy-1"],
+        "State": "running",
+        "Ports": [
+            {"IP": "0.0.0.0", "PrivatePort": 8888, "PublicPort": 9300, "Type": "tcp"},
+            {"IP": "127.0.0.1", "PrivatePort": 8000, "PublicPort": 41000, "Type": "tcp"},
+        ],
+    }]
+    client = types.SimpleNamespace(api=_Summaries(rows), containers=_Models())
+    backend = GluetunBackend(client=client)
+    [record] = backend.snapshot()
+    assert record["name"] == "vpn-proxy-1" and record["http_port"] == "9300"
+
+    handle = backend.from_record(record)
+    assert handle.id == "abc"
+    assert handle.attrs["NetworkSettings"]["Ports"][CONTROL_PORT][0]["HostPort"] == "41000"
+    assert handle.attrs["NetworkSettings"]["Ports"][PROXY_PORT][0]["HostPort"] == "9300"
+
+
+def test_gluetun_event_stream_is_open_before_the_relist():
+    subscribed = []
+
+    class _Client:
+        def events(self, decode=False, filters=None):
+            subscribed.append(filters)
+            return _Stream([{"Action": "start", "Actor": {"Attributes": {"image": GLUETUN_IMAGE,
+                                                                         "name": "vpn-proxy-1"}}}])
+
+    stream = GluetunBackend(client=_Client()).events()
+    # Subscribed before the first next(), so events during the inventory relist are kept
+    assert subscribed == [{"type": "container"}]
+    assert list(stream) == [("start", "vpn-proxy-1")]
+
+
+class _Stream(list):
+    def close(self):
+        pass
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not met")
@@ -0,0 +1,80 @@
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+if "docker" not in sys.modules:
+    docker_stub = types.ModuleType("docker")
+    docker_errors_stub = types.ModuleType("docker.errors")
+
+    class _DummyError(Exception):
+        pass
+
+    docker_stub.from_env = lambda: None
+    docker_errors_stub.APIError = _DummyError
+    docker_errors_stub.DockerException = _DummyError
+    docker_errors_stub.NotFound = _DummyError
+    docker_stub.errors = docker_errors_stub
+    sys.modules["docker"] = docker_stub
+    sys.modules["docker.errors"] = docker_errors_stub
+
+from backends import FakeBackend, GluetunBackend
+from launch_profiles import PROFILE_LABEL, LaunchExperiment, LaunchProfile
+from vpn_manager import VPNManager
+
+PROFILES = {
+    "baseline": {},
+    "lean": {"env": {"DOT": "off", "UPDATER_PERIOD": "0"}, "limits": {"memory": "128m"}, "weight": 2},
+}
+
+
+def test_ab_mode_splits_launches_and_reports_per_profile():
+    experiment = LaunchExperiment.from_config({"mode": "ab", "profiles": PROFILES})
+    picks = [experiment.choose().name for _ in range(6)]
+    assert picks.count("lean") == 4 and picks.count("baseline") == 2
+
+    experiment.record("lean", 8.0, True)
+    experiment.record("lean", 12.0, True)
+    experiment.record("lean", None, False, "tls_error")
+    experiment.record("baseline", 20.0, True)
+    stats = experiment.stats()
+    lean = next(i for i in stats["items"] if i["name"] == "lean")
+    assert lean["success_rate"] == 0.6667 and lean["time_to_healthy_s"]["mean"] == 10.0
+    assert lean["failure_reasons"] == {"tls_error": 1} and lean["env"]["DOT"] == "off"
+    assert stats["fastest"] == "lean"
+
+    fixed = LaunchExperiment.from_config({"active": "lean", "profiles": PROFILES})
+    assert {fixed.choose().name for _ in range(3)} == {"lean"}
+
+
+def test_creates_are_tagged_and_timed_per_profile():
+    backend = FakeBackend()
+    experiment = LaunchExperiment.from_config({"mode": "ab", "profiles": PROFILES})
+    manager = VPNManager(configs_dir=str(ROOT / "openvpn"), backend=backend, experiment=experiment)
+    created = [manager.create_vpn_proxy() for _ in range(3)]
+    assert [c["launch_profile"] for c in created] == ["lean", "baseline", "lean"]
+    assert backend.proxies[created[1]["container_name"]].profile == "baseline"
+    assert {i["name"]: i["healthy"] for i in experiment.stats()["items"]} == {"baseline": 1, "lean": 2}
+
+
+def test_gluetun_launch_applies_profile_settings():
+    runs = []
+
+    class _Containers:
+        def run(self, **kwargs):
+            runs.append(kwargs)
+            return object()
+
+    client = types.SimpleNamespace(containers=_Containers())
+    backend = GluetunBackend(client=client, limits={"memory": "256m", "cpus": 1})
+    profile = LaunchProfile("lean", env={"DOT": "off"}, volumes={"/srv/cache": {"bind": "/gluetun", "mode": "rw"}},
+                            limits={"memory": "128m"})
+    backend.launch("vpn-proxy-1", None, 9000, profile=profile)
+    run = runs[0]
+    assert run["environment"]["DOT"] == "off" and run["environment"]["HTTPPROXY"] == "on"
+    assert run["volumes"] == {"/srv/cache": {"bind": "/gluetun", "mode": "rw"}}
+    assert run["mem_limit"] == "128m" and run["nano_cpus"] == 10 ** 9
+    assert run["labels"] == {PROFILE_LABEL: "lean"}
@@ -0,0 +1,75 @@
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+if "docker" not in sys.modules:
+    docker_stub = types.ModuleType("docker")
+    docker_errors_stub = types.ModuleType("docker.errors")
+
+    class _DummyError(Exception):
+        pass
+
+    docker_stub.from_env = lambda: None
+    docker_errors_stub.APIError = _DummyError
+    docker_errors_stub.DockerException = _DummyError
+    docker_errors_stub.NotFound = _DummyError
+    docker_stub.errors = docker_errors_stub
+    sys.modules["docker"] = docker_stub
+    sys.modules["docker.errors"] = docker_errors_stub
+
+from backends import FakeBackend
+from placement import DockerHost, HostPlacement
+from vpn_manager import VPNManager
+
+
+def _placement(*capacities):
+    hosts = []
+    for i, capacity in enumerate(capacities):
+        address, public = f"10.9.0.{i + 1}", f"203.0.113.{i + 1}"
+        backend = FakeBackend(address=address, public_address=public)
+        hosts.append(DockerHost(name=f"daemon-{i}", base_url=f"tcp://{address}:2375", address=address,
+                                public_address=public, capacity=capacity, backend=backend))
+    return HostPlacement(hosts)
+
+
+def _manager(placement):
+    return VPNManager(configs_dir=str(ROOT / "openvpn"), placement=placement)
+
+
+def test_creates_go_to_least_loaded_host_with_host_urls():
+    placement = _placement(1, 2)
+    created = [_manager(placement).create_vpn_proxy() for _ in range(3)]
+    assert all(c["status"] == "ok" for c in created)
+    assert sorted(c["host"] for c in created) == ["daemon-0", "daemon-1", "daemon-1"]
+    for c in created:
+        host = placement.hosts[c["host"]]
+        assert c["proxy_url"] == f"http://{host.public_address}:{c['proxy_port']}"
+        assert host.port_min <= c["proxy_port"] <= host.port_max
+
+    full = _manager(placement).create_vpn_proxy()
+    assert full == {"status": "error", "message": "no_host_capacity"}
+
+
+def test_name_lookups_route_to_owning_host():
+    placement = _placement(2, 2)
+    created = _manager(placement).create_vpn_proxy()
+    name = created["container_name"]
+
+    rotated = _manager(placement).restart_and_check(name)
+    assert rotated["status"] == "ok"
+    assert rotated["proxy_url"] == created["proxy_url"]
+
+    assert _manager(placement).delete_proxy(name)["status"] == "ok"
+    assert placement.stats()["containers"] == 0
+
+
+def test_unhealthy_host_is_skipped():
+    placement = _placement(5, 5)
+    placement.hosts["daemon-0"].backend.ping = lambda: False
+    placement.check_health()
+    created = _manager(placement).create_vpn_proxy()
+    assert created["host"] == "daemon-1"
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from pool_events import EVENT_OVERFLOW, EVENT_RESET, EventBus, format_sse
+
+
+def _drain(bus, subscriber):
+    events = []
+    while True:
+        event = bus.next_event(subscriber, timeout=0)
+        if event is None:
+            return events
+        events.append(event)
+
+
+def test_slow_subscriber_is_dropped_and_resumes_from_history():
+    bus = EventBus(history=100, buffer=3)
+    fast = bus.subscribe()
+    slow = bus.subscribe()
+    only_fast_pool = bus.subscribe(profile="fast")
+    for i in range(2):
+        bus.publish("created", "default", {"container_name": f"c{i}"})
+    assert [e["seq"] for e in _drain(bus, fast)] == [1, 2]
+    for i in range(2, 4):
+        bus.publish("created", "default", {"container_name": f"c{i}"})
+    bus.publish("removed", "fast", {"container_name": "f0"})
+    assert [e["seq"] for e in _drain(bus, fast)] == [3, 4, 5]
+    assert [e["seq"] for e in _drain(bus, only_fast_pool)] == [5]
+
+    # The slow one got 3 events before its buffer filled, then the overflow marker
+    slow_events = _drain(bus, slow)
+    assert [e["seq"] for e in slow_events[:3]] == [1, 2, 3]
+    assert slow_events[3]["type"] == EVENT_OVERFLOW and slow_events[3]["seq"] == 3
+    assert len(slow_events) == 4 and bus.stats()["dropped_subscribers"] == 1
+
+    resumed = bus.subscribe(since=3)
+    assert [e["seq"] for e in _drain(bus, resumed)] == [4, 5]
+
+
+def test_resume_point_outside_history_gets_reset():
+    bus = EventBus(history=2)
+    for i in range(5):
+        bus.publish("validated", "default", {"container_name": f"c{i}"})
+    assert [e["type"] for e in _drain(bus, bus.subscribe(since=1))] == [EVENT_RESET]
+    # A client from before a restart is ahead of the counter
+    assert [e["type"] for e in _drain(bus, bus.subscribe(since=50))] == [EVENT_RESET]
+    assert [e["seq"] for e in _drain(bus, bus.subscribe(since=3))] == [4, 5]
+
+    message = format_sse(bus.history[-1])
+    assert message.startswith("id: 5\nevent: validated\ndata: {") and message.endswith("\n\n")
@@ -0,0 +1,35 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from pool_index import PoolEntry, ValidRing
+
+
+def test_ring_rotates_round_robin_and_discards_in_place():
+    ring = ValidRing()
+    for name in ("a", "b", "c"):
+        ring.add(name)
+    assert [ring.rotate() for _ in range(4)] == ["a", "b", "c", "a"]
+    ring.discard("b")
+    ring.add("a")  # re-validated entries go to the back
+    assert [ring.rotate() for _ in range(3)] == ["c", "a", "c"]
+    assert len(ring) == 2 and "b" not in ring
+    ring.clear()
+    assert ring.rotate() is None
+
+
+def test_entry_behaves_like_the_dict_it_replaces():
+    entry = PoolEntry.from_dict({"container_name": "p1", "proxy_port": 9000, "state": "valid", "custom": 1})
+    entry["resource_strikes"] = entry.get("resource_strikes", 0) + 1
+    assert entry["state"] == "valid" and entry.get("ip_seen") is None
+    assert "ip_seen" not in entry and "custom" in entry
+    assert entry.setdefault("status", "ok") == "ok"
+    assert json.loads(json.dumps(entry.to_dict())) == {
+        "container_name": "p1", "proxy_port": 9000, "state": "valid", "custom": 1,
+        "resource_strikes": 1, "status": "ok"}
+    assert dict(entry) == entry.to_dict()
+    assert not hasattr(entry, "__dict__")
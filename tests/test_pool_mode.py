@@ -1,7 +1,10 @@
+import asyncio
+import json
 import sys
+import threading
+import time
 import types
 from pathlib import Path
-from queue import Queue
 from typing import Dict, Optional
 
 import pytest
@@ -44,6 +47,9 @@ class FakeVPNManager:
     next_port: int = 9000
     restart_failures = set()
     bad_entries = []
+    usage: Dict[str, Dict] = {}
+    probe_failures = set()
+    create_failures = 0
 
     def __init__(self, **config):
         self.config = config
@@ -55,8 +61,14 @@ class FakeVPNManager:
         cls.next_port = 9000
         cls.restart_failures = set()
         cls.bad_entries = []
+        cls.usage = {}
+        cls.probe_failures = set()
+        cls.create_failures = 0
 
     def create_vpn_proxy(self):
+        if type(self).create_failures > 0:
+            type(self).create_failures -= 1
+            return {"status": "error", "message": "health_timeout"}
         name = f"fake-proxy-{type(self).next_id}"
         container_id = f"id-{type(self).next_id}"
         port = type(self).next_port
@@ -93,7 +105,30 @@ class FakeVPNManager:
             "ip_seen": entry["ip_seen"],
         }
 
-    def list_proxies(self):
+    def probe_proxy(self, name: str):
+        if name not in type(self).containers:
+            return {"status": "error", "message": "not_found"}
+        if name in type(self).probe_failures:
+            return {"status": "error", "message": "probe_failed"}
+        return {"status": "ok", "container_name": name}
+
+    def check_container(self, name: str, end_to_end=None):
+        entry = type(self).containers.get(name)
+        if not entry:
+            return {"status": "error", "message": "not_found"}
+        if name in type(self).probe_failures:
+            return {"status": "error", "message": "proxy_validation_failed"}
+        return {key: value for key, value in entry.items() if key != "restart_count"}
+
+    def sample_proxy(self, name: str):
+        if name not in type(self).containers:
+            return {"status": "error", "message": "not_found"}
+        sample = {"cpu_seconds": 0.0, "memory_bytes": 1024, "memory_limit": None,
+                  "net_rx_bytes": 0, "net_tx_bytes": 0}
+        sample.update(type(self).usage.get(name, {}))
+        return {"status": "ok", **sample}
+
+    def list_proxies(self, refresh=False):
         items = []
         for entry in type(self).containers.values():
             items.append({
@@ -104,7 +139,7 @@ class FakeVPNManager:
             })
         return {"status": "ok", "items": items}
 
-    def get_proxy(self, name: str):
+    def get_proxy(self, name: str, refresh=False):
         entry = type(self).containers.get(name)
         if not entry:
             return {"status": "error", "message": "not_found"}
@@ -145,7 +180,11 @@ def _reset_pool_state():
         main.POOL.pending_repairs.clear()
         main.POOL.pending_creates = 0
         main.POOL.started = False
-    main.POOL.task_queue = Queue()
+    main.POOL.task_queue = main.PriorityTaskQueue()
+    main.POOL.refill_pending = False
+    main.POOL.exit_ips = main.ExitIPIndex(history_seconds=60)
+    main.POOL.monitor.clear()
+    main.POOL.monitor_managers.clear()
 
 
 @pytest.fixture(autouse=True)
@@ -181,6 +220,9 @@ def test_new_proxy_returns_valid_container(client):
 def test_restart_success_revalidates_container(client):
     first_valid = client.post("/new_proxy").json()["container_name"]
     second_valid = client.post("/new_proxy").json()["container_name"]
+    metadata = {"launch_profile": "fast", "protocol": "tcp", "host": "edge-2"}
+    for key, value in metadata.items():
+        main.POOL.registry[first_valid][key] = value
     result = client.post("/restart_and_check", json={"container_name": first_valid})
     assert result.status_code == 200
     payload = result.json()
@@ -193,6 +235,7 @@ def test_restart_success_revalidates_container(client):
     recovered = next(item for item in data["processed"] if item["container_name"] == first_valid)
     assert recovered["status"] == "recovered"
     assert main.POOL.registry[first_valid]["state"] == "valid"
+    assert all(main.POOL.registry[first_valid][key] == value for key, value in metadata.items())
     assert first_valid not in main.POOL.needs_restart
 
 
@@ -214,3 +257,307 @@ def test_restart_failure_marks_container_for_repair(client):
     assert target not in main.POOL.registry
     assert target not in FakeVPNManager.containers
     assert len(main.POOL.registry) == main.POOL.target_size
+
+
+def test_events_report_repair_and_replacement_in_order(client):
+    subscriber = main.POOL.events.subscribe()
+    target = client.post("/new_proxy").json()["container_name"]
+    FakeVPNManager.restart_failures.add(target)
+    client.post("/restart_and_check", json={"container_name": target})
+    client.post("/maintenance/sweep")
+
+    events = []
+    while True:
+        event = main.POOL.events.next_event(subscriber, timeout=0)
+        if event is None:
+            break
+        events.append(event)
+    main.POOL.events.unsubscribe(subscriber)
+    assert [(e["type"], e["entry"]["container_name"] == target) for e in events] == [
+        ("invalidated", True), ("repair_started", True), ("replaced", True), ("created", False)]
+    assert events[2]["entry"]["state"] == "removed" and events[2]["reason"]
+    assert [e["seq"] for e in events] == sorted(e["seq"] for e in events)
+
+
+def test_open_event_streams_leave_sync_endpoints_responsive(client):
+    import anyio.to_thread
+
+    async def request(path, disconnect):
+        messages = []
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+                 "root_path": "", "headers": [], "client": ("test", 1), "server": ("test", 80)}
+        await main.app(scope, receive, send)
+        return messages
+
+    async def scenario():
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        tokens = limiter.total_tokens
+        # Fewer threadpool tokens than open streams: a thread per stream would starve /pools
+        limiter.total_tokens = 2
+        disconnect = asyncio.Event()
+        try:
+            streams = [asyncio.create_task(request("/events", disconnect)) for _ in range(5)]
+            await asyncio.sleep(0.2)
+            main.POOL.events.publish("validated", main.POOL.name, {"container_name": "x"})
+            pools = await asyncio.wait_for(request("/pools", asyncio.Event()), timeout=5)
+            assert pools[0]["status"] == 200
+        finally:
+            disconnect.set()
+            limiter.total_tokens = tokens
+        for messages in await asyncio.wait_for(asyncio.gather(*streams), timeout=5):
+            body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+            assert b"event: validated" in body
+
+    asyncio.run(scenario())
+
+
+def test_proxy_listing_reads_the_inventory_without_a_manager(client, monkeypatch):
+    from backends import FakeBackend
+    from inventory import ProxyInventory
+
+    backend = FakeBackend()
+    proxy = backend.launch("vpn-proxy-cached", None, 9400)
+    inventory = ProxyInventory(ttl=3600)
+    inventory.attach("local", backend)
+    monkeypatch.setattr(main.POOL, "inventory", inventory)
+    built = []
+    monkeypatch.setattr(main, "_get_manager", lambda: built.append(1) or FakeVPNManager())
+
+    assert client.get("/proxies").json()["items"] == [
+        {"id": proxy.id, "name": proxy.name, "status": "running", "http_port": 9400}]
+    detail = client.get(f"/proxy/{proxy.name}").json()
+    assert detail["state"] == "running" and detail["http_port"] == 9400
+    assert client.get("/proxy/vpn-proxy-missing").status_code == 404
+    assert built == []
+
+    client.get("/proxies", params={"refresh": True})
+    assert built == [1]
+
+
+def test_health_checks_reuse_managers(client, monkeypatch):
+    built = []
+    monkeypatch.setattr(main.POOL, "_new_manager", lambda priority=None: built.append(1) or FakeVPNManager())
+    name = next(iter(main.POOL.registry))
+    for _ in range(3):
+        assert main.POOL._monitor_probe(name)["status"] == "ok"
+        assert main.POOL._monitor_validate(name)["status"] == "ok"
+    assert built == [1]
+
+
+def test_monitor_reported_ip_change_keeps_exit_ips_unique():
+    first, second = sorted(main.POOL.registry)
+    taken = main.POOL.registry[first]["ip_seen"]
+    main.POOL.registry[second]["resources"] = {"memory_bytes": 1}
+    main.POOL._monitor_validated(second, {"status": "ok", "container_name": second, "ip_seen": "10.9.9.9"})
+    entry = main.POOL.registry[second]
+    assert entry["ip_seen"] == "10.9.9.9" and entry["resources"] == {"memory_bytes": 1}
+    assert main.POOL.exit_ips.ip_of(second) == "10.9.9.9"
+
+    main.POOL._monitor_validated(second, {"status": "ok", "container_name": second, "ip_seen": taken})
+    assert main.POOL.registry[first]["state"] == "valid" and main.POOL.exit_ips.ip_of(first) == taken
+    assert main.POOL.registry[second]["state"] == "invalid" and second in main.POOL.pending_repairs
+    assert main.POOL.task_queue.get(timeout=1)["name"] == second
+    assert main.POOL.exit_ips.stats()["collisions"] == 1
+
+
+def test_debug_endpoints_are_opt_in(client, monkeypatch):
+    response = client.get("/debug/threads")
+    assert response.status_code == 404 and response.json()["detail"]["message"] == "debug_disabled"
+    monkeypatch.setattr(main, "DEBUG_ENABLED", True)
+    threads = client.get("/debug/threads").json()
+    assert any(item["name"] == "MainThread" for item in threads["items"])
+
+
+def test_exit_ip_stats_count_distinct_pool_ips(client):
+    response = client.get("/exit_ips")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["distinct_ips"] == 2
+    assert data["valid_containers"] == 2
+
+    name = client.post("/new_proxy").json()["container_name"]
+    client.delete(f"/proxy/{name}")
+    assert main.POOL.exit_ips.ip_of(name) is None
+
+
+def test_resource_sampler_recycles_heavy_container(client, monkeypatch):
+    monkeypatch.setattr(main.POOL, "evict_memory_bytes", 10_000)
+    monkeypatch.setattr(main.POOL, "evict_strikes", 2)
+    heavy = client.post("/new_proxy").json()["container_name"]
+    FakeVPNManager.usage[heavy] = {"memory_bytes": 50_000}
+
+    first = main.POOL.sample_resources()
+    assert first["recycled"] == []
+    report = client.get("/resources").json()["items"]
+    assert report[heavy]["memory_bytes"] == 50_000
+
+    second = main.POOL.sample_resources()
+    assert second["recycled"] == [heavy]
+    assert heavy not in main.POOL.registry
+    assert len(main.POOL.registry) == main.POOL.target_size
+
+
+def test_health_monitor_pulls_dead_proxy_before_hand_out(client, monkeypatch):
+    monkeypatch.setattr(main.POOL.monitor, "failure_threshold", 1)
+    dead, alive = sorted(main.POOL.valid_set)
+    FakeVPNManager.probe_failures.add(dead)
+
+    results = main.POOL.monitor.run_once(now=time.time() + 3600)
+    assert results == {dead: False, alive: True}
+    assert main.POOL.registry[dead]["state"] == "invalid"
+    assert dead in main.POOL.pending_repairs
+    assert main.POOL.task_queue.get_nowait() == {"type": "repair", "name": dead, "attempts": 0}
+    handed_out = {client.post("/new_proxy").json()["container_name"] for _ in range(3)}
+    assert handed_out == {alive}
+    assert client.get("/health_monitor").json()["invalidated"] >= 1
+
+
+def test_lease_streams_distinct_proxies_as_ndjson(client):
+    response = client.post("/proxies/lease", params={"n": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(item["container_name"] for item in lines) == sorted(main.POOL.valid_set)
+
+    main.POOL.target_size = 3
+    response = client.post("/proxies/lease", params={"n": 4, "wait": 0.2})
+    *proxies, trailer = [json.loads(line) for line in response.text.splitlines()]
+    # The missing ones are requested right away; the pool only grows to its target size
+    assert len({item["container_name"] for item in proxies}) == 3
+    assert trailer == {"status": "error", "message": "no_available_container", "leased": 3, "requested": 4}
+
+
+def test_profile_pool_serves_matching_requests_on_shared_workers(client):
+    fast = main.ContainerPool(target_size=1, max_repair_attempts=2, name="fast", parent=main.POOL,
+                              request_config=main.NewProxyRequest(profile="fast", health_timeout=10).model_dump())
+    try:
+        assert fast.task_queue is main.POOL.task_queue and fast.exit_ips is main.POOL.exit_ips
+        fast._schedule_create()
+        assert main.POOL.task_queue.get_nowait() == {"type": "create", "attempts": 0, "pool": "fast"}
+        fast.pending_creates = 0
+        fast.start_worker = False
+
+        by_name = client.post("/new_proxy", json={"profile": "fast"}).json()
+        by_fields = client.post("/new_proxy", json={"health_timeout": 10}).json()
+        assert by_name["container_name"] == by_fields["container_name"] in fast.registry
+        assert by_name["container_name"] not in main.POOL.registry
+        assert client.post("/new_proxy", json={"profile": "nope"}).status_code == 404
+        assert client.post("/new_proxy", json={"health_timeout": 11}).json()["detail"]["message"] == \
+            "pool_config_is_static"
+
+        restarted = client.post("/restart_and_check", json={"container_name": by_name["container_name"]})
+        assert restarted.status_code == 200
+        assert by_name["container_name"] in fast.needs_restart
+        pools = {item["name"]: item for item in client.get("/pools").json()["items"]}
+        assert pools["fast"]["target_size"] == 1 and pools["fast"]["profile"]["health_timeout"] == 10
+    finally:
+        main.POOL.peers.pop("fast", None)
+
+
+def test_empty_pool_admits_callers_whose_deadline_fits(client):
+    main.POOL.start_worker = True
+    main.POOL.target_size = 3
+    with main.POOL.condition:
+        for name in list(main.POOL.registry):
+            main.POOL._mark_invalid_locked(name)
+
+    rejected = client.post("/new_proxy")
+    assert rejected.status_code == 503
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+    def worker():
+        main.POOL._run_task(main.POOL.task_queue.get(timeout=2))
+
+    threading.Thread(target=worker, daemon=True).start()
+    admitted = client.post("/new_proxy", headers={"X-Deadline-Ms": "2000"})
+    assert admitted.status_code == 200
+    assert main.POOL.registry[admitted.json()["container_name"]]["state"] == "valid"
+    stats = client.get("/slo").json()["items"]["default"]
+    assert stats["rejected"] >= 1 and stats["served"] >= 1
+
+
+def test_failed_create_backs_off_on_timer_heap_without_blocking(client):
+    FakeVPNManager.create_failures = 1
+    started = time.time()
+    main.POOL._handle_create_task({"type": "create", "attempts": 0})
+    assert time.time() - started < 0.5
+    [retry] = main.POOL.task_queue.delayed_tasks()
+    assert retry == {"type": "create", "attempts": 1, "reason": "health_timeout"}
+    assert client.get("/scheduler").json()["delayed"] == 1
+
+
+def test_create_gives_up_after_max_attempts_and_schedules_refill(monkeypatch):
+    monkeypatch.setattr(main.POOL, "max_create_attempts", 2)
+    FakeVPNManager.create_failures = 1
+    main.POOL.pending_creates = 1
+    main.POOL._handle_create_task({"type": "create", "attempts": 1})
+    assert main.POOL.pending_creates == 0
+    assert main.POOL.task_queue.delayed_tasks() == [{"type": "refill"}]
+
+
+def test_repair_waits_for_gateway_connections_off_the_worker(monkeypatch):
+    gateway = main.Gateway(main.POOLS, main.DEFAULT_POOL_NAME, drain_seconds=30)
+    monkeypatch.setattr(main.POOL, "drain_hook", gateway.drain)
+    monkeypatch.setattr(main.POOL, "drain_seconds", gateway.drain_seconds)
+    target = next(iter(main.POOL.registry))
+    with gateway._tracked(target):
+        started = time.time()
+        main.POOL._handle_repair_task({"type": "repair", "name": target})
+        assert time.time() - started < 0.5
+        [deferred] = main.POOL.task_queue.delayed_tasks()
+        assert deferred["drain_until"] > started and FakeVPNManager.containers[target]["restart_count"] == 0
+    # Polled again once due; the connections are gone, so the restart goes ahead
+    main.POOL._handle_repair_task(main.POOL.task_queue.get(timeout=2))
+    assert FakeVPNManager.containers[target]["restart_count"] == 1
+    assert main.POOL.task_queue.delayed_tasks() == []
+
+
+def test_only_the_coordinator_runs_the_gateway(tmp_path):
+    path = str(tmp_path / "pool.sqlite3")
+    started = []
+    pools = []
+    for role in ("coordinator", "follower"):
+        pool = main.ContainerPool(target_size=1, request_config=main.POOL.request_config,
+                                  max_repair_attempts=2, store=main.SharedPoolStore(path))
+        pool.start_worker = False
+        pool.on_coordinator.append(lambda role=role: started.append(role))
+        pool.start()
+        pools.append(pool)
+    assert started == ["coordinator"]
+    pools[0].store.resign()
+
+
+def test_shared_store_follower_forwards_work_to_coordinator(tmp_path):
+    path = str(tmp_path / "pool.sqlite3")
+    coordinator = main.ContainerPool(target_size=2, request_config=main.POOL.request_config,
+                                     max_repair_attempts=2, store=main.SharedPoolStore(path))
+    coordinator.start_worker = False
+    coordinator.start()
+    assert coordinator.store.is_coordinator
+    names = {coordinator.create_sync()["container_name"] for _ in range(2)}
+
+    follower = main.ContainerPool(target_size=2, request_config=main.POOL.request_config,
+                                  max_repair_attempts=2, store=main.SharedPoolStore(path))
+    assert not follower.store.try_become_coordinator()
+    handed_out = {follower.get_valid()["container_name"] for _ in range(2)}
+    assert handed_out == names
+    assert {entry["container_name"] for entry in follower.lease(5)} == names
+
+    target = sorted(names)[0]
+    replacement = follower.mark_for_restart(target)
+    assert replacement["container_name"] != target
+    for task in coordinator.store.pop_tasks():
+        coordinator._apply_store_task(task)
+    assert coordinator.registry[target]["state"] == "invalid"
+    assert target in coordinator.needs_restart
+    assert follower.list_names()[target]["state"] == "invalid"
+    coordinator.store.resign()
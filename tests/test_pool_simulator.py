@@ -0,0 +1,60 @@
+import sys
+import time
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+if "docker" not in sys.modules:
+    docker_stub = types.ModuleType("docker")
+    docker_errors_stub = types.ModuleType("docker.errors")
+
+    class _DummyError(Exception):
+        pass
+
+    docker_stub.from_env = lambda: None
+    docker_errors_stub.APIError = _DummyError
+    docker_errors_stub.DockerException = _DummyError
+    docker_errors_stub.NotFound = _DummyError
+    docker_stub.errors = docker_errors_stub
+    sys.modules["docker"] = docker_stub
+    sys.modules["docker.errors"] = docker_errors_stub
+
+import main
+from pool_simulator import DurationModel, SimModel, Simulation, poisson_arrivals, recorded_arrivals, \
+    simulate_policies
+
+POLICY = {"pool_size": 2, "max_repair_attempts": 2, "health_timeout": 45, "restart_wait_seconds": 15}
+
+
+def test_pool_runs_on_the_virtual_clock():
+    model = SimModel(create=DurationModel(10, samples=[10]), create_failure_rate=0, mtbf_seconds=1e9)
+    # t=2 waits for the fill (the creates in flight cover it); t=30 is served at once
+    sim = Simulation(model, POLICY, arrivals=[2, 30], duration=60, deadline=40, config={})
+    report = sim.run()
+    assert report["served"] == 2 and sim.waits == [8.0, 0.0]
+    assert report["container_minutes"] == 2.0 and report["launches"] == 2
+    assert main.time is time
+
+    rejected = Simulation(model, POLICY, arrivals=[3], duration=60, deadline=0, config={}).run()
+    assert rejected["rejected"] == 1 and rejected["rate_503"] == 1.0
+
+    records = [{"ts": 100.0, "route": "/new_proxy"}, {"ts": 101.0, "route": "/proxies"},
+               {"ts": 104.0, "route": "/new_proxy"}]
+    assert recorded_arrivals(records, start=300, speed=2) == [300.0, 302.0]
+
+
+def test_policies_are_compared_on_the_same_failures():
+    model = SimModel(mtbf_seconds=300, create_failure_rate=0.3, restart_failure_rate=0.4, report_ratio=1.0)
+    arrivals = poisson_arrivals(0.2, 3600, start=300)
+    policies = [dict(POLICY, pool_size=1), dict(POLICY, pool_size=3), dict(POLICY, pool_size=6)]
+    report = simulate_policies(model, policies, arrivals, 3600, deadline=30, config={})
+    small, medium, large = report["results"]
+    assert small["restarts"] > 0 and small["rate_503"] > medium["rate_503"]
+    assert small["container_minutes"] < medium["container_minutes"] < large["container_minutes"]
+    meeting = [r for r in report["results"] if r["meets_slo"]]
+    assert report["recommended"] == min(meeting, key=lambda r: r["container_minutes"])["policy"]
+    # Same seed, same run
+    assert Simulation(model, policies[0], arrivals, 3600, deadline=30, config={}).run() == small
@@ -0,0 +1,57 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from profiling import InstrumentedLock, SamplingProfiler, dump_stacks
+
+
+def _parked_in_restart(stop):
+    stop.wait(5)
+
+
+def test_lock_records_waits_holds_and_current_holder():
+    lock = InstrumentedLock("pool:test")
+    condition = threading.Condition(lock)
+    held = threading.Event()
+
+    def holder():
+        with condition:
+            held.set()
+            time.sleep(0.05)
+
+    worker = threading.Thread(target=holder, name="pool-worker-0")
+    worker.start()
+    held.wait(1)
+    assert lock.stats()["held_by"] == "pool-worker-0"
+    with condition:
+        # Waiting on the condition releases the lock instead of counting as one long hold
+        condition.wait(0.01)
+    worker.join()
+    stats = lock.stats()
+    assert stats["acquisitions"] == 3 and stats["contended"] == 1
+    assert stats["wait_max_ms"] >= 20 and stats["hold_max_ms"] >= 40
+    assert stats["longest_holder"] == "pool-worker-0" and stats["held_by"] is None
+    lock.reset()
+    assert lock.stats()["acquisitions"] == 0
+
+
+def test_stacks_and_profile_show_where_threads_are_parked():
+    stop = threading.Event()
+    parked = threading.Thread(target=_parked_in_restart, args=(stop,), name="pool-worker-9", daemon=True)
+    parked.start()
+    try:
+        dump = {item["name"]: item for item in dump_stacks()}
+        assert any("_parked_in_restart" in line for line in dump["pool-worker-9"]["stack"])
+
+        report = SamplingProfiler().profile(seconds=0.1, interval=0.005, thread_prefix="pool-worker")
+        assert report["samples"] > 0 and set(report["threads"]) == {"pool-worker-9"}
+        assert any(row["frame"].startswith("_parked_in_restart") for row in report["inclusive"])
+        assert report["folded"][0].startswith("pool-worker-9;")
+    finally:
+        stop.set()
+        parked.join()
@@ -0,0 +1,84 @@
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+if "docker" not in sys.modules:
+    docker_stub = types.ModuleType("docker")
+    docker_errors_stub = types.ModuleType("docker.errors")
+
+    class _DummyError(Exception):
+        pass
+
+    docker_stub.from_env = lambda: None
+    docker_errors_stub.APIError = _DummyError
+    docker_errors_stub.DockerException = _DummyError
+    docker_errors_stub.NotFound = _DummyError
+    docker_stub.errors = docker_errors_stub
+    sys.modules["docker"] = docker_stub
+    sys.modules["docker.errors"] = docker_errors_stub
+
+from backends import FakeBackend
+from protocol_selector import TCP, UDP, ProtocolSelector, protocol_of
+from vpn_manager import VPNManager
+
+
+class _UdpBlockedBackend(FakeBackend):
+    """UDP tunnels never come up, as behind a firewall that drops UDP."""
+
+    def wait_ready(self, handle, host_port, timeout, check=None, interval=3):
+        return handle.config is not None and protocol_of(handle.config) == TCP
+
+
+def test_choice_follows_measurements_and_blocked_hosts(tmp_path):
+    conf = tmp_path / "office.conf"
+    conf.write_text("client\ndev tun\nproto udp\nremote 1.2.3.4 1194\n")
+    assert protocol_of("uk1.nordvpn.com.udp.ovpn") == UDP and protocol_of("uk1.nordvpn.com.tcp.ovpn") == TCP
+    assert protocol_of(conf) == UDP and protocol_of("plain.ovpn") == TCP
+
+    selector = ProtocolSelector(explore_ratio=0, min_samples=2, block_threshold=2)
+    # Nothing measured yet: UDP, unless only one protocol has configs
+    assert selector.choose("local", {UDP: [], TCP: []}) == UDP
+    assert selector.choose("local", {TCP: []}) == TCP
+    for _ in range(2):
+        selector.record_throughput(UDP, 2e6)
+        selector.record_throughput(TCP, 5e6)
+    assert selector.better() == TCP
+    selector.record_throughput(UDP, 9e6)
+    selector.record_throughput(UDP, 9e6)
+    assert selector.choose("local", [UDP, TCP]) == UDP
+
+    selector.record_launch("edge-1", UDP, None, False, "health_timeout")
+    selector.record_launch("edge-1", UDP, None, False, "auth_failed")
+    assert not selector.udp_blocked("edge-1")
+    selector.record_launch("edge-1", UDP, None, False, "tls_error")
+    assert selector.udp_blocked("edge-1") and not selector.udp_blocked("local")
+    assert selector.choose("edge-1", [UDP, TCP]) == TCP
+    stats = selector.stats()
+    assert stats["udp_blocked"] == {"edge-1": 1800} and stats["items"][UDP]["failed"] == 3
+    assert stats["items"][UDP]["throughput_p50_mbps"] == 72.0
+
+
+def test_create_falls_back_to_tcp_when_udp_times_out(tmp_path):
+    (tmp_path / "uk1.nordvpn.com.udp.ovpn").write_text("proto udp\n")
+    (tmp_path / "uk1.nordvpn.com.tcp.ovpn").write_text("proto tcp\n")
+    backend = _UdpBlockedBackend()
+    backend.throughput = {TCP: 4e6}
+    selector = ProtocolSelector(explore_ratio=0, block_threshold=2, throughput_ratio=1.0)
+    manager = VPNManager(configs_dir=str(tmp_path), backend=backend, protocols=selector)
+
+    created = manager.create_vpn_proxy()
+    assert created["status"] == "ok" and created["config"] == "uk1.nordvpn.com.tcp.ovpn"
+    assert created["protocol"] == TCP and "throughput_mbps" not in created
+    manager.throughput_sampler.join(timeout=5)
+    assert selector.stats()["items"][TCP]["throughput_p50_mbps"] == 32.0
+    assert selector.stats()["items"][UDP]["failed"] == 1
+
+    manager.create_vpn_proxy()
+    assert selector.udp_blocked("local")
+    launches = selector.stats()["items"][UDP]["launches"]
+    assert manager.create_vpn_proxy()["protocol"] == TCP
+    assert selector.stats()["items"][UDP]["launches"] == launches
@@ -0,0 +1,97 @@
+import sys
+import threading
+import time
+from pathlib import Path
+from queue import Empty
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from task_scheduler import PRIORITY_CLIENT, PRIORITY_CREATE, PriorityTaskQueue, RetryBudget, RetryPolicy, TokenBucket
+
+
+def test_queue_orders_client_then_repair_then_create():
+    queue = PriorityTaskQueue()
+    queue.put({"type": "create", "attempts": 0})
+    queue.put({"type": "create", "attempts": 1})
+    queue.put({"type": "repair", "name": "a"})
+    queue.put({"type": "create", "attempts": 0, "priority": PRIORITY_CLIENT})
+    order = [queue.get(timeout=0) for _ in range(4)]
+    assert [(t["type"], t.get("priority"), t.get("attempts")) for t in order] == [
+        ("create", PRIORITY_CLIENT, 0), ("repair", None, None), ("create", None, 0), ("create", None, 1)]
+    with pytest.raises(Empty):
+        queue.get(timeout=0.01)
+
+
+def test_pools_share_the_queue_fairly_by_weight():
+    queue = PriorityTaskQueue()
+    queue.set_weight("bulk", 2)
+    for i in range(4):
+        queue.put({"type": "create", "pool": "bulk", "attempts": i})
+    queue.put({"type": "create", "pool": "fast", "attempts": 0})
+    queue.put({"type": "create", "pool": "fast", "attempts": 1})
+    order = [(t["pool"], t["attempts"]) for t in (queue.get(timeout=0) for _ in range(6))]
+    # FIFO within a pool; "bulk" gets two turns for each of "fast"'s
+    assert order == [("bulk", 0), ("fast", 0), ("bulk", 1), ("bulk", 2), ("fast", 1), ("bulk", 3)]
+    assert queue.pools() == {}
+
+
+def test_bucket_limits_bursts_and_serves_higher_priority_first():
+    bucket = TokenBucket(rate=5, burst=2)
+    assert bucket.acquire() and bucket.acquire()
+    assert not bucket.acquire(timeout=0.01)
+
+    granted = []
+
+    def take(priority, label):
+        bucket.acquire(priority)
+        granted.append(label)
+
+    background = [threading.Thread(target=take, args=(PRIORITY_CREATE, f"create-{i}")) for i in range(3)]
+    for thread in background:
+        thread.start()
+    time.sleep(0.01)
+    client = threading.Thread(target=take, args=(PRIORITY_CLIENT, "client"))
+    client.start()
+    for thread in background + [client]:
+        thread.join(timeout=2)
+    assert granted[0] == "client"
+    assert sorted(granted) == ["client", "create-0", "create-1", "create-2"]
+
+
+def test_zero_rate_disables_limit():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.acquire(timeout=0) for _ in range(100))
+
+
+def test_delayed_tasks_wait_on_the_timer_heap():
+    queue = PriorityTaskQueue()
+    queue.put_later({"type": "create", "attempts": 1}, 0.05)
+    queue.put({"type": "create", "attempts": 0})
+    assert queue.get(timeout=0)["attempts"] == 0
+    with pytest.raises(Empty):
+        queue.get_nowait()
+    started = time.monotonic()
+    assert queue.get(timeout=1)["attempts"] == 1
+    assert time.monotonic() - started < 0.5
+
+
+def test_backoff_grows_per_reason_and_stays_capped():
+    policy = RetryPolicy(base=2, factor=2, max_delay=10, jitter=0)
+    assert [policy.delay(n) for n in (1, 2, 3, 4)] == [2, 4, 8, 10]
+    assert policy.delay(1, "no_host_capacity") == 10
+    jittered = RetryPolicy(base=4, jitter=0.5)
+    assert all(2 <= jittered.delay(1) <= 4 for _ in range(50))
+
+
+def test_retry_budget_limits_retries_to_share_of_attempts():
+    budget = RetryBudget(ratio=0.5, min_per_minute=0, cap=2)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_attempt()
+    budget.record_attempt()
+    assert budget.try_spend()
+    assert budget.stats()["denied"] == 1
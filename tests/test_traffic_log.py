@@ -0,0 +1,47 @@
+import json
+import sys
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from replay_traffic import summarize
+from traffic_log import TrafficRecorder, load_traffic
+
+
+def test_recorder_writes_one_line_per_call(tmp_path):
+    app = FastAPI()
+
+    @app.post("/new_proxy")
+    def new_proxy():
+        raise HTTPException(status_code=503, detail={"status": "error", "message": "no_available_container"})
+
+    @app.get("/proxy/{name}")
+    def get_proxy(name: str):
+        return {"status": "ok", "name": name}
+
+    path = tmp_path / "traffic.jsonl"
+    app.add_middleware(TrafficRecorder, path=str(path))
+    with TestClient(app) as client:
+        client.post("/new_proxy", json={"profile": "fast"})
+        client.get("/proxy/p1?refresh=true")
+
+    first, second = load_traffic(str(path))
+    assert (first["method"], first["path"], first["status"]) == ("POST", "/new_proxy", 503)
+    assert first["message"] == "no_available_container"
+    assert json.loads(first["body"]) == {"profile": "fast"}
+    assert (second["route"], second["query"], second["status"]) == ("/proxy/{name}", "refresh=true", 200)
+    assert second["duration_ms"] >= second["ttfb_ms"] >= 0 and "message" not in second
+
+
+def test_summary_reports_percentiles_and_503_rate():
+    results = [{"method": "POST", "route": "/new_proxy", "status": 200 if i < 8 else 503, "latency_ms": float(i)}
+               for i in range(10)]
+    summary = summarize(results)
+    assert summary["all"] == summary["POST /new_proxy"]
+    assert summary["all"]["p50_ms"] == 5.0 and summary["all"]["max_ms"] == 9.0
+    assert summary["all"]["rate_503"] == 0.2 and summary["all"]["errors"] == 2
@@ -0,0 +1,69 @@
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+if "docker" not in sys.modules:
+    docker_stub = types.ModuleType("docker")
+    docker_errors_stub = types.ModuleType("docker.errors")
+
+    class _DummyError(Exception):
+        pass
+
+    docker_stub.from_env = lambda: None
+    docker_errors_stub.APIError = _DummyError
+    docker_errors_stub.DockerException = _DummyError
+    docker_errors_stub.NotFound = _DummyError
+    docker_stub.errors = docker_errors_stub
+    sys.modules["docker"] = docker_stub
+    sys.modules["docker.errors"] = docker_errors_stub
+
+from backends import FakeBackend, GluetunBackend
+from protocol_selector import TCP, WIREGUARD, ProtocolSelector, server_of
+from vpn_manager import VPNManager
+
+
+def test_gluetun_wireguard_launch_pins_catalog_server():
+    runs = []
+
+    class _Containers:
+        def run(self, **kwargs):
+            runs.append(kwargs)
+            return object()
+
+    backend = GluetunBackend(client=types.SimpleNamespace(containers=_Containers()), vpn_user="user",
+                             vpn_pass="pass", wireguard={"private_key": "wg-key", "addresses": "10.5.0.2/32"})
+    backend.launch("vpn-proxy-1", Path("uk1.nordvpn.com"), 9000, vpn_type="wireguard")
+    env = runs[0]["environment"]
+    assert env["VPN_TYPE"] == "wireguard" and env["VPN_SERVICE_PROVIDER"] == "nordvpn"
+    assert env["WIREGUARD_PRIVATE_KEY"] == "wg-key" and env["WIREGUARD_ADDRESSES"] == "10.5.0.2/32"
+    assert env["SERVER_HOSTNAMES"] == "uk1.nordvpn.com"
+    assert "OPENVPN_USER" not in env and "OPENVPN_CUSTOM_CONFIG" not in env and runs[0]["volumes"] == {}
+
+
+def test_wireguard_creates_use_catalog_hosts_and_report_next_to_openvpn(tmp_path):
+    for name in ("uk1.nordvpn.com.tcp.ovpn", "uk1.nordvpn.com.udp.ovpn", "de7.nordvpn.com.tcp.ovpn"):
+        (tmp_path / name).write_text("client\n")
+    assert server_of("uk1.nordvpn.com.udp.ovpn") == "uk1.nordvpn.com"
+    backend = FakeBackend()
+    backend.throughput = {WIREGUARD: 50e6, TCP: 5e6}
+    selector = ProtocolSelector(throughput_ratio=1.0)
+
+    manager = VPNManager(configs_dir=str(tmp_path), backend=backend, protocols=selector, vpn_type="wireguard")
+    assert [s.name for s in manager.wireguard_servers] == ["de7.nordvpn.com", "uk1.nordvpn.com"]
+    assert manager.create_vpn_proxy() == {"status": "error", "message": "wireguard_private_key_missing"}
+    manager.wireguard = {"private_key": "wg-key"}
+    created = manager.create_vpn_proxy()
+    assert created["protocol"] == WIREGUARD and created["config"] in {"de7.nordvpn.com", "uk1.nordvpn.com"}
+    assert backend.proxies[created["container_name"]].vpn_type == "wireguard"
+
+    openvpn = VPNManager(configs_dir=str(tmp_path), backend=backend, protocols=selector)
+    assert openvpn.create_vpn_proxy()["config"].endswith(".ovpn")
+    for sampled in (manager, openvpn):
+        sampled.throughput_sampler.join(timeout=5)
+    items = selector.stats()["items"]
+    assert items[WIREGUARD]["healthy"] == 1 and items[WIREGUARD]["throughput_p50_mbps"] == 400.0
+    assert sum(items[p]["healthy"] for p in ("udp", "tcp")) == 1
@@ -0,0 +1,114 @@
+import json
+import time
+import logging
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRAFFIC_PATH = "./db/traffic.jsonl"
+# Request bodies are small JSON profiles; larger ones are not kept for replay
+MAX_BODY_BYTES = 4096
+MAX_ERROR_BYTES = 2048
+
+
+class TrafficRecorder:
+    """ASGI middleware that appends one JSON line per API call.
+
+    Each record holds the arrival time, method, path, query, request body,
+    matched route, status, time to first byte and total duration, plus the
+    error ``message`` for 4xx/5xx answers. ``replay_traffic.py`` drives a
+    running instance from these files.
+    """
+
+    def __init__(self, app, path: str = DEFAULT_TRAFFIC_PATH) -> None:
+        self.app = app
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = Lock()
+        self.handle = open(self.path, "a", buffering=1)
+        logger.info("Recording API traffic to %s", self.path)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        arrived = time.time()
+        started = time.perf_counter()
+        error_body = bytearray()
+        response = {"status": None, "first_byte": None}
+        # Read the body up front: endpoints without body parameters never ask for it
+        body = bytearray()
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            body.extend(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        buffered = [{"type": "http.request", "body": bytes(body), "more_body": False}]
+
+        async def recording_receive():
+            return buffered.pop() if buffered else await receive()
+
+        async def recording_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["first_byte"] = time.perf_counter()
+            elif (message["type"] == "http.response.body" and (response["status"] or 0) >= 400
+                  and len(error_body) < MAX_ERROR_BYTES):
+                error_body.extend(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, recording_receive, recording_send)
+        finally:
+            finished = time.perf_counter()
+            route = scope.get("route")
+            record = {
+                "ts": round(arrived, 6),
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "route": getattr(route, "path", None) or scope.get("path"),
+                "status": response["status"] or 500,
+                "ttfb_ms": round(((response["first_byte"] or finished) - started) * 1000, 3),
+                "duration_ms": round((finished - started) * 1000, 3),
+            }
+            if body and len(body) <= MAX_BODY_BYTES:
+                record["body"] = body.decode("utf-8", "replace")
+            if error_body:
+                record["message"] = _error_message(bytes(error_body))
+            self.write(record)
+
+    def write(self, record: Dict) -> None:
+        line = json.dumps(record, separators=(",", ":"))
+        with self.lock:
+            self.handle.write(line + "\n")
+
+
+def _error_message(raw: bytes) -> Optional[str]:
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    detail = data.get("detail", data) if isinstance(data, dict) else None
+    if isinstance(detail, dict):
+        return detail.get("message")
+    return detail if isinstance(detail, str) else None
+
+
+def load_traffic(path: str) -> List[Dict]:
+    """Recorded calls from ``path`` in arrival order, skipping malformed lines."""
+    records = []
+    with open(path) as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get("method") and record.get("path"):
+                records.append(record)
+    records.sort(key=lambda r: r.get("ts", 0))
+    return records
@@ -4,15 +4,22 @@ import random
 import socket
 import logging
 from pathlib import Path
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Iterable, List, Tuple
 import json
+from threading import Lock, Thread
 
-import requests
-import docker
-from docker.errors import APIError, DockerException, NotFound
+from backends import VPN_TYPE_OPENVPN, VPN_TYPE_WIREGUARD, ProxyBackend, create_backend
+from config_breakers import ConfigBreakers, country_of
+from failure_classifier import (DEFAULT_LOG_TAIL_LINES, POLICY_BACKOFF, POLICY_HALT, POLICY_QUARANTINE,
+                                CreateHalt, classify, credentials_fingerprint, policy_for)
+from launch_profiles import LaunchExperiment, LaunchProfile
+from protocol_selector import BLOCKING_FAILURES, UDP, WIREGUARD, ProtocolSelector, protocol_of, server_of
+from task_scheduler import PRIORITY_CREATE
 
 logger = logging.getLogger(__name__)
 
+_HOST_BACKEND_LOCK = Lock()
+
 HEALTH_INDICATORS = [
     "connected",
     "vpn is up",
@@ -27,8 +34,20 @@ ERROR_INDICATORS = [
     "tls-error",
 ]
 
+# create_vpn_proxy failures that point at the server/config rather than the host
+CONFIG_FAILURES = {
+    "health_timeout",
+    "post_restart_health_timeout",
+    "proxy_validation_failed",
+    "proxy_validation_failed_after_restart",
+}
+
 class VPNManager:
-    """Create and validate Gluetun HTTP proxy backed by OpenVPN."""
+    """Create and validate HTTP proxies backed by OpenVPN.
+
+    Tunnels are run by a ``ProxyBackend`` (gluetun containers by default,
+    see ``backends.py``) selected with ``backend`` in config.json.
+    """
 
     def __init__(self,
                  configs_dir: str = "./openvpn",
@@ -36,7 +55,20 @@ class VPNManager:
                  port_max: int = 20000,
                  health_timeout: int = 30,
                  request_timeout: int = 10,
-                 max_attempts: int = 3) -> None:
+                 max_attempts: int = 3,
+                 exit_ip_index=None,
+                 backend: Optional[ProxyBackend] = None,
+                 placement=None,
+                 inventory=None,
+                 breakers: Optional[ConfigBreakers] = None,
+                 launch_limiter=None,
+                 restart_limiter=None,
+                 priority: int = PRIORITY_CREATE,
+                 halt: Optional[CreateHalt] = None,
+                 countries: Optional[List[str]] = None,
+                 experiment: Optional[LaunchExperiment] = None,
+                 protocols: Optional[ProtocolSelector] = None,
+                 vpn_type: Optional[str] = None) -> None:
         self.configs_dir = Path(configs_dir)
         # Enforce allowed port range 8887-20000
         ALLOWED_MIN, ALLOWED_MAX = 8887, 20000
@@ -47,7 +79,32 @@ class VPNManager:
         self.health_timeout = health_timeout
         self.request_timeout = request_timeout
         self.max_attempts = max_attempts
-        self.client = docker.from_env()
+        # Shared pool-wide index of egress IPs; None disables uniqueness checks
+        self.exit_ip_index = exit_ip_index
+        # Multi-host placement (placement.HostPlacement); None means the single local daemon
+        self.placement = placement
+        # Event-fed cache of running proxies (inventory.ProxyInventory); None lists the daemon every call
+        self.inventory = inventory
+        # Circuit breakers per config/country, shared by the pool; quarantine replaces the bad list
+        self.breakers = breakers if breakers is not None else ConfigBreakers()
+        # Pool-wide token buckets (task_scheduler.TokenBucket) for Docker launches/restarts;
+        # ``priority`` orders this manager's calls against other waiters
+        self.launch_limiter = launch_limiter
+        self.restart_limiter = restart_limiter
+        self.priority = priority
+        # Pool-wide stop raised by unrecoverable failures such as AUTH_FAILED
+        self.halt = halt if halt is not None else CreateHalt()
+        # Pool-wide launch profile choice and time-to-healthy stats; None launches with stock settings
+        self.experiment = experiment
+        self.launch_profile: Optional[LaunchProfile] = None
+        self.launched_at = 0.0
+        # Pool-wide UDP/TCP choice from measured handshakes and throughput
+        self.protocols = protocols if protocols is not None else ProtocolSelector()
+        self.protocol: Optional[str] = None
+        # Last background download started by _created; joined by tests and callers that need the sample
+        self.throughput_sampler: Optional[Thread] = None
+        self.host = None
+        self.reserved = False
 
         # Load runtime config
         self.config_path = Path("./config.json")
@@ -55,29 +112,61 @@ class VPNManager:
         self.vpn_provider = (self.runtime.get("vpn_service_provider") or "nordvpn").lower()
         self.vpn_user = self.runtime.get("openvpn_user")
         self.vpn_pass = self.runtime.get("openvpn_password")
+        # "openvpn" (default) or "wireguard" (NordLynx through gluetun); profile pools may override it
+        self.vpn_type = (vpn_type or self.runtime.get("vpn_type") or VPN_TYPE_OPENVPN).lower()
+        if self.vpn_type not in (VPN_TYPE_OPENVPN, VPN_TYPE_WIREGUARD):
+            raise ValueError(f"Unknown vpn_type: {self.vpn_type}")
+        self.wireguard = self.runtime.get("wireguard") or {}
+        if self.vpn_type == VPN_TYPE_WIREGUARD:
+            self.credentials = credentials_fingerprint(VPN_TYPE_WIREGUARD, self.wireguard.get("private_key"))
+        else:
+            self.credentials = credentials_fingerprint(self.vpn_user, self.vpn_pass)
+        # "proxy" validates through ipify every time; "control" asks the tunnel
+        # itself and only sends a share of checks end-to-end through the proxy
+        self.check_mode = (self.runtime.get("health_check_mode") or "proxy").lower()
+        self.end_to_end_ratio = float(self.runtime.get("end_to_end_probe_ratio", 0.1))
+        self.backend_kind = self.runtime.get("backend", "gluetun")
+        if backend is None and placement is None:
+            backend = create_backend(self.backend_kind, **self._backend_kwargs())
+        self.backend = backend
 
         # Initialize bad connections DB
         self.db_dir = Path("./db")
         self.db_dir.mkdir(exist_ok=True)
         self.bad_db_path = self.db_dir / "bad_connections.json"
         self._ensure_bad_db()
-        self.bad_list = set(self._load_bad_list())
+        self.breakers.seed_reports(self._load_bad_items())
 
         # Prepare ovpn list only if using custom provider
         self.ovpn_files = []
+        self.ovpn_by_protocol: Dict[str, List[Path]] = {}
+        # WireGuard picks servers (as hostname paths) from the same catalog
+        self.wireguard_servers: List[Path] = []
         if self.vpn_provider == "nordvpn":
             if not self.configs_dir.exists():
                 raise FileNotFoundError(f"VPN configs directory not found: {self.configs_dir}")
             all_files = [p for p in self.configs_dir.glob("*.ovpn")] + [p for p in self.configs_dir.glob("*.conf")]
             if not all_files:
                 raise FileNotFoundError(f"No .ovpn or .conf files found in {self.configs_dir}")
-            # Prefer reliable servers (UK, DE, NL, CH) for better connection rates
-            preferred = [f for f in all_files if any(x in f.name for x in ['uk', 'de', 'nl', 'ch', 'fr', 'se'])]
-            # Filter out bad configs
-            self.ovpn_files = [f for f in (preferred if preferred else all_files) if f.name not in self.bad_list]
-            if not self.ovpn_files:
-                raise FileNotFoundError("All available configs are marked bad; clear bad list or add new configs.")
-            logger.info(f"Loaded {len(self.ovpn_files)} configs ({len(preferred)} preferred, {len(self.bad_list)} bad)")
+            if countries:
+                # Profile pools pin their servers; "us" also matches regional names like "us-ca12"
+                wanted = {c.lower() for c in countries}
+                all_files = [f for f in all_files
+                             if (country_of(f.name) or "").split("-")[0] in wanted or country_of(f.name) in wanted]
+                if not all_files:
+                    raise FileNotFoundError(f"No configs for countries {sorted(wanted)} in {self.configs_dir}")
+                preferred = []
+            else:
+                # Prefer reliable servers (UK, DE, NL, CH) for better connection rates
+                preferred = [f for f in all_files if any(x in f.name for x in ['uk', 'de', 'nl', 'ch', 'fr', 'se'])]
+            # Reported and failing configs are quarantined by the breakers, not dropped from the catalog
+            self.ovpn_files = preferred if preferred else all_files
+            for f in self.ovpn_files:
+                self.ovpn_by_protocol.setdefault(protocol_of(f), []).append(f)
+            if self.vpn_type == VPN_TYPE_WIREGUARD:
+                self.wireguard_servers = [Path(h) for h in sorted({server_of(f.name) for f in self.ovpn_files})]
+            logger.info(f"Loaded {len(self.ovpn_files)} configs ({len(preferred)} preferred, "
+                        f"{', '.join(f'{len(v)} {k}' for k, v in sorted(self.ovpn_by_protocol.items()))})")
 
     def create_vpn_proxy(self) -> Dict:
         """Create a validated proxy or return error JSON."""
@@ -85,11 +174,31 @@ class VPNManager:
         last_error = None
         logs_tail = []
         container = None
+        tried = set()
+        # Protocols that timed out during this create; the next attempt uses the other one
+        failed_protocols = set()
+        if self.halt.active(self.credentials):
+            self.halt.block()
+            return {"status": "error", "message": "creates_halted"}
+        if self.vpn_type == VPN_TYPE_WIREGUARD and not self.wireguard.get("private_key"):
+            return {"status": "error", "message": "wireguard_private_key_missing"}
+        if self.placement is not None:
+            self._load_inventory()
 
         while attempt < self.max_attempts:
             attempt += 1
+            self._release_host(host_failed=last_error == "container_launch_failed")
             try:
-                chosen = random.choice(self.ovpn_files) if self.vpn_provider == "nordvpn" else None
+                if self.placement is not None and not self._reserve_host():
+                    last_error = "no_host_capacity"
+                    break
+                chosen = self._pick_config(tried, failed_protocols) if self.vpn_provider == "nordvpn" else None
+                if self.vpn_type == VPN_TYPE_WIREGUARD:
+                    self.protocol = WIREGUARD
+                else:
+                    self.protocol = protocol_of(chosen) if chosen else None
+                if chosen:
+                    tried.add(chosen.name)
                 host_port = self._choose_free_port()
                 name = f"vpn-proxy-{int(time.time())}-{random.randint(1000,9999)}"
                 if chosen:
@@ -97,16 +206,31 @@ class VPNManager:
                 else:
                     logger.info(f"Attempt {attempt}: launching {name} (provider {self.vpn_provider}) on port {host_port}")
 
+                self.launch_profile = self.experiment.choose() if self.experiment is not None else None
                 container = self._launch_gluetun_container(name=name, ovpn_file=chosen, host_port=host_port)
                 if not container:
                     last_error = "container_launch_failed"
+                    self._record_launch(False, last_error)
                     continue
 
                 healthy, logs_tail = self._wait_for_healthy(container, host_port)
+                reason = None if healthy else classify(logs_tail)
+                self._record_launch(healthy, reason or "health_timeout")
+                if not healthy and self.protocol == UDP and (reason or "health_timeout") in BLOCKING_FAILURES:
+                    failed_protocols.add(UDP)
+                policy = self._apply_failure_policy(reason, chosen, logs_tail) if reason else None
+                if policy is not None:
+                    last_error = reason
+                    self._remove_container_safe(container)
+                    container = None
+                    if policy == POLICY_QUARANTINE:
+                        continue
+                    # Rotating or relaunching won't help until the cause is fixed
+                    break
                 if not healthy:
                     last_error = "health_timeout"
-                    logger.warning("Health check failed; trying restart")
-                    if not self._restart_container(container):
+                    logger.warning("Health check failed; trying tunnel rotation")
+                    if not self._rotate_tunnel(container):
                         last_error = "restart_failed"
                     else:
                         healthy, logs_tail = self._wait_for_healthy(container, host_port)
@@ -116,38 +240,30 @@ class VPNManager:
                 if healthy:
                     proxy_url, ip_seen = self._validate_proxy(host_port)
                     if proxy_url and ip_seen:
-                        logger.info(f"Proxy validated: {proxy_url} (IP {ip_seen})")
-                        # Return 127.0.0.1 for local/API access, user should use server's public IP for external
-                        return {
-                            "status": "ok",
-                            "container_id": container.id,
-                            "container_name": name,
-                            "proxy_url": f"http://127.0.0.1:{host_port}",
-                            "proxy_port": host_port,
-                            "ip_seen": ip_seen,
-                        }
+                        if self._claim_exit_ip(name, ip_seen):
+                            logger.info(f"Proxy validated: {proxy_url} (IP {ip_seen})")
+                            return self._created(container, name, host_port, ip_seen, chosen)
+                        last_error = "exit_ip_collision"
+                        logger.warning(f"Exit IP {ip_seen} already in use by the pool; re-picking config")
                     else:
                         last_error = "proxy_validation_failed"
-                        logger.warning("Proxy validation failed; attempting restart and revalidate")
-                        if self._restart_container(container):
+                        logger.warning("Proxy validation failed; attempting rotation and revalidate")
+                        if self._rotate_tunnel(container):
                             healthy, logs_tail = self._wait_for_healthy(container, host_port)
                             if healthy:
                                 proxy_url, ip_seen = self._validate_proxy(host_port)
-                                if proxy_url and ip_seen:
-                                    return {
-                                        "status": "ok",
-                                        "container_id": container.id,
-                                        "container_name": name,
-                                        "proxy_url": f"http://127.0.0.1:{host_port}",
-                                        "proxy_port": host_port,
-                                        "ip_seen": ip_seen,
-                                    }
+                                if proxy_url and ip_seen and self._claim_exit_ip(name, ip_seen):
+                                    return self._created(container, name, host_port, ip_seen, chosen)
+                                elif proxy_url and ip_seen:
+                                    last_error = "exit_ip_collision"
                                 else:
                                     last_error = "proxy_validation_failed_after_restart"
                         else:
                             last_error = "restart_failed_before_recreate"
 
                 # If we reach here, recreate with new port
+                if chosen and last_error in CONFIG_FAILURES:
+                    self.breakers.record_failure(chosen.name, last_error)
                 logger.info("Removing container and retrying with new port/config")
                 self._remove_container_safe(container)
                 container = None
@@ -158,6 +274,7 @@ class VPNManager:
                 self._remove_container_safe(container)
                 container = None
 
+        self._release_host(host_failed=last_error == "container_launch_failed")
         # Final failure
         return {
             "status": "error",
@@ -192,168 +309,368 @@ class VPNManager:
             "errors": errors,
         }
 
+    def _created(self, container, name: str, host_port: int, ip_seen: str,
+                 config: Optional[Path] = None) -> Dict:
+        if config is not None:
+            self.breakers.record_success(config.name)
+        result = {
+            "status": "ok",
+            "container_id": container.id,
+            "container_name": name,
+            # 127.0.0.1 unless the host has a public_address configured
+            "proxy_url": self.backend.proxy_url(host_port),
+            "proxy_port": host_port,
+            "ip_seen": ip_seen,
+        }
+        if config is not None:
+            result["config"] = config.name
+        if self.launch_profile is not None:
+            result["launch_profile"] = self.launch_profile.name
+        if self.protocol is not None:
+            result["protocol"] = self.protocol
+            if self.protocols.wants_throughput_sample():
+                # The download can take seconds; the proxy is handed out without waiting for it
+                self.throughput_sampler = Thread(target=self._measure_throughput, args=(host_port, self.protocol),
+                                                 name=f"throughput-{name}", daemon=True)
+                self.throughput_sampler.start()
+        if self.host is not None:
+            self.placement.commit(self.host, name, host_port)
+            result["host"] = self.host.name
+            self.reserved = False
+        if self.inventory is not None:
+            # Don't wait for the create/start events before the new proxy can be looked up
+            self.inventory.put(self._source_key(self.host), {
+                "id": container.id, "name": name, "status": "running", "http_port": host_port})
+        return result
+
+    # Multi-host placement
+    def _backend_kwargs(self) -> Dict:
+        kwargs = {
+            "vpn_provider": self.vpn_provider,
+            "vpn_user": self.vpn_user,
+            "vpn_pass": self.vpn_pass,
+            "configs_dir": self.configs_dir,
+            "request_timeout": self.request_timeout,
+            "limits": self.runtime.get("container_limits"),
+            "wireguard": self.wireguard,
+        }
+        kwargs.update(self.runtime.get("backend_options", {}))
+        return kwargs
+
+    def _host_backend(self, host) -> ProxyBackend:
+        with _HOST_BACKEND_LOCK:
+            if host.backend is None:
+                kwargs = self._backend_kwargs()
+                kwargs.update(address=host.address, public_address=host.public_address)
+                if host.base_url:
+                    kwargs["base_url"] = host.base_url
+                kwargs.update(host.backend_options)
+                host.backend = create_backend(self.backend_kind, share=False, **kwargs)
+            return host.backend
+
+    def _bind_host(self, host) -> None:
+        self.host = host
+        self.backend = self._host_backend(host)
+
+    def _reserve_host(self) -> bool:
+        host = self.placement.reserve()
+        if host is None:
+            return False
+        self._bind_host(host)
+        self.reserved = True
+        return True
+
+    def _release_host(self, host_failed: bool = False) -> None:
+        if self.host is not None and self.reserved:
+            self.placement.cancel(self.host, "container_launch_failed" if host_failed else None)
+            self.reserved = False
+
+    def _load_inventory(self) -> None:
+        """Seed placement with proxies already running on every host (once per process)."""
+        if self.placement.inventory_loaded:
+            return
+        for host in self.placement.all_hosts():
+            try:
+                backend = self._host_backend(host)
+                for handle in backend.list():
+                    self.placement.remember(host, handle.name, backend.inspect(handle).get("http_port"))
+            except Exception as e:
+                logger.warning(f"Failed to list proxies on host {host.name}: {e}")
+        self.placement.inventory_loaded = True
+
+    def _all_backends(self) -> list:
+        if self.placement is None:
+            return [(None, self.backend)]
+        return [(host, self._host_backend(host)) for host in self.placement.all_hosts()]
+
+    # Inventory cache
+    @staticmethod
+    def _source_key(host) -> str:
+        return host.name if host is not None else "local"
+
+    def _attach_inventory(self) -> None:
+        for host, backend in self._all_backends():
+            self.inventory.attach(self._source_key(host), backend)
+
+    def _cached_records(self, refresh: bool = False) -> list:
+        self._attach_inventory()
+        if refresh:
+            self.inventory.refresh()
+        return self.inventory.items()
+
+    def _cached_handle(self, name: str):
+        """Handle rebuilt from the inventory record, bound to its host; None on a miss."""
+        self._attach_inventory()
+        record = self.inventory.get(name)
+        if record is None:
+            return None
+        if self.placement is not None:
+            host = self.placement.hosts.get(record["source"])
+            if host is None:
+                return None
+            self._bind_host(host)
+        return self.backend.from_record(record)
+
+    def _find(self, name: str):
+        """Return the handle for ``name``, binding this manager to the host that runs it."""
+        if self.inventory is not None:
+            handle = self._cached_handle(name)
+            if handle is not None:
+                return handle
+        handle = self._find_live(name)
+        if handle is not None and self.inventory is not None:
+            self.inventory.put(self._source_key(self.host), self.backend.inspect(handle))
+        return handle
+
+    def _find_live(self, name: str):
+        if self.placement is None:
+            return self.backend.get(name)
+        self._load_inventory()
+        located = self.placement.locate(name)
+        for host in ([located] if located else self.placement.all_hosts()):
+            backend = self._host_backend(host)
+            handle = backend.get(name)
+            if handle is not None:
+                self._bind_host(host)
+                self.placement.remember(host, name)
+                return handle
+        return None
+
     # Management helpers
-    def list_proxies(self) -> Dict:
+    def list_proxies(self, refresh: bool = False) -> Dict:
+        """List every proxy; served from the inventory cache unless ``refresh`` is set
+        or no inventory is configured."""
         try:
-            containers = self.client.containers.list(all=True, filters={"ancestor": "qmcgaw/gluetun:latest"})
+            if self.inventory is not None:
+                items = []
+                for record in self._cached_records(refresh):
+                    info = {k: record.get(k) for k in ("id", "name", "status", "http_port")}
+                    if self.placement is not None:
+                        info["host"] = record.get("source")
+                    items.append(info)
+                return {"status": "ok", "items": items}
             items = []
-            for c in containers:
-                ports = c.attrs.get("NetworkSettings", {}).get("Ports", {})
-                http_port = None
-                if "8888/tcp" in ports and ports["8888/tcp"]:
-                    b = ports["8888/tcp"][0]
-                    http_port = b.get("HostPort")
-                items.append({
-                    "id": c.id,
-                    "name": c.name,
-                    "status": c.status,
-                    "http_port": http_port,
-                })
+            for host, backend in self._all_backends():
+                for handle in backend.list():
+                    info = backend.inspect(handle)
+                    if host is not None:
+                        info["host"] = host.name
+                    items.append(info)
             return {"status": "ok", "items": items}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    def get_proxy(self, name: str) -> Dict:
+    def get_proxy(self, name: str, refresh: bool = False) -> Dict:
         try:
-            c = self.client.containers.get(name)
-            ports = c.attrs.get("NetworkSettings", {}).get("Ports", {})
-            http_port = None
-            if "8888/tcp" in ports and ports["8888/tcp"]:
-                b = ports["8888/tcp"][0]
-                http_port = b.get("HostPort")
-            return {"status": "ok", "id": c.id, "name": c.name, "state": c.status, "http_port": http_port}
-        except NotFound:
-            return {"status": "error", "message": "not_found"}
+            if self.inventory is not None and refresh:
+                self.inventory.discard(name)
+            handle = self._find(name)
+            if handle is None:
+                return {"status": "error", "message": "not_found"}
+            info = self.backend.inspect(handle)
+            info["state"] = info.pop("status")
+            return {"status": "ok", **info}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
     def delete_proxy(self, name: str) -> Dict:
         try:
-            c = self.client.containers.get(name)
-            c.remove(force=True)
+            handle = self._find(name)
+            if handle is None:
+                return {"status": "error", "message": "not_found"}
+            self.backend.remove(handle)
+            if self.placement is not None:
+                self.placement.release(name)
+            if self.inventory is not None:
+                self.inventory.discard(name)
             return {"status": "ok", "deleted": name}
-        except NotFound:
-            return {"status": "error", "message": "not_found"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
     def delete_all_proxies(self) -> Dict:
         try:
-            containers = self.client.containers.list(all=True, filters={"ancestor": "qmcgaw/gluetun:latest"})
             deleted = []
-            for c in containers:
-                try:
-                    c.remove(force=True)
-                    deleted.append(c.name)
-                except Exception:
-                    continue
+            for _, backend in self._all_backends():
+                for handle in backend.list():
+                    try:
+                        backend.remove(handle)
+                        deleted.append(handle.name)
+                    except Exception:
+                        continue
+                    if self.placement is not None:
+                        self.placement.release(handle.name)
+                    if self.inventory is not None:
+                        self.inventory.discard(handle.name)
             return {"status": "ok", "deleted": deleted}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
     def _launch_gluetun_container(self, name: str, ovpn_file: Optional[Path], host_port: int):
-        env = {
-            "HTTPPROXY": "on",
-        }
-        # Provider selection
-        if self.vpn_provider == "nordvpn" and ovpn_file is not None:
-            env["VPN_SERVICE_PROVIDER"] = "nordvpn"
-            env["OPENVPN_CUSTOM_CONFIG"] = f"/gluetun/nordvpn/{ovpn_file.name}"
-        else:
-            # Use given provider (e.g., nordvpn) per config.json
-            env["VPN_SERVICE_PROVIDER"] = self.vpn_provider
-        # Credentials
-        if self.vpn_user:
-            env["OPENVPN_USER"] = self.vpn_user
-        if self.vpn_pass:
-            env["OPENVPN_PASSWORD"] = self.vpn_pass
-
-        # Mount custom configs only when using custom
-        volumes = {}
-        if self.vpn_provider == "nordvpn" and ovpn_file is not None:
-            volumes[str(self.configs_dir.resolve())] = {
-                "bind": "/gluetun/nordvpn",
-                "mode": "ro",
-            }
+        if self.launch_limiter is not None:
+            self.launch_limiter.acquire(self.priority)
+        # Time-to-healthy starts here, after any rate-limit wait
+        self.launched_at = time.monotonic()
+        # Optional arguments only when set, so older backends keep working
+        extra = {}
+        if self.launch_profile is not None:
+            extra["profile"] = self.launch_profile
+        if self.vpn_type != VPN_TYPE_OPENVPN:
+            extra["vpn_type"] = self.vpn_type
+        return self.backend.launch(name=name, ovpn_file=ovpn_file, host_port=host_port, **extra)
+
+    def _record_launch(self, healthy: bool, reason: Optional[str]) -> None:
+        elapsed = time.monotonic() - self.launched_at
+        if self.protocol is not None and reason != "container_launch_failed":
+            self.protocols.record_launch(self._scope(), self.protocol, elapsed if healthy else None, healthy,
+                                         None if healthy else reason)
+        if self.experiment is None or self.launch_profile is None:
+            return
+        self.experiment.record(self.launch_profile.name, elapsed if healthy else None, healthy,
+                               None if healthy else reason)
 
-        ports = {
-            "8888/tcp": ("0.0.0.0", host_port),
-        }
+    def _measure_throughput(self, host_port: int, protocol: str) -> Optional[float]:
         try:
-            container = self.client.containers.run(
-                image="qmcgaw/gluetun:latest",
-                name=name,
-                cap_add=["NET_ADMIN"],
-                devices=["/dev/net/tun:/dev/net/tun"],
-                environment=env,
-                volumes=volumes,
-                ports=ports,
-                detach=True,
-                restart_policy={"Name": "unless-stopped"},
-                network_mode="bridge",
-            )
-            logger.info(f"Launched container {name}")
-            return container
-        except (APIError, DockerException) as e:
-            logger.error(f"Failed to run container: {e}")
+            speed = self.backend.measure_throughput(host_port, self.protocols.throughput_url,
+                                                    self.protocols.throughput_bytes,
+                                                    self.protocols.throughput_timeout)
+        except Exception as e:
+            logger.debug(f"Throughput sample failed: {e}")
             return None
+        if speed:
+            self.protocols.record_throughput(protocol, speed)
+            logger.debug(f"Throughput sample on port {host_port} ({protocol}): {speed * 8 / 1e6:.2f} Mbit/s")
+        return speed
+
+    def _scope(self) -> str:
+        """Where UDP blocking is tracked: the Docker host the tunnel runs on."""
+        return self.host.name if self.host is not None else "local"
 
     def _wait_for_healthy(self, container, host_port: int) -> Tuple[bool, list]:
-        start = time.time()
         logs_tail = []
-        while time.time() - start < self.health_timeout:
+        # Backends validate through the proxy (or its control API) rather than parsing logs
+        if self.check_mode == "control":
+            ready = self.backend.wait_ready(container, host_port, self.health_timeout,
+                                            check=lambda: self._check_tunnel(container, host_port),
+                                            interval=1)
+        else:
+            ready = self.backend.wait_ready(container, host_port, self.health_timeout)
+        if not ready:
+            # Only read on failure: the tail is what tells a bad config from bad credentials
             try:
-                container.reload()
-                # Try proxy validation instead of log parsing
-                proxy_url, ip_seen = self._validate_proxy(host_port)
-                if proxy_url and ip_seen:
-                    logger.info(f"Proxy healthy and validated: {ip_seen}")
-                    return True, logs_tail
+                logs_tail = self.backend.logs(container, tail=DEFAULT_LOG_TAIL_LINES)
             except Exception as e:
-                logger.debug(f"Health check attempt failed: {e}")
-            time.sleep(3)
-        logger.error("Health check timed out")
-        return False, logs_tail
+                logger.debug(f"Could not read tunnel logs: {e}")
+        return ready, logs_tail
+
+    def _apply_failure_policy(self, reason: Optional[str], chosen: Optional[Path], logs_tail: list) -> Optional[str]:
+        """Act on a classified failure; returns its policy, or None to use the normal retry path."""
+        policy = policy_for(reason)
+        if policy == POLICY_HALT:
+            detail = next((line.strip() for line in reversed(logs_tail) if "auth" in line.lower()), None)
+            self.halt.trip(reason, self.credentials, detail)
+        elif policy == POLICY_QUARANTINE:
+            logger.warning(f"Tunnel failed with {reason}; quarantining {chosen.name if chosen else 'provider config'}")
+            if chosen:
+                self.breakers.record_failure(chosen.name, reason, trip=True)
+        elif policy == POLICY_BACKOFF:
+            logger.warning(f"Tunnel failed with {reason}; backing off instead of relaunching")
+        else:
+            return None
+        return policy
 
     def _restart_container(self, container) -> bool:
-        try:
-            container.restart(timeout=30)
-            logger.info("Container restarted")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to restart container: {e}")
-            return False
+        if self.restart_limiter is not None:
+            self.restart_limiter.acquire(self.priority)
+        return self.backend.restart(container)
 
-    def restart_and_check(self, name: str) -> Dict:
-        """Restart a proxy container by name and validate via ipify.
+    def _rotate_tunnel(self, container) -> bool:
+        """Reconnect the VPN in place, restarting the container only as a fallback."""
+        if self.backend.rotate(container):
+            return True
+        logger.info("Tunnel rotation unavailable; falling back to container restart")
+        return self._restart_container(container)
 
-        Returns container metadata on success, otherwise {status: error, message}.
-        """
+    def _lookup(self, name: str) -> Tuple[Optional[object], Optional[int], Optional[Dict]]:
+        """Resolve a proxy name to ``(handle, host_port, None)`` or an error dict."""
         try:
-            c = self.client.containers.get(name)
-        except NotFound:
-            return {"status": "error", "message": "not_found"}
+            handle = self._find(name)
         except Exception as e:
-            return {"status": "error", "message": str(e)}
-
-        ports = c.attrs.get("NetworkSettings", {}).get("Ports", {})
-        http_port = None
-        mapping = ports.get("8888/tcp")
-        if mapping:
-            http_port = mapping[0].get("HostPort")
+            return None, None, {"status": "error", "message": str(e)}
+        if handle is None:
+            return None, None, {"status": "error", "message": "not_found"}
+        http_port = self.backend.inspect(handle).get("http_port")
         if not http_port:
-            return {"status": "error", "message": "http_port_not_found"}
-
-        host_port = int(http_port)
+            return None, None, {"status": "error", "message": "http_port_not_found"}
+        return handle, int(http_port), None
 
-        if not self._restart_container(c):
-            return {"status": "error", "message": "restart_failed"}
-
-        healthy, _ = self._wait_for_healthy(c, host_port)
-        if not healthy:
-            return {"status": "error", "message": "health_timeout"}
+    def restart_and_check(self, name: str) -> Dict:
+        """Rotate a proxy's tunnel by name and validate via ipify.
 
-        proxy_url, ip_seen = self._validate_proxy(host_port)
+        Returns container metadata on success, otherwise {status: error, message}.
+        """
+        c, host_port, error = self._lookup(name)
+        if error:
+            return error
+
+        # Keep rotating while the tunnel comes back on an IP the pool already uses
+        rotations = 0
+        while True:
+            if not self._rotate_tunnel(c):
+                return {"status": "error", "message": "restart_failed"}
+
+            healthy, _ = self._wait_for_healthy(c, host_port)
+            if not healthy:
+                return {"status": "error", "message": "health_timeout"}
+
+            proxy_url, ip_seen = self._validate_proxy(host_port)
+            if not (proxy_url and ip_seen):
+                return {"status": "error", "message": "proxy_validation_failed"}
+            if self._claim_exit_ip(c.name, ip_seen):
+                return {
+                    "status": "ok",
+                    "container_id": c.id,
+                    "container_name": c.name,
+                    "proxy_url": proxy_url,
+                    "proxy_port": host_port,
+                    "ip_seen": ip_seen,
+                }
+            rotations += 1
+            if rotations >= self.max_attempts:
+                return {"status": "error", "message": "exit_ip_collision"}
+            logger.info(f"Container {c.name} rotated onto used IP {ip_seen}; restarting again")
+
+    def check_container(self, name: str, end_to_end: Optional[bool] = None) -> Dict:
+        """Validate an existing container without restarting it.
+
+        ``end_to_end`` forces (or skips) validation through the proxy; by
+        default a random share of checks goes end-to-end in control mode.
+        """
+        c, host_port, error = self._lookup(name)
+        if error:
+            return error
+        if end_to_end is None:
+            end_to_end = random.random() < self.end_to_end_ratio
+        proxy_url, ip_seen = self._check_tunnel(c, host_port, end_to_end=end_to_end)
         if proxy_url and ip_seen:
             return {
                 "status": "ok",
@@ -365,35 +682,34 @@ class VPNManager:
             }
         return {"status": "error", "message": "proxy_validation_failed"}
 
-    def check_container(self, name: str) -> Dict:
-        """Validate an existing container without restarting it."""
+    def probe_proxy(self, name: str) -> Dict:
+        """Cheap CONNECT probe through the proxy, without checking the exit IP."""
+        _, host_port, error = self._lookup(name)
+        if error:
+            return error
+        if self.backend.probe(host_port, timeout=min(self.request_timeout, 5)):
+            return {"status": "ok", "container_name": name, "proxy_port": host_port}
+        return {"status": "error", "message": "probe_failed"}
+
+    def tunnel_status(self, name: str) -> Dict:
+        """Report VPN state and public IP straight from the tunnel, without a proxy round trip."""
         try:
-            c = self.client.containers.get(name)
-        except NotFound:
-            return {"status": "error", "message": "not_found"}
+            handle = self._find(name)
+            if handle is None:
+                return {"status": "error", "message": "not_found"}
+            return {"status": "ok", "container_name": name, **self.backend.tunnel_status(handle)}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-        ports = c.attrs.get("NetworkSettings", {}).get("Ports", {})
-        mapping = ports.get("8888/tcp")
-        http_port = None
-        if mapping:
-            http_port = mapping[0].get("HostPort")
-        if not http_port:
-            return {"status": "error", "message": "http_port_not_found"}
-
-        host_port = int(http_port)
-        proxy_url, ip_seen = self._validate_proxy(host_port)
-        if proxy_url and ip_seen:
-            return {
-                "status": "ok",
-                "container_id": c.id,
-                "container_name": c.name,
-                "proxy_url": proxy_url,
-                "proxy_port": host_port,
-                "ip_seen": ip_seen,
-            }
-        return {"status": "error", "message": "proxy_validation_failed"}
+    def sample_proxy(self, name: str) -> Dict:
+        """Read CPU/memory/network counters for one proxy from its backend."""
+        try:
+            handle = self._find(name)
+            if handle is None:
+                return {"status": "error", "message": "not_found"}
+            return {"status": "ok", **self.backend.stats(handle)}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
 
     def _remove_container_safe(self, container) -> None:
         if not container:
@@ -401,34 +717,64 @@ class VPNManager:
         try:
             name = getattr(container, "name", "unknown")
             logger.info(f"Removing container {name}")
-            container.remove(force=True)
+            self.backend.remove(container)
+            if self.inventory is not None:
+                self.inventory.discard(name)
         except Exception as e:
             logger.warning(f"Failed removing container: {e}")
 
     def _validate_proxy(self, host_port: int) -> Tuple[Optional[str], Optional[str]]:
-        proxy = f"http://127.0.0.1:{host_port}"
-        try:
-            r = requests.get(
-                "https://api.ipify.org?format=json",
-                proxies={"http": proxy, "https": proxy},
-                timeout=self.request_timeout,
-            )
-            if r.status_code == 200:
-                data = r.json()
-                ip = data.get("ip")
-                if ip:
-                    return proxy, ip
-        except Exception as e:
-            logger.debug(f"Proxy validation error: {e}")
+        return self.backend.validate(host_port)
+
+    def _check_tunnel(self, container, host_port: int, end_to_end: bool = False) -> Tuple[Optional[str], Optional[str]]:
+        """Cheap health check: the tunnel's own VPN status and public IP in control
+        mode, full proxy validation otherwise or when the backend cannot tell."""
+        if self.check_mode != "control" or end_to_end or not self.backend.reports_public_ip:
+            return self._validate_proxy(host_port)
+        status = self.backend.tunnel_status(container)
+        if status.get("vpn") == "running" and status.get("public_ip"):
+            return self.backend.proxy_url(host_port), status["public_ip"]
         return None, None
 
+    def _pick_config(self, exclude: set, failed_protocols: Iterable[str] = ()) -> Path:
+        if self.vpn_type == VPN_TYPE_WIREGUARD:
+            # Breakers key WireGuard servers by hostname; country breakers still apply
+            server = self.breakers.pick(self.wireguard_servers, exclude=exclude)
+            if server is not None:
+                return server
+            fresh = [s for s in self.wireguard_servers if s.name not in exclude]
+            return random.choice(fresh or self.wireguard_servers)
+        protocol = self.protocols.choose(self._scope(), self.ovpn_by_protocol, exclude=failed_protocols)
+        if protocol is not None:
+            chosen = self.breakers.pick(self.ovpn_by_protocol[protocol], exclude=exclude)
+            if chosen is not None:
+                return chosen
+        chosen = self.breakers.pick(self.ovpn_files, exclude=exclude)
+        if chosen is not None:
+            return chosen
+        # Everything is quarantined or already tried; better a doubtful server than no attempt
+        logger.warning("No config outside quarantine; picking from the full catalog")
+        fresh = [f for f in self.ovpn_files if f.name not in exclude]
+        return random.choice(fresh or self.ovpn_files)
+
+    def _claim_exit_ip(self, name: str, ip: str) -> bool:
+        if self.exit_ip_index is None:
+            return True
+        return self.exit_ip_index.reserve(name, ip)
+
     def _choose_free_port(self) -> int:
+        port_min, port_max = self.port_min, self.port_max
+        if self.host is not None:
+            if not self.host.local:
+                # Can't bind-test a remote daemon's ports; use the placement's bookkeeping
+                return self.placement.pick_port(self.host, port_min, port_max)
+            port_min, port_max = max(port_min, self.host.port_min), min(port_max, self.host.port_max)
         for _ in range(50):
-            port = random.randint(self.port_min, self.port_max)
+            port = random.randint(port_min, port_max)
             if self._is_port_free(port):
                 return port
         # fallback linear scan
-        for port in range(self.port_min, self.port_max):
+        for port in range(port_min, port_max):
             if self._is_port_free(port):
                 return port
         raise RuntimeError("No free port available in configured range")
@@ -460,11 +806,10 @@ class VPNManager:
             except Exception as e:
                 logger.error(f"Failed to initialize bad DB: {e}")
 
-    def _load_bad_list(self) -> list:
+    def _load_bad_items(self) -> list:
         try:
             data = json.loads(self.bad_db_path.read_text())
-            items = data.get("items", [])
-            return [x.get("config_name") for x in items if x.get("config_name")]
+            return [x for x in data.get("items", []) if x.get("config_name")]
         except Exception as e:
             logger.warning(f"Failed to read bad DB, defaulting to empty: {e}")
             return []
@@ -485,17 +830,25 @@ class VPNManager:
             except Exception:
                 data = {"items": []}
             items = data.get("items", [])
-            # Check exists
-            if any(i.get("config_name") == config_name for i in items):
-                return {"status": "ok", "message": "already_marked", "config_name": config_name}
-            items.append({
-                "config_name": config_name,
-                "reason": reason,
-                "timestamp": int(time.time()),
-            })
+            now = int(time.time())
+            # Every report re-opens the breaker; the file keeps the latest report per config
+            self.breakers.record_failure(config_name, reason or "reported", trip=True)
+            self.breakers.seeded.add((config_name, now))
+            existing = next((i for i in items if i.get("config_name") == config_name), None)
+            if existing is not None:
+                existing.update(reason=reason, timestamp=now, reports=existing.get("reports", 1) + 1)
+            else:
+                items.append({
+                    "config_name": config_name,
+                    "reason": reason,
+                    "timestamp": now,
+                })
             ok = self._save_bad_list(items)
             if ok:
-                return {"status": "ok", "config_name": config_name}
+                result = {"status": "ok", "config_name": config_name}
+                if existing is not None:
+                    result["message"] = "already_marked"
+                return result
             return {"status": "error", "message": "save_failed"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
@@ -503,6 +856,6 @@ class VPNManager:
     def list_bad_connections(self) -> Dict:
         try:
             data = json.loads(self.bad_db_path.read_text())
-            return {"status": "ok", "items": data.get("items", [])}
+            return {"status": "ok", "items": data.get("items", []), "quarantine": self.breakers.snapshot()}
         except Exception as e:
             return {"status": "error", "message": str(e)}